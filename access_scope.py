@@ -0,0 +1,108 @@
+"""
+Tenant scope of the signed-in user, pushed into every tenant-facing query
+"""
+
+# Roles restricted to their own company or partner (as used by get_active_relay_devices)
+COMPANY_ROLE = "Company User"
+PARTNER_ROLE = "Partner Admin"
+
+
+def partner_condition(partner_column, company_column, partner_id, company_ids=()):
+    """SQL condition matching rows of a partner: its own id, or any of its companies as one IN list"""
+    company_ids = sorted(int(company_id) for company_id in company_ids)
+    if not company_ids:
+        return f"{partner_column} = {int(partner_id)}"
+    return f"({partner_column} = {int(partner_id)} OR {company_column} IN ({', '.join(map(str, company_ids))}))"
+
+
+class AccessScope:
+    """The company or partner whose rows a session may read; unrestricted for admins and viewers
+
+    A `denied` scope reads nothing: it is what a company user or partner admin gets when
+    their account is not linked to a company or partner.
+    """
+
+    def __init__(self, company_id=None, partner_id=None, denied=False):
+        self.denied = bool(denied)
+        self.company_id = int(company_id) if company_id and not denied else None
+        self.partner_id = int(partner_id) if partner_id and not company_id and not denied else None
+
+    @classmethod
+    def from_user(cls, user):
+        """Scope for a user dict from auth_manager.get_current_user()"""
+        if not user:
+            return cls()
+        if user.get('role') == COMPANY_ROLE:
+            # Fail closed: a tenant role without its tenant id sees no rows, not every tenant's
+            return cls(company_id=user['company_id']) if user.get('company_id') else cls(denied=True)
+        if user.get('role') == PARTNER_ROLE:
+            return cls(partner_id=user['partner_id']) if user.get('partner_id') else cls(denied=True)
+        return cls()
+
+    @property
+    def is_restricted(self):
+        return self.denied or self.company_id is not None or self.partner_id is not None
+
+    @property
+    def key(self):
+        """Hashable form for cache keys"""
+        if self.company_id is not None:
+            return ('company', self.company_id)
+        if self.partner_id is not None:
+            return ('partner', self.partner_id)
+        if self.denied:
+            return ('denied',)
+        return None
+
+    @property
+    def role(self):
+        """Role name understood by the role-based relay queries"""
+        if self.company_id is not None:
+            return COMPANY_ROLE
+        if self.partner_id is not None:
+            return PARTNER_ROLE
+        return None
+
+    def condition(self, company_column=None, partner_column=None, partner_company_ids=()):
+        """SQL condition limiting rows to the scope, or None when unrestricted
+
+        A company scope matches `company_column`; a partner scope matches `partner_column`
+        or any of `partner_company_ids` (the partner's companies) in `company_column`. Rows
+        with neither column in scope never match, and a denied scope matches nothing.
+        """
+        if self.denied:
+            return "1=0"
+        if self.company_id is not None:
+            return f"{company_column} = {self.company_id}" if company_column else "1=0"
+        if self.partner_id is not None:
+            if partner_column and company_column:
+                return partner_condition(partner_column, company_column, self.partner_id, partner_company_ids)
+            if partner_column:
+                return f"{partner_column} = {self.partner_id}"
+            if company_column and partner_company_ids:
+                return f"{company_column} IN ({', '.join(map(str, sorted(int(company_id) for company_id in partner_company_ids)))})"
+            return "1=0"
+        return None
+
+    def apply_to_filters(self, company_id=None, partner_id=None):
+        """Company and partner filters narrowed to the scope, for engines that only take filters"""
+        if self.denied:
+            # Filters cannot express "no rows", so refuse rather than fall back to none
+            raise PermissionError("This account is not linked to a company or partner")
+        if self.company_id is not None:
+            return self.company_id, partner_id
+        if self.partner_id is not None:
+            return company_id, self.partner_id
+        return company_id, partner_id
+
+    def __eq__(self, other):
+        return isinstance(other, AccessScope) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"AccessScope({self.key})"
+
+
+UNRESTRICTED = AccessScope()
@@ -0,0 +1,430 @@
+"""
+In-memory per-user activity indexes keyed by users_portal.id
+"""
+
+import numpy as np
+import pandas as pd
+
+from refresh_throttle import ThrottledRefresh
+
+# Activity sources folded into the last-seen index. "Active" means app activity (fido1.app_log)
+# everywhere: here, in the activity rollup behind the SQL fallback, and in the daily bitmaps
+LAST_SEEN_SOURCES = ('app_log',)
+
+
+class UserLastSeenIndex(ThrottledRefresh):
+    """Last activity timestamp per portal user, kept in arrays indexed by users_portal.id.
+
+    The index is refreshed incrementally: each activity source keeps an id watermark and
+    only rows above it are fetched on the next refresh. Every "active within N days"
+    question is then a single vectorised comparison against the last_seen array.
+    """
+
+    REFRESH_SECONDS = 60
+
+    def __init__(self):
+        self.last_seen = np.full(0, np.datetime64('NaT'), dtype='datetime64[s]')
+        self.company_id = np.zeros(0, dtype=np.int64)
+        self.partner_id = np.zeros(0, dtype=np.int64)
+        self.is_account_active = np.zeros(0, dtype=bool)
+        self.users = pd.DataFrame(columns=['id', 'company_id', 'partner_id', 'active', 'user_name', 'email'])
+        self.watermarks = {source: 0 for source in LAST_SEEN_SOURCES}
+        self._init_refresh()
+
+    def __len__(self):
+        return len(self.users)
+
+    def _ensure_capacity(self, max_user_id):
+        """Grow the per-user arrays so that max_user_id is a valid position"""
+        size = int(max_user_id) + 1
+        if size <= len(self.last_seen):
+            return
+        grow = size - len(self.last_seen)
+        self.last_seen = np.concatenate([self.last_seen, np.full(grow, np.datetime64('NaT'), dtype='datetime64[s]')])
+        self.company_id = np.concatenate([self.company_id, np.zeros(grow, dtype=np.int64)])
+        self.partner_id = np.concatenate([self.partner_id, np.zeros(grow, dtype=np.int64)])
+        self.is_account_active = np.concatenate([self.is_account_active, np.zeros(grow, dtype=bool)])
+
+    def update_users(self, users_df):
+        """Load user → company/partner membership from a users_portal frame"""
+        if users_df.empty:
+            return
+        ids = users_df['id'].to_numpy(dtype=np.int64)
+        self._ensure_capacity(ids.max())
+        self.company_id[ids] = users_df['company_id'].fillna(0).to_numpy(dtype=np.int64)
+        self.partner_id[ids] = users_df['partner_id'].fillna(0).to_numpy(dtype=np.int64)
+        self.is_account_active[ids] = users_df['active'].fillna(0).to_numpy() == 1
+        self.users = users_df.reset_index(drop=True)
+
+    def update_activity(self, activity_df):
+        """Fold a (user_id, last_seen) frame into the index, keeping the latest timestamp per user"""
+        if activity_df.empty:
+            return
+        activity_df = activity_df[activity_df['user_id'].notna() & activity_df['last_seen'].notna()]
+        if activity_df.empty:
+            return
+        ids = activity_df['user_id'].to_numpy(dtype=np.int64)
+        seen = pd.to_datetime(activity_df['last_seen']).to_numpy().astype('datetime64[s]')
+        self._ensure_capacity(ids.max())
+        np.fmax.at(self.last_seen, ids, seen)
+
+    def _reload(self, db):
+        """Pull user membership and new activity from the database into the index"""
+        self.update_users(db.get_portal_users())
+        for source in LAST_SEEN_SOURCES:
+            delta_df = db.get_user_last_seen_delta(source, after_id=self.watermarks[source])
+            if delta_df.empty:
+                continue
+            self.update_activity(delta_df)
+            self.watermarks[source] = max(self.watermarks[source], int(delta_df['max_id'].max()))
+
+    def active_mask(self, days, now=None):
+        """Boolean array over user ids: seen within the last `days` days"""
+        now = np.datetime64(now or pd.Timestamp.now(), 's')
+        return self.last_seen >= now - np.timedelta64(int(days), 'D')
+
+    def active_users_per_entity(self, days, now=None):
+        """Count active users per company and per partner.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns entity_type ('Company' or 'Partner'), entity_id and active_users.
+        """
+        mask = self.active_mask(days, now)
+        frames = []
+        for entity_type, entity_ids in (('Company', self.company_id), ('Partner', self.partner_id)):
+            counts = np.bincount(entity_ids[mask & (entity_ids > 0)], minlength=1)
+            nonzero = np.flatnonzero(counts)
+            nonzero = nonzero[nonzero > 0]
+            frames.append(pd.DataFrame({
+                'entity_type': entity_type,
+                'entity_id': nonzero,
+                'active_users': counts[nonzero]
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def inactive_users(self, days, now=None):
+        """List enabled portal accounts that have not been seen within the last `days` days"""
+        if self.users.empty:
+            return self.users.assign(last_seen=pd.Series(dtype='datetime64[s]'))
+        ids = self.users['id'].to_numpy(dtype=np.int64)
+        inactive = self.is_account_active[ids] & ~self.active_mask(days, now)[ids]
+        report = self.users[inactive].copy()
+        report['last_seen'] = self.last_seen[ids[inactive]]
+        return report.sort_values('last_seen', na_position='first').reset_index(drop=True)
+
+
+def attribute_entity_counts(licences_df, entity_counts_df, column='active_users'):
+    """Map per-entity counts onto licence rows by company_id / partner_id
+
+    `entity_counts_df` has one row per (entity_type, entity_id), as returned by
+    active_users_per_entity(); every licence round of an entity gets its entity's count,
+    and rows without a count get 0. Returns a Series aligned with `licences_df`.
+    """
+    if licences_df.empty:
+        return pd.Series(dtype=np.int64, index=licences_df.index)
+    counts = {}
+    for entity_type in ('Company', 'Partner'):
+        entity_rows = entity_counts_df[entity_counts_df['entity_type'] == entity_type]
+        counts[entity_type] = pd.Series(entity_rows[column].to_numpy(), index=entity_rows['entity_id'].astype(np.int64).to_numpy())
+    company_counts = licences_df['company_id'].map(counts['Company'])
+    partner_counts = licences_df['partner_id'].map(counts['Partner'])
+    return company_counts.where(licences_df['company_id'].notna(), partner_counts).fillna(0).astype(np.int64)
+
+
+def entity_total(licences_df, entity_counts_df, column='active_users'):
+    """Sum of per-entity counts over the entities holding rounds in `licences_df`
+
+    Each company or partner is counted once however many licence rounds it has, so this
+    is the total to show instead of summing attribute_entity_counts() over the rounds.
+    """
+    if licences_df.empty or entity_counts_df.empty:
+        return 0
+    is_company = licences_df['company_id'].notna()
+    entities = pd.DataFrame({
+        'entity_type': np.where(is_company, 'Company', 'Partner'),
+        'entity_id': licences_df['company_id'].where(is_company, licences_df['partner_id'])
+    }).dropna().astype({'entity_id': np.int64}).drop_duplicates()
+    counts = entity_counts_df.astype({'entity_id': np.int64})
+    return int(entities.merge(counts, on=['entity_type', 'entity_id'])[column].sum())
+
+
+# Number of set bits in each byte value, used to count packed bitmaps
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+
+def _pad(bitmap, length):
+    """Right-pad a packed bitmap with zero bytes to `length` bytes"""
+    if len(bitmap) >= length:
+        return bitmap
+    return np.concatenate([bitmap, np.zeros(length - len(bitmap), dtype=np.uint8)])
+
+
+def pack_ids(user_ids):
+    """Pack a collection of user ids into a dense bitmap (bit i set when id i is present)"""
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    if len(user_ids) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    bits = np.zeros(int(user_ids.max()) + 1, dtype=bool)
+    bits[user_ids] = True
+    return np.packbits(bits, bitorder='little')
+
+
+def bitmap_or(bitmaps):
+    """Union of packed bitmaps"""
+    bitmaps = list(bitmaps)
+    if not bitmaps:
+        return np.zeros(0, dtype=np.uint8)
+    length = max(len(bitmap) for bitmap in bitmaps)
+    result = np.zeros(length, dtype=np.uint8)
+    for bitmap in bitmaps:
+        result[:len(bitmap)] |= bitmap
+    return result
+
+
+def bitmap_and(left, right):
+    """Intersection of two packed bitmaps"""
+    length = min(len(left), len(right))
+    return left[:length] & right[:length]
+
+
+def bitmap_cardinality(bitmap):
+    """Number of ids present in a packed bitmap"""
+    return int(_POPCOUNT[bitmap].sum())
+
+
+def bitmap_ids(bitmap):
+    """Ids present in a packed bitmap"""
+    return np.flatnonzero(np.unpackbits(bitmap, bitorder='little'))
+
+
+class DailyActiveBitmapIndex(ThrottledRefresh):
+    """One packed bitmap of active user ids per day, plus user id bitmaps per company and partner.
+
+    Bitmaps are dense bitsets over users_portal.id (a few KB per day even for tens of
+    thousands of users), so the active users of any entity over any window are an OR
+    across days, an AND with the entity bitmap and a popcount. The index persists to a
+    single compressed .npz file and is extended incrementally from the last stored day.
+    """
+
+    REFRESH_SECONDS = 300
+
+    def __init__(self):
+        self.days = {}
+        self.entities = {}
+        self._init_refresh()
+
+    @property
+    def last_day(self):
+        """Most recent day held in the index, or None when empty"""
+        return max(self.days) if self.days else None
+
+    def update_day(self, day, user_ids):
+        """Replace the bitmap for `day` with the given active user ids"""
+        self.days[pd.Timestamp(day).date()] = pack_ids(user_ids)
+
+    def update_daily_activity(self, activity_df):
+        """Load a (day, user_id) frame, replacing the bitmaps of every day it covers"""
+        if activity_df.empty:
+            return
+        days = pd.to_datetime(activity_df['day']).dt.date
+        for day, user_ids in activity_df['user_id'].groupby(days):
+            self.update_day(day, user_ids.dropna().to_numpy(dtype=np.int64))
+
+    def update_entities(self, users_df):
+        """Rebuild the per-company and per-partner user bitmaps from a users_portal frame"""
+        if users_df.empty:
+            return
+        entities = {}
+        for entity_type, column in (('Company', 'company_id'), ('Partner', 'partner_id')):
+            members = users_df[users_df[column].notna()]
+            for entity_id, user_ids in members['id'].groupby(members[column].astype(np.int64)):
+                entities[(entity_type, int(entity_id))] = pack_ids(user_ids.to_numpy(dtype=np.int64))
+        self.entities = entities
+
+    def window_bitmap(self, start_day, end_day):
+        """Union of the daily bitmaps between start_day and end_day inclusive"""
+        start_day = pd.Timestamp(start_day).date()
+        end_day = pd.Timestamp(end_day).date()
+        return bitmap_or(bitmap for day, bitmap in self.days.items() if start_day <= day <= end_day)
+
+    def active_count(self, start_day, end_day, entity_type=None, entity_id=None):
+        """Distinct active users over a window, optionally restricted to one company or partner"""
+        window = self.window_bitmap(start_day, end_day)
+        if entity_type is not None:
+            window = bitmap_and(window, self.entities.get((entity_type, int(entity_id)), np.zeros(0, dtype=np.uint8)))
+        return bitmap_cardinality(window)
+
+    def active_users_per_entity(self, start_day, end_day):
+        """Distinct active users per company and partner over a window"""
+        window = self.window_bitmap(start_day, end_day)
+        rows = []
+        for (entity_type, entity_id), members in self.entities.items():
+            count = bitmap_cardinality(bitmap_and(window, members))
+            if count:
+                rows.append({'entity_type': entity_type, 'entity_id': entity_id, 'active_users': count})
+        return pd.DataFrame(rows, columns=['entity_type', 'entity_id', 'active_users'])
+
+    def rolling_active_counts(self, start_day, end_day, window_days, entity_keys=None):
+        """Distinct active users in the trailing `window_days` window ending on each day of a range
+
+        When `entity_keys` ((entity_type, entity_id) pairs) is given, only members of those
+        entities are counted.
+        """
+        members = None
+        if entity_keys is not None:
+            members = bitmap_or(self.entities.get((entity_type, int(entity_id)), np.zeros(0, dtype=np.uint8))
+                                for entity_type, entity_id in entity_keys)
+        rows = []
+        for day in pd.date_range(start_day, end_day, freq='D'):
+            window = self.window_bitmap(day - pd.Timedelta(days=window_days - 1), day)
+            daily = self.days.get(day.date(), np.zeros(0, dtype=np.uint8))
+            if members is not None:
+                window = bitmap_and(window, members)
+                daily = bitmap_and(daily, members)
+            rows.append({
+                'date': day.date(),
+                'daily_active_users': bitmap_cardinality(daily),
+                'window_active_users': bitmap_cardinality(window)
+            })
+        return pd.DataFrame(rows, columns=['date', 'daily_active_users', 'window_active_users'])
+
+    def save(self, path):
+        """Persist all bitmaps to a compressed .npz file"""
+        arrays = {f"day_{day.isoformat()}": bitmap for day, bitmap in self.days.items()}
+        arrays.update({f"{entity_type.lower()}_{entity_id}": bitmap
+                       for (entity_type, entity_id), bitmap in self.entities.items()})
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save(); returns an empty index if the file is missing"""
+        index = cls()
+        try:
+            with np.load(path) as stored:
+                for key in stored.files:
+                    prefix, value = key.split('_', 1)
+                    if prefix == 'day':
+                        index.days[pd.Timestamp(value).date()] = stored[key]
+                    else:
+                        index.entities[(prefix.title(), int(value))] = stored[key]
+        except FileNotFoundError:
+            pass
+        return index
+
+    def _reload(self, db, path=None):
+        """Extend the index with days from the last stored day onwards and persist it
+
+        The last stored day is re-read because it may still have been in progress.
+        """
+        self.update_entities(db.get_portal_users())
+        self.update_daily_activity(db.get_daily_active_user_ids(since_day=self.last_day))
+        if path:
+            self.save(path)
+
+
+# Columns of a session row, whether a complete session or a piece of one
+SESSION_COLUMNS = ['session_id', 'user_id', 'started_at', 'ended_at', 'event_count', 'first_action', 'last_action']
+
+
+class AppSessionIndex(ThrottledRefresh):
+    """Per-session aggregates of fido1.app_log, kept in one frame keyed by session_id.
+
+    Each refresh fetches the session aggregates of the app_log rows above an id
+    watermark. A session that was still open on the previous refresh comes back as a
+    second piece, which is folded into the stored row (earliest start, latest end,
+    summed events, first action of the first piece and last action of the last), so
+    closed sessions are never re-read and long ranges only cost a frame filter.
+    """
+
+    REFRESH_SECONDS = 60
+
+    def __init__(self):
+        self.sessions = pd.DataFrame({
+            'session_id': pd.Series(dtype=object),
+            'user_id': pd.Series(dtype='float64'),
+            'started_at': pd.Series(dtype='datetime64[ns]'),
+            'ended_at': pd.Series(dtype='datetime64[ns]'),
+            'event_count': pd.Series(dtype=np.int64),
+            'first_action': pd.Series(dtype=object),
+            'last_action': pd.Series(dtype=object)
+        })
+        self.watermark = 0
+        self._init_refresh()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def update_sessions(self, pieces_df):
+        """Merge a frame of session pieces into the index"""
+        if pieces_df.empty:
+            return
+        pieces_df = pieces_df[SESSION_COLUMNS].assign(
+            started_at=pd.to_datetime(pieces_df['started_at']),
+            ended_at=pd.to_datetime(pieces_df['ended_at'])
+        )
+        touched = self.sessions['session_id'].isin(pieces_df['session_id'])
+        combined = pd.concat([self.sessions[touched], pieces_df], ignore_index=True)
+        combined = combined.sort_values(['session_id', 'started_at', 'ended_at'], kind='stable')
+        merged = combined.groupby('session_id', as_index=False, sort=False).agg(
+            user_id=('user_id', 'first'),
+            started_at=('started_at', 'min'),
+            ended_at=('ended_at', 'max'),
+            event_count=('event_count', 'sum'),
+            first_action=('first_action', 'first'),
+            last_action=('last_action', 'last')
+        )
+        self.sessions = pd.concat([self.sessions[~touched], merged], ignore_index=True)[SESSION_COLUMNS]
+
+    def _reload(self, db):
+        """Pull the session aggregates of new app_log rows into the index"""
+        delta_df = db.get_app_session_delta(after_id=self.watermark)
+        if not delta_df.empty:
+            self.update_sessions(delta_df)
+            self.watermark = max(self.watermark, int(delta_df['max_id'].max()))
+
+    def sessions_between(self, start_day=None, end_day=None, user_ids=None):
+        """Sessions started between start_day and end_day inclusive, with their duration in seconds
+
+        When `user_ids` is given, only those users' sessions are returned.
+        """
+        sessions = self.sessions
+        started = sessions['started_at'].dt.normalize()
+        mask = pd.Series(True, index=sessions.index)
+        if start_day is not None:
+            mask &= started >= pd.Timestamp(start_day)
+        if end_day is not None:
+            mask &= started <= pd.Timestamp(end_day)
+        if user_ids is not None:
+            mask &= sessions['user_id'].isin(list(user_ids))
+        selected = sessions[mask].copy()
+        selected['duration_seconds'] = (selected['ended_at'] - selected['started_at']).dt.total_seconds()
+        return selected.reset_index(drop=True)
+
+
+def user_session_stats(sessions_df):
+    """Per-user session statistics from a frame returned by AppSessionIndex.sessions_between()
+
+    Returns
+    -------
+    pd.DataFrame
+        user_id, session_count, event_count, total_duration_seconds, avg_duration_seconds,
+        median_duration_seconds, avg_events_per_session and last_session_at, busiest users first.
+    """
+    columns = ['user_id', 'session_count', 'event_count', 'total_duration_seconds', 'avg_duration_seconds',
+               'median_duration_seconds', 'avg_events_per_session', 'last_session_at']
+    sessions_df = sessions_df[sessions_df['user_id'].notna()] if not sessions_df.empty else sessions_df
+    if sessions_df.empty:
+        return pd.DataFrame(columns=columns)
+    stats = sessions_df.groupby('user_id').agg(
+        session_count=('session_id', 'count'),
+        event_count=('event_count', 'sum'),
+        total_duration_seconds=('duration_seconds', 'sum'),
+        avg_duration_seconds=('duration_seconds', 'mean'),
+        median_duration_seconds=('duration_seconds', 'median'),
+        last_session_at=('ended_at', 'max')
+    ).reset_index()
+    stats['avg_events_per_session'] = stats['event_count'] / stats['session_count']
+    stats['user_id'] = stats['user_id'].astype(np.int64)
+    return stats[columns].sort_values(['session_count', 'event_count'], ascending=False).reset_index(drop=True)
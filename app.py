@@ -4,8 +4,21 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
+import os
 from auth import auth_manager
-from database import DatabaseConnection
+from database import DatabaseConnection, SESSION_BACKFILL_DAYS
+from log_cursors import LOG_PAGE_SIZE, next_log_cursor
+from activity_index import UserLastSeenIndex, DailyActiveBitmapIndex, AppSessionIndex, user_session_stats, attribute_entity_counts, entity_total
+from relay_sketches import RelaySketchStore, hll_error_bound
+from snapshot_store import LogSnapshotStore
+from log_analytics import LogAnalyticsEngine, build_log_metadata, pivot_status_transitions, summarise_logs
+from log_summary import LogSummaryService, choose_time_bucket, hour_weekday_matrix
+from query_cache import QueryCache, log_query_key
+from dimensions import WaypointDimension
+from live_tail import LiveLogTail
+from user_search import UserPrefixIndex
+from access_scope import AccessScope
+from licence_intervals import LicenceIntervalIndex
 
 # Require authentication before showing dashboard
 auth_manager.require_auth()
@@ -555,18 +568,132 @@ def delete_confirmation_dialog():
             st.session_state.delete_license_id = None
 
 # Load data function
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_license_data():
-    db = DatabaseConnection()
+@st.cache_data(ttl=300)  # Cache for 5 minutes, per company/partner scope
+def load_license_data(company_id=None, partner_id=None):
+    db = DatabaseConnection(AccessScope(company_id, partner_id))
     # Use default date range for initial load
     default_start = datetime.now().date() - timedelta(days=365)
     default_end = datetime.now().date()
-    df = db.fetch_license_data(start_date=default_start, end_date=default_end)
+    # Rounds overlapping the last year, so multi-year rounds still in force are included
+    df = db.fetch_license_data(start_date=default_start, end_date=default_end, overlapping=True)
     return df if df is not None else pd.DataFrame()
 
+# Local directory for persisted indexes
+DATA_DIR = st.secrets.get("storage", {}).get("data_dir", "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+ACTIVE_BITMAP_PATH = os.path.join(DATA_DIR, "daily_active_users.npz")
+RELAY_SKETCH_PATH = os.path.join(DATA_DIR, "relay_device_sketches.npz")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+
+# Per-user last-seen index shared across sessions and reruns
+@st.cache_resource
+def get_last_seen_index():
+    return UserLastSeenIndex()
+
+# Per-session app_log aggregates, extended incrementally from an id watermark
+@st.cache_resource
+def get_app_session_index():
+    return AppSessionIndex()
+
+# Prefix index over active user names and emails for the user typeahead
+@st.cache_resource
+def get_user_prefix_index():
+    return UserPrefixIndex()
+
+# Daily active user bitmaps, loaded from disk once and extended incrementally
+@st.cache_resource
+def get_active_bitmap_index():
+    return DailyActiveBitmapIndex.load(ACTIVE_BITMAP_PATH)
+
+# Daily relay device sketches for the approximate relay count mode
+@st.cache_resource
+def get_relay_sketch_store():
+    return RelaySketchStore.load(RELAY_SKETCH_PATH)
+
+# Embedded DuckDB engine over the local log snapshots (None when DuckDB is not installed)
+@st.cache_resource
+def get_log_analytics_engine():
+    if not LogAnalyticsEngine.is_supported():
+        return None
+    return LogAnalyticsEngine(LogSnapshotStore(SNAPSHOT_DIR))
+
+# Concurrent, cached summary aggregates for the live logs dashboard
+@st.cache_resource
+def get_log_summary_service():
+    return LogSummaryService(DatabaseConnection())
+
+# Log pages shared across sessions and reruns, keyed on the normalised filter signature
+@st.cache_resource
+def get_log_query_cache():
+    return QueryCache(max_entries=256, ttl_seconds=300)
+
+# Waypoint names and status labels, reloaded only when the dimension tables change
+@st.cache_resource
+def get_waypoint_dimension():
+    return WaypointDimension()
+
+def load_logs_page(db, log_source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None,
+                   page_size=LOG_PAGE_SIZE, before=None):
+    """One page of logs matching the full filter set, served from the shared log query cache"""
+    loaders = {
+        "All Sources": db.get_unified_logs,
+        "Portal": db.get_portal_logs,
+        "App": db.get_app_logs,
+        "Waypoint": db.get_waypoint_logs
+    }
+    if log_source not in loaders:
+        return pd.DataFrame()
+    filters = dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id,
+                   partner_id=partner_id, page_size=page_size, before=before)
+    return get_log_query_cache().get_or_load(log_query_key(log_source, **filters, scope=db.scope), lambda: loaders[log_source](**filters))
+
+def load_approximate_relay_devices(db, window_days, users_df, user_role=None, user_company_id=None, user_partner_id=None):
+    """Estimate active relay devices per user and per entity by merging daily sketches"""
+    store = get_relay_sketch_store()
+    store.refresh(db, path=RELAY_SKETCH_PATH)
+    window_end = datetime.now().date()
+    window_start = window_end - timedelta(days=window_days)
+    
+    # Apply the same role-based restriction as the exact query
+    company_ids = partner_ids = None
+    if user_role == "Company User" and user_company_id:
+        company_ids, partner_ids = {int(user_company_id)}, set()
+    elif user_role == "Partner Admin" and user_partner_id:
+        partner_ids = {int(user_partner_id)}
+        company_ids = set(db.get_entity_hierarchy().companies_of(user_partner_id))
+    
+    company_names = {c['id']: c['company_name'] for c in db.get_active_companies()}
+    partner_names = {p['id']: p['name'] for p in db.get_active_partners()}
+    
+    # User-level estimates, labelled like get_active_relay_devices()
+    user_counts = store.window_counts('User', window_start, window_end)
+    user_relay_df = user_counts.merge(users_df[['id', 'user_name', 'email', 'company_id', 'partner_id']], left_on='entity_id', right_on='id', how='left')
+    if company_ids is not None:
+        user_relay_df = user_relay_df[user_relay_df['company_id'].isin(company_ids) | user_relay_df['partner_id'].isin(partner_ids)]
+    user_relay_df = user_relay_df.assign(
+        user_id=user_relay_df['entity_id'],
+        company_name=user_relay_df['company_id'].map(company_names),
+        partner_name=user_relay_df['partner_id'].map(partner_names)
+    )[['user_id', 'user_name', 'email', 'company_name', 'partner_name', 'active_relay_devices']]
+    
+    # Entity-level estimates merge the entity sketches directly, so shared devices count once
+    company_counts = store.window_counts('Company', window_start, window_end, entity_ids=company_ids)
+    company_counts['entity_name'] = company_counts['entity_id'].map(company_names)
+    partner_counts = store.window_counts('Partner', window_start, window_end, entity_ids=partner_ids)
+    partner_counts['entity_name'] = partner_counts['entity_id'].map(partner_names)
+    relay_aggregated_df = pd.concat([company_counts, partner_counts], ignore_index=True).dropna(subset=['entity_name'])
+    
+    return user_relay_df.sort_values('active_relay_devices', ascending=False), relay_aggregated_df
+
+# Company users and partner admins only ever query their own tenant's rows
+current_scope = AccessScope.from_user(auth_manager.get_current_user())
+if current_scope.denied:
+    st.error("Your account is not linked to a company or partner. Please contact an administrator.")
+    st.stop()
+
 # Load data
 if st.session_state.df_data is None:
-    st.session_state.df_data = load_license_data()
+    st.session_state.df_data = load_license_data(current_scope.company_id, current_scope.partner_id)
 df = st.session_state.df_data
 
 # Check if DataFrame is empty
@@ -719,6 +846,25 @@ with st.sidebar:
         else:
             product_filter = []
     
+    # Activity window used for active user counts (served from the daily activity rollup)
+    activity_window_options = [7, 14, 30, 90]
+    activity_window_days = st.selectbox(
+        "⏱️ Activity Window",
+        options=activity_window_options,
+        index=activity_window_options.index(14),
+        format_func=lambda days: f"Last {days} days",
+        help="Users count as active if they have any app activity (fido1.app_log) within this window; waypoint and portal logs are not counted"
+    )
+    
+    relay_count_mode = st.radio(
+        "🔗 Relay Device Counts",
+        options=["Exact", "Approximate"],
+        horizontal=True,
+        help=f"Both modes count each device once per company or partner, however many users used it. "
+             f"Approximate mode merges daily HyperLogLog sketches instead of scanning relay activity; "
+             f"estimates are typically within ±{2 * hll_error_bound():.1%} of the exact count"
+    )
+    
     # Database status
     st.markdown("---")
     st.success("🗄️ Live Database Connected")
@@ -728,9 +874,10 @@ if not df.empty:
     df['start_date'] = pd.to_datetime(df['start_date']).dt.date
     df['end_date'] = pd.to_datetime(df['end_date']).dt.date
 
-# Apply filters
+# Apply filters; licence_window_df holds the rounds overlapping the date range, for seat counts
 if df.empty:
     filtered_df = df.copy()
+    licence_window_df = df.copy()
 elif len(date_range) == 2:
     # Create entity column for filtering if it doesn't exist
     if 'entity' not in df.columns:
@@ -756,18 +903,25 @@ elif len(date_range) == 2:
         df_filtered_by_dashboard = df
     
     base_filter = (
-        (df_filtered_by_dashboard['start_date'] >= date_range[0]) & 
-        (df_filtered_by_dashboard['start_date'] <= date_range[1]) &
         (df_filtered_by_dashboard['entity'].isin(companies)) &
         (df_filtered_by_dashboard['status'].isin(status_filter))
     )
+    starts_in_range = (
+        (df_filtered_by_dashboard['start_date'] >= date_range[0]) & 
+        (df_filtered_by_dashboard['start_date'] <= date_range[1])
+    )
+    overlaps_range = (
+        (df_filtered_by_dashboard['start_date'] <= date_range[1]) &
+        (df_filtered_by_dashboard['end_date'].isna() | (df_filtered_by_dashboard['end_date'] >= date_range[0]))
+    )
     # Add currency filter if available
     if currency_filter and 'currency' in df_filtered_by_dashboard.columns:
         base_filter = base_filter & (df_filtered_by_dashboard['currency'].isin(currency_filter))
     # Add product code filter if available
     if product_filter and 'product_code' in df_filtered_by_dashboard.columns:
         base_filter = base_filter & (df_filtered_by_dashboard['product_code'].isin(product_filter))
-    filtered_df = df_filtered_by_dashboard[base_filter].copy()
+    filtered_df = df_filtered_by_dashboard[base_filter & starts_in_range].copy()
+    licence_window_df = df_filtered_by_dashboard[base_filter & overlaps_range].copy()
 else:
     # Create entity column for filtering if it doesn't exist
     if 'entity' not in df.columns:
@@ -803,6 +957,7 @@ else:
     if product_filter and 'product_code' in df_filtered_by_dashboard.columns:
         base_filter = base_filter & (df_filtered_by_dashboard['product_code'].isin(product_filter))
     filtered_df = df_filtered_by_dashboard[base_filter].copy()
+    licence_window_df = filtered_df
 
 # Create unified entity column for merging with user/active user data
 if not filtered_df.empty:
@@ -825,30 +980,23 @@ if 'user_count' not in filtered_df.columns:
 if 'active_users' not in filtered_df.columns:
     filtered_df = filtered_df.assign(active_users=0)
 
-# Fetch active users per company
-db = DatabaseConnection()
-active_users_df = db.get_active_users_per_company()
+# Active users per company/partner from the per-user last-seen index
+db = DatabaseConnection(current_scope)
+last_seen_index = get_last_seen_index()
+last_seen_index.refresh(db)
 
-# Merge active user data with filtered_df
-if not active_users_df.empty and not filtered_df.empty:
-    # Ensure entity column exists before merge
-    if 'entity' not in filtered_df.columns:
-        filtered_df['entity'] = filtered_df.apply(lambda row: 
-            row.get('partner', '') if pd.notna(row.get('partner')) and row.get('partner') 
-            else row.get('company', ''), axis=1)
-    
-    filtered_df = filtered_df.merge(active_users_df[['entity_name', 'active_users']], left_on='entity', right_on='entity_name', how='left')
-    # Use active_users_y if it exists, else fill with 0
-    if 'active_users_y' in filtered_df.columns:
-        filtered_df = filtered_df.assign(active_users=filtered_df['active_users_y'].fillna(0))
-    elif 'active_users' not in filtered_df.columns:
-        filtered_df = filtered_df.assign(active_users=0)
+# Active users over the filtered entities, each counted once however many rounds it holds
+active_users_total = 0
+if not filtered_df.empty:
+    if len(last_seen_index):
+        entity_active_df = last_seen_index.active_users_per_entity(activity_window_days)
     else:
-        filtered_df = filtered_df.assign(active_users=filtered_df['active_users'].fillna(0))
-    # Cleanup extra columns from merge
-    columns_to_drop = [col for col in ['active_users_x', 'active_users_y', 'entity_name'] if col in filtered_df.columns]
-    if columns_to_drop:
-        filtered_df = filtered_df.drop(columns=columns_to_drop)
+        # Index unavailable - fall back to the per-entity SQL aggregate
+        entity_active_df = db.get_active_users_per_entity(activity_days=activity_window_days)
+    if not entity_active_df.empty:
+        # One count per entity, copied onto each of its licence rounds
+        filtered_df = filtered_df.assign(active_users=attribute_entity_counts(filtered_df, entity_active_df))
+        active_users_total = entity_total(filtered_df, entity_active_df)
 
 # Fetch user count from users_portal table
 user_count_df = db.get_user_count_from_portal()
@@ -880,32 +1028,32 @@ user_role = current_user.get('role', 'Admin') if current_user else 'Admin'
 user_company_id = current_user.get('company_id') if current_user else None
 user_partner_id = current_user.get('partner_id') if current_user else None
 
-active_relay_devices_df = db.get_active_relay_devices(
-    user_role=user_role,
-    user_company_id=user_company_id,
-    user_partner_id=user_partner_id
-)
-
-# Process active relay devices data - aggregate by company and partner
-if not active_relay_devices_df.empty:
-    # Create entity-based aggregation for dashboard display
-    company_relay_data = active_relay_devices_df.groupby('company_name').agg({
-        'active_relay_devices': 'sum'
-    }).reset_index()
-    company_relay_data['entity_name'] = company_relay_data['company_name']
-    company_relay_data['entity_type'] = 'Company'
-    
-    # Handle partner data (some users might have direct partner relationships)
-    partner_relay_data = active_relay_devices_df[active_relay_devices_df['partner_name'].notna()].groupby('partner_name').agg({
-        'active_relay_devices': 'sum'
-    }).reset_index()
-    partner_relay_data['entity_name'] = partner_relay_data['partner_name']
-    partner_relay_data['entity_type'] = 'Partner'
-    
-    # Combine company and partner data
-    relay_aggregated_df = pd.concat([company_relay_data, partner_relay_data], ignore_index=True)
+if relay_count_mode == 'Approximate':
+    active_relay_devices_df, relay_aggregated_df = load_approximate_relay_devices(
+        db,
+        activity_window_days,
+        last_seen_index.users,
+        user_role=user_role,
+        user_company_id=user_company_id,
+        user_partner_id=user_partner_id
+    )
 else:
-    relay_aggregated_df = pd.DataFrame(columns=['entity_name', 'active_relay_devices'])
+    active_relay_devices_df = db.get_active_relay_devices(
+        user_role=user_role,
+        user_company_id=user_company_id,
+        user_partner_id=user_partner_id,
+        activity_days=activity_window_days
+    )
+
+    # Entity totals count distinct devices, so a device shared by several users counts once
+    relay_aggregated_df = db.get_active_relay_devices_per_entity(
+        user_role=user_role,
+        user_company_id=user_company_id,
+        user_partner_id=user_partner_id,
+        activity_days=activity_window_days
+    )
+    if relay_aggregated_df.empty:
+        relay_aggregated_df = pd.DataFrame(columns=['entity_name', 'active_relay_devices'])
 
 # Merge active relay devices data with filtered_df
 if not relay_aggregated_df.empty and not filtered_df.empty:
@@ -950,8 +1098,10 @@ if st.session_state.selected_dashboard == 'System Logs':
     st.subheader("📋 System Activity Logs")
     
     # Load filter options
-    db = DatabaseConnection()
-    filter_options = db.get_log_filters()
+    db = DatabaseConnection(current_scope)
+    filter_options = db.get_log_filters(include_users=False)
+    user_index = get_user_prefix_index()
+    user_index.refresh(db)
     
     # Filters Section
     with st.expander("🔍 Log Filters", expanded=True):
@@ -965,12 +1115,24 @@ if st.session_state.selected_dashboard == 'System Logs':
                 help="Filter logs by date range"
             )
             
-            # User filter
-            user_options = [f"{user['name']} ({user['email']})" for user in filter_options['users']]
-            user_options.insert(0, "All Users")
-            selected_user = st.selectbox(
-                "👤 User",
-                options=user_options,
+            # User filter - a typeahead over the prefix index; the options carry the user id
+            user_search = st.text_input("👤 User", placeholder="Type a name or email...", key="logs_user_search",
+                                        help="Shows the first 20 users whose name, any word of it, or email starts with the text")
+            in_scope_user_ids = None
+            if current_scope.is_restricted:
+                in_scope_user_ids = db.get_entity_hierarchy().users_of(current_scope.company_id, current_scope.partner_id)
+            user_matches = user_index.search(user_search, allowed_ids=in_scope_user_ids)
+            user_labels = dict(zip(user_matches['id'], user_matches['user_name'] + " (" + user_matches['email'].fillna('') + ")"))
+            selected_user_id = st.session_state.get('logs_user_id')
+            if selected_user_id is not None and selected_user_id not in user_labels:
+                # Keep the current selection available while a new search is typed
+                user_labels[selected_user_id] = user_index.label(selected_user_id) or f"User #{selected_user_id}"
+            selected_user_id = st.selectbox(
+                "Matching users",
+                options=[None] + list(user_labels),
+                format_func=lambda option: "All Users" if option is None else user_labels[option],
+                key="logs_user_id",
+                label_visibility="collapsed",
                 help="Filter by specific user"
             )
         
@@ -1002,21 +1164,45 @@ if st.session_state.selected_dashboard == 'System Logs':
                 help="Select which log source to view"
             )
             
+            # Query source - local snapshots give exact summaries over the full history
+            analytics_engine = get_log_analytics_engine()
+            query_source_options = ["Live Database"]
+            if analytics_engine is not None and analytics_engine.has_data():
+                query_source_options.append("Local Snapshots")
+            selected_query_source = st.radio(
+                "🗄️ Query Source",
+                options=query_source_options,
+                horizontal=True,
+                help="Local Snapshots query the Parquet log exports with DuckDB: summaries cover every matching row and MySQL is not touched. Run `python snapshot_store.py` to update them."
+            )
+            
+            # Rows fetched per page; "Load more" fetches the next page after the last row shown
+            logs_page_size = st.selectbox(
+                "📄 Page Size",
+                options=[250, 500, 1000, 2500],
+                index=[250, 500, 1000, 2500].index(LOG_PAGE_SIZE),
+                help="Number of log rows fetched per page"
+            )
+            
             # Refresh button
             if st.button("🔄 Refresh Logs", type="primary", use_container_width=True, key="logs_refresh"):
+                st.session_state.pop('logs_page_key', None)
+                get_log_query_cache().invalidate()
+                get_log_summary_service().cache.invalidate()
                 st.rerun()
-    
-    # Prepare filter parameters for Python filtering
+            
+            # Live tail polls only the rows newer than each source's last seen row
+            live_tail_enabled = st.toggle("🔴 Live Tail", key="logs_live_tail",
+                                          help="Follow new log rows without re-running the full query")
+            live_tail_interval = st.selectbox("⏱️ Poll Every", options=[5, 10, 30, 60], index=1,
+                                              format_func=lambda seconds: f"{seconds} s", key="logs_live_tail_interval",
+                                              disabled=not live_tail_enabled)
+    
+    # Prepare filter parameters - applied in SQL by the log queries
     start_date = date_range[0] if len(date_range) > 0 else None
     end_date = date_range[1] if len(date_range) > 1 else None
     
-    user_id = None
-    if selected_user != "All Users":
-        user_name = selected_user.split(" (")[0]
-        for user in filter_options['users']:
-            if user['name'] == user_name:
-                user_id = user['id']
-                break
+    user_id = None if selected_user_id is None else int(selected_user_id)
     
     company_id = None
     if selected_company != "All Companies":
@@ -1032,76 +1218,115 @@ if st.session_state.selected_dashboard == 'System Logs':
                 partner_id = partner['id']
                 break
     
-    # Cache key for logs data - only changes when date range changes
-    logs_cache_key = f"logs_{start_date}_{end_date}"
-    
-    # Load the base logs data (only filtered by date) - cached function
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def load_logs_data(_start_date, _end_date, _log_source):
-        """Load logs data with date filtering only - other filters applied in Python"""
-        if _log_source == "All Sources":
-            return db.get_unified_logs(start_date=_start_date, end_date=_end_date)
-        elif _log_source == "Portal":
-            return db.get_portal_logs(start_date=_start_date, end_date=_end_date)
-        elif _log_source == "App":
-            return db.get_app_logs(start_date=_start_date, end_date=_end_date)
-        elif _log_source == "Waypoint":
-            return db.get_waypoint_logs(start_date=_start_date, end_date=_end_date)
-        else:
-            return pd.DataFrame()
-    
-    # Load the base logs data (only filtered by date)
-    base_logs_df = load_logs_data(start_date, end_date, selected_log_source)
-    
-    # Apply Python filters to the base data - optimized for performance
-    filtered_logs_df = base_logs_df.copy()
-    
-    if not filtered_logs_df.empty:
-        # Apply filters efficiently - use boolean indexing
-        mask = pd.Series([True] * len(filtered_logs_df), index=filtered_logs_df.index)
-        
-        # Apply user filter
-        if user_id is not None:
-            if selected_log_source == "App":
-                mask &= filtered_logs_df['metadata'].str.contains(f'"user_id": {user_id}', na=False)
-            elif selected_log_source == "Waypoint":
-                mask &= filtered_logs_df['metadata'].str.contains(f'"user_id": {user_id}', na=False)
-            elif selected_log_source == "Portal":
-                user_name = selected_user.split(" (")[0]
-                user_email = selected_user.split(" (")[1].rstrip(")")
-                mask &= ((filtered_logs_df['user_name'] == user_name) | 
-                        (filtered_logs_df['user_email'] == user_email))
-        
-        # Apply company filter
-        if company_id is not None:
-            company_name = selected_company
-            mask &= filtered_logs_df['company_name'] == company_name
-        
-        # Apply partner filter
-        if partner_id is not None:
-            partner_name = selected_partner
-            mask &= filtered_logs_df['partner_name'] == partner_name
-        
-        # Apply the combined mask
-        filtered_logs_df = filtered_logs_df[mask]
-    
+    # Snapshot engines only take filters, so the session's scope also narrows them
+    company_id, partner_id = current_scope.apply_to_filters(company_id, partner_id)
+    
+    # Page cursors loaded so far; any change of filters starts again from the newest page
+    logs_page_key = (start_date, end_date, user_id, company_id, partner_id, selected_log_source, selected_query_source, logs_page_size)
+    if st.session_state.get('logs_page_key') != logs_page_key:
+        st.session_state.logs_page_key = logs_page_key
+        st.session_state.logs_page_cursors = [None]
+    
+    waypoint_dimension = get_waypoint_dimension()
+    waypoint_dimension.refresh(db)
+    
+    if live_tail_enabled:
+        # The ring buffer lives in the session and starts again whenever the filters change
+        live_tail_key = (user_id, company_id, partner_id, selected_log_source)
+        if st.session_state.get('live_tail_key') != live_tail_key:
+            st.session_state.live_tail_key = live_tail_key
+            st.session_state.live_tail = LiveLogTail(
+                user_id=user_id,
+                company_id=company_id,
+                partner_id=partner_id,
+                log_type=None if selected_log_source == "All Sources" else selected_log_source
+            )
+        
+        # Only this fragment reruns on each poll
+        @st.fragment(run_every=live_tail_interval)
+        def show_live_tail():
+            live_tail = st.session_state.live_tail
+            new_rows = live_tail.poll(db)
+            st.caption(f"🔴 **Live:** {len(live_tail)} of the latest {live_tail.capacity} rows · {new_rows} new in the last poll · "
+                       f"polling every {live_tail_interval} s (date range ignored)")
+            tail_df = waypoint_dimension.label_logs(live_tail.rows())
+            if tail_df.empty:
+                st.info("Waiting for new log rows...")
+                return
+            tail_df['log_type_icon'] = tail_df['log_source'].map({'portal_logs': '🌐', 'app_log': '📱', 'waypoint_logs': '📍'})
+            st.dataframe(
+                tail_df[['timestamp', 'log_type_icon', 'user_name', 'action', 'status', 'company_name', 'partner_name', 'waypoint_name']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'timestamp': st.column_config.DatetimeColumn('Timestamp', format='DD-MM-YYYY HH:mm:ss'),
+                    'log_type_icon': st.column_config.TextColumn('Type', width="small"),
+                    'user_name': st.column_config.TextColumn('User', width="medium"),
+                    'action': st.column_config.TextColumn('Action', width="medium"),
+                    'status': st.column_config.TextColumn('Status', width="small"),
+                    'company_name': st.column_config.TextColumn('Company', width="medium"),
+                    'partner_name': st.column_config.TextColumn('Partner', width="medium"),
+                    'waypoint_name': st.column_config.TextColumn('Waypoint', width="medium")
+                }
+            )
+        
+        st.subheader("🔴 Live Tail")
+        show_live_tail()
+    
+    if selected_query_source == "Local Snapshots":
+        # Every filter is pushed into DuckDB, and summaries aggregate all matching rows
+        # The engine is shared by every session: its dimensions come from unscoped queries, and
+        # this session's scope is already folded into company_id / partner_id by apply_to_filters
+        analytics_engine.refresh(DatabaseConnection())
+        snapshot_filters = dict(
+            start_date=start_date,
+            end_date=end_date,
+            user_id=user_id,
+            company_id=company_id,
+            partner_id=partner_id,
+            log_type=None if selected_log_source == "All Sources" else selected_log_source
+        )
+        logs_pages = [
+            analytics_engine.unified_logs(**snapshot_filters, page_size=logs_page_size, before=cursor)
+            for cursor in st.session_state.logs_page_cursors
+        ]
+        base_logs_df = waypoint_dimension.label_logs(pd.concat(logs_pages, ignore_index=True))
+        filtered_logs_df = base_logs_df
+        logs_summary = analytics_engine.summary(**snapshot_filters)
+    else:
+        # Summary aggregates run in the background while the pages are fetched
+        summary_future = get_log_summary_service().submit(
+            start_date=start_date,
+            end_date=end_date,
+            user_id=user_id,
+            company_id=company_id,
+            partner_id=partner_id,
+            log_type=None if selected_log_source == "All Sources" else selected_log_source,
+            scope=current_scope
+        )
+        
+        # Load the logs data, one cached page per cursor
+        logs_pages = [
+            load_logs_page(db, selected_log_source, start_date, end_date, user_id, company_id, partner_id, logs_page_size, cursor)
+            for cursor in st.session_state.logs_page_cursors
+        ]
+        base_logs_df = waypoint_dimension.label_logs(pd.concat(logs_pages, ignore_index=True))
+        filtered_logs_df = base_logs_df
+        
+        try:
+            logs_summary = summary_future.result()
+        except Exception as e:
+            # Not cached: the next rerun submits the aggregates again
+            st.warning(f"Log summary could not be computed ({e}); the figures below cover the loaded rows only.")
+            logs_summary = summarise_logs(base_logs_df)
+
     # Calculate top performers from the filtered data
     def calculate_top_performers(logs_df, performance_type):
         """Calculate top performers from filtered logs data"""
         if logs_df.empty:
             return pd.DataFrame()
         
-        if performance_type == "sessions":
-            # Count unique sessions per user
-            if 'session_id' in logs_df.columns:
-                session_counts = logs_df[logs_df['session_id'].notna()].groupby('user_name').agg({
-                    'session_id': 'nunique',
-                    'user_email': 'first'
-                }).reset_index()
-                session_counts.columns = ['user_name', 'session_count', 'email']
-                return session_counts.nlargest(3, 'session_count')
-        
-        elif performance_type == "waypoints":
+        if performance_type == "waypoints":
             # Count waypoint activities per user
             if 'waypoint_id' in logs_df.columns:
                 waypoint_counts = logs_df[logs_df['waypoint_id'].notna()].groupby('user_name').agg({
@@ -1113,8 +1338,23 @@ if st.session_state.selected_dashboard == 'System Logs':
         
         return pd.DataFrame()
     
+    # Session statistics cover every app session started in the date range, not just the loaded pages
+    session_index = get_app_session_index()
+    session_index.refresh(db)
+    session_users = get_last_seen_index().users
+    session_user_ids = None
+    if company_id or partner_id:
+        # A partner covers its own users and the users of every company under it
+        session_user_ids = db.get_entity_hierarchy().users_of(company_id, partner_id)
+    if user_id:
+        session_user_ids = {user_id} if session_user_ids is None else session_user_ids & {user_id}
+    sessions_df = session_index.sessions_between(start_date, end_date, session_user_ids)
+    session_stats_df = user_session_stats(sessions_df).merge(
+        session_users[['id', 'user_name', 'email']].rename(columns={'id': 'user_id'}), on='user_id', how='left'
+    )
+    top_users_sessions = session_stats_df.head(3)
+    
     # Calculate top performers from filtered data
-    top_users_sessions = calculate_top_performers(filtered_logs_df, "sessions")
     top_users_waypoints = calculate_top_performers(filtered_logs_df, "waypoints")
     
     # Ranking Panels
@@ -1123,7 +1363,9 @@ if st.session_state.selected_dashboard == 'System Logs':
 
     # Debug: Show what filters are being applied
     st.caption(f"🔍 **Debug Info:** Date range: {date_range[0]} to {date_range[1]}, User: {user_id}, Company: {company_id}, Partner: {partner_id}")
-    st.caption(f"📊 **Data Source:** {len(base_logs_df)} total records, {len(filtered_logs_df)} after filtering")
+    log_cache_stats = get_log_query_cache().stats()
+    st.caption(f"📊 **Data Source:** {len(base_logs_df)} records loaded · log query cache: {log_cache_stats['entries']} pages, "
+               f"{log_cache_stats['hits']} hits / {log_cache_stats['misses']} misses ({log_cache_stats['hit_rate']:.0%})")
     
     # Performance monitoring
     if len(base_logs_df) > 500:
@@ -1141,7 +1383,7 @@ if st.session_state.selected_dashboard == 'System Logs':
                     with col_info:
                         st.write(f"**{row['user_name']}**")
                         st.write(f"✉️ {row['email']}")
-                        st.write(f"📊 {row['session_count']} sessions")
+                        st.write(f"📊 {row['session_count']} sessions · avg {row['avg_duration_seconds'] / 60:.0f} min")
         else:
             st.info("📊 No session activity recorded in this period")
 
@@ -1161,6 +1403,39 @@ if st.session_state.selected_dashboard == 'System Logs':
         else:
             st.info("📊 No waypoint activity recorded in this period")
     
+    # Session analytics
+    st.subheader("🕒 App Sessions")
+    st.caption(f"📊 *Sessions started in the selected date range (history from the last {SESSION_BACKFILL_DAYS} days), with duration from first to last event*")
+    if not sessions_df.empty:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Sessions", f"{len(sessions_df):,}")
+        with col2:
+            st.metric("Users with Sessions", f"{len(session_stats_df):,}")
+        with col3:
+            st.metric("Median Duration", f"{sessions_df['duration_seconds'].median() / 60:.1f} min")
+        with col4:
+            st.metric("Avg Events / Session", f"{sessions_df['event_count'].mean():.1f}")
+        
+        st.dataframe(
+            session_stats_df[['user_name', 'email', 'session_count', 'event_count', 'avg_duration_seconds',
+                              'median_duration_seconds', 'avg_events_per_session', 'last_session_at']],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'user_name': st.column_config.TextColumn('User'),
+                'email': st.column_config.TextColumn('Email'),
+                'session_count': st.column_config.NumberColumn('Sessions'),
+                'event_count': st.column_config.NumberColumn('Events'),
+                'avg_duration_seconds': st.column_config.NumberColumn('Avg Duration (s)', format='%.0f'),
+                'median_duration_seconds': st.column_config.NumberColumn('Median Duration (s)', format='%.0f'),
+                'avg_events_per_session': st.column_config.NumberColumn('Events / Session', format='%.1f'),
+                'last_session_at': st.column_config.DatetimeColumn('Last Session', format='DD-MM-YYYY HH:mm')
+            }
+        )
+    else:
+        st.info("📊 No app sessions recorded in this period")
+    
     # Load and display logs
     st.subheader("📋 Activity Logs")
     
@@ -1188,9 +1463,31 @@ if st.session_state.selected_dashboard == 'System Logs':
             }.get(selected_log_source, '📋')
             display_df['log_type_icon'] = default_icon
         
+        # Metadata JSON and the heavy detail columns are only loaded when asked for
+        display_columns = ['timestamp', 'log_type_icon', 'user_name', 'action', 'status', 'company_name', 'partner_name', 'session_id', 'waypoint_id', 'waypoint_name']
+        col_details, col_metadata = st.columns(2)
+        with col_details:
+            show_log_details = st.checkbox("📝 Load notes & object data", key="logs_show_details",
+                                           help="Fetches notes and object data for the loaded rows in batched id lookups")
+        with col_metadata:
+            show_log_metadata = st.checkbox("🧾 Show metadata", key="logs_show_metadata")
+        if show_log_details:
+            detail_keys = display_df[['log_source', 'log_id']]
+            details_cache_key = ('log_details', selected_query_source, tuple(map(tuple, detail_keys.astype(str).to_numpy())))
+            if selected_query_source == "Local Snapshots":
+                log_details_df = get_log_query_cache().get_or_load(details_cache_key, lambda: analytics_engine.log_details(detail_keys))
+            else:
+                log_details_df = get_log_query_cache().get_or_load(details_cache_key, lambda: db.get_log_details(detail_keys))
+            if not log_details_df.empty:
+                display_df = display_df.merge(log_details_df.astype({'log_id': display_df['log_id'].dtype}), on=['log_source', 'log_id'], how='left')
+                display_columns += ['notes', 'object_data']
+        if show_log_metadata:
+            display_df['metadata'] = build_log_metadata(display_df)
+            display_columns.append('metadata')
+        
         # Display the logs table
         st.dataframe(
-            display_df[['timestamp', 'log_type_icon', 'user_name', 'action', 'status', 'company_name', 'partner_name', 'session_id', 'waypoint_id', 'notes']],
+            display_df[display_columns],
             use_container_width=True,
             column_config={
                 'timestamp': st.column_config.DatetimeColumn('Timestamp', format='DD-MM-YYYY HH:mm:ss'),
@@ -1202,46 +1499,57 @@ if st.session_state.selected_dashboard == 'System Logs':
                 'partner_name': st.column_config.TextColumn('Partner', width="medium"),
                 'session_id': st.column_config.TextColumn('Session ID', width="small"),
                 'waypoint_id': st.column_config.TextColumn('Waypoint ID', width="small"),
-                'notes': st.column_config.TextColumn('Notes', width="large")
+                'waypoint_name': st.column_config.TextColumn('Waypoint', width="medium"),
+                'notes': st.column_config.TextColumn('Notes', width="large"),
+                'object_data': st.column_config.TextColumn('Object Data', width="large"),
+                'metadata': st.column_config.TextColumn('Metadata', width="medium")
             },
             hide_index=True
         )
         
+        # Export the loaded rows with whichever detail columns are shown
+        st.download_button(
+            label="📥 Export Loaded Logs (CSV)",
+            data=display_df[[column for column in display_columns if column != 'log_type_icon'] + ['log_source']].to_csv(index=False),
+            file_name=f"logs_{start_date}_{end_date}.csv",
+            mime="text/csv",
+            key="logs_export"
+        )
+        
+        # Keyset pagination - the next page starts after the last row already loaded
+        next_cursor = next_log_cursor(logs_pages[-1], logs_page_size)
+        if next_cursor is not None:
+            if st.button(f"⬇️ Load {logs_page_size:,} more", key="logs_load_more"):
+                st.session_state.logs_page_cursors.append(next_cursor)
+                st.rerun()
+        
         # Summary statistics
         st.subheader("📊 Log Summary")
+        st.caption("📊 *Summary covers every matching log row, not just the pages loaded above*")
         col1, col2, col3, col4 = st.columns(4)
+        source_counts = logs_summary['source_counts']
         
         with col1:
-            total_logs = len(filtered_logs_df)
-            st.metric("Total Logs", f"{total_logs:,}")
+            st.metric("Total Logs", f"{logs_summary['total_logs']:,}")
         
         with col2:
-            unique_users = filtered_logs_df['user_name'].nunique()
-            st.metric("Unique Users", f"{unique_users:,}")
+            st.metric("Unique Users", f"{logs_summary['unique_users']:,}")
         
         with col3:
-            if 'log_source' in filtered_logs_df.columns:
-                log_types = filtered_logs_df['log_source'].value_counts()
-                portal_logs = log_types.get('portal_logs', 0)
-                st.metric("Portal Logs", f"{portal_logs:,}")
-            else:
-                st.metric("Portal Logs", "0")
+            portal_logs = source_counts.get('portal_logs', 0)
+            st.metric("Portal Logs", f"{portal_logs:,}")
         
         with col4:
-            if 'log_source' in filtered_logs_df.columns:
-                app_logs = log_types.get('app_log', 0)
-                waypoint_logs = log_types.get('waypoint_logs', 0)
-                st.metric("App/Waypoint Logs", f"{app_logs + waypoint_logs:,}")
-            else:
-                st.metric("App/Waypoint Logs", "0")
+            app_logs = source_counts.get('app_log', 0)
+            waypoint_logs = source_counts.get('waypoint_logs', 0)
+            st.metric("App/Waypoint Logs", f"{app_logs + waypoint_logs:,}")
         
         # Log type distribution chart
-        if 'log_source' in filtered_logs_df.columns and len(filtered_logs_df['log_source'].value_counts()) > 0:
+        if len(source_counts) > 0:
             st.subheader("📈 Log Type Distribution")
-            log_types = filtered_logs_df['log_source'].value_counts()
             fig_log_types = px.pie(
-                values=log_types.values,
-                names=log_types.index,
+                values=list(source_counts.values()),
+                names=list(source_counts.keys()),
                 title="Distribution of Log Types",
                 color_discrete_map={
                     'portal_logs': '#667eea',
@@ -1251,21 +1559,103 @@ if st.session_state.selected_dashboard == 'System Logs':
             )
             st.plotly_chart(fig_log_types, use_container_width=True)
         
-        # Activity timeline
+        # Activity timeline, bucketed in the database (or DuckDB) so only a few hundred points are plotted
         st.subheader("⏰ Activity Timeline")
-        # Use display_df which has the converted timestamp
-        timeline_df = display_df.groupby(display_df['timestamp'].dt.date).size().reset_index(name='count')
-        timeline_df.columns = ['date', 'activity_count']
+        col_bucket, col_split = st.columns(2)
+        with col_bucket:
+            selected_bucket = st.selectbox("🕐 Bucket", ["Auto", "Hour", "Day", "Week", "Month"], key="logs_timeline_bucket",
+                                           help="Auto picks the finest bucket that keeps the range to a few hundred points")
+        with col_split:
+            selected_split = st.radio("Split by", ["Source", "Company", "Partner"], horizontal=True, key="logs_timeline_split")
+        timeline_bucket = choose_time_bucket(start_date, end_date) if selected_bucket == "Auto" else selected_bucket.lower()
+        timeline_entity = None if selected_split == "Source" else selected_split.lower()
+        timeline_filters = dict(
+            start_date=start_date,
+            end_date=end_date,
+            user_id=user_id,
+            company_id=company_id,
+            partner_id=partner_id,
+            log_type=None if selected_log_source == "All Sources" else selected_log_source
+        )
+        if selected_query_source == "Local Snapshots":
+            timeline_df = analytics_engine.activity_buckets(timeline_bucket, timeline_entity, **timeline_filters)
+            hour_weekday_df = hour_weekday_matrix(analytics_engine.hour_weekday_counts(**timeline_filters))
+        else:
+            try:
+                timeline_df = get_log_summary_service().activity_buckets(timeline_bucket, timeline_entity, **timeline_filters, scope=current_scope)
+                hour_weekday_df = get_log_summary_service().hour_weekday(**timeline_filters, scope=current_scope)
+            except Exception as e:
+                st.error(f"Activity timeline could not be loaded: {e}")
+                timeline_df, hour_weekday_df = pd.DataFrame(), hour_weekday_matrix([])
         
         if not timeline_df.empty:
+            timeline_series = 'log_source'
+            if timeline_entity:
+                # One line per company or partner; beyond the 10 busiest the rest are grouped
+                entity_names = {entity['id']: entity['name'] for entity in filter_options[{'company': 'companies', 'partner': 'partners'}[timeline_entity]]}
+                timeline_df = timeline_df.dropna(subset=['entity_id'])
+                totals = timeline_df.groupby('entity_id')['activity_count'].sum().nlargest(10)
+                timeline_df = timeline_df.assign(entity_name=timeline_df['entity_id'].map(
+                    lambda entity_id: entity_names.get(int(entity_id), f"#{int(entity_id)}") if entity_id in totals.index else "Other"
+                ))
+                timeline_df = timeline_df.groupby(['bucket_start', 'entity_name'], as_index=False)['activity_count'].sum()
+                timeline_series = 'entity_name'
             fig_timeline = px.line(
                 timeline_df,
-                x='date',
+                x='bucket_start',
                 y='activity_count',
-                title="Daily Activity Count",
-                labels={'activity_count': 'Number of Activities', 'date': 'Date'}
+                color=timeline_series,
+                title=f"Activity Count per {timeline_bucket.title()}",
+                labels={'activity_count': 'Number of Activities', 'bucket_start': timeline_bucket.title(),
+                        'log_source': 'Source', 'entity_name': selected_split}
             )
             st.plotly_chart(fig_timeline, use_container_width=True)
+        
+        if hour_weekday_df.to_numpy().sum() > 0:
+            fig_hours = px.imshow(
+                hour_weekday_df,
+                aspect='auto',
+                color_continuous_scale='Blues',
+                title="Activity by Weekday and Hour",
+                labels={'x': 'Hour of Day', 'y': 'Weekday', 'color': 'Activities'}
+            )
+            st.plotly_chart(fig_hours, use_container_width=True)
+        
+        # Waypoint status transitions, aggregated per day and status pair in the database or snapshots
+        if selected_log_source in ("All Sources", "Waypoint"):
+            st.subheader("🔀 Waypoint Status Transitions")
+            transition_filters = dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id, partner_id=partner_id)
+            if selected_query_source == "Local Snapshots":
+                transitions_df = analytics_engine.status_transitions(**transition_filters)
+            else:
+                transitions_df = get_log_query_cache().get_or_load(
+                    ('waypoint_transitions', log_query_key(None, **transition_filters, scope=db.scope)),
+                    lambda: db.get_waypoint_status_transitions(**transition_filters)
+                )
+            
+            if transitions_df.empty:
+                st.info("No waypoint status changes for the selected filters.")
+            else:
+                transition_matrix = pivot_status_transitions(transitions_df, waypoint_dimension.status_labels)
+                fig_transitions = px.imshow(
+                    transition_matrix,
+                    text_auto=True,
+                    aspect='auto',
+                    color_continuous_scale='Purples',
+                    title="Status Changes (from → to)",
+                    labels={'x': 'To status', 'y': 'From status', 'color': 'Changes'}
+                )
+                st.plotly_chart(fig_transitions, use_container_width=True)
+                
+                daily_transitions = transitions_df.groupby('date', as_index=False)['transition_count'].sum()
+                fig_daily_transitions = px.bar(
+                    daily_transitions,
+                    x='date',
+                    y='transition_count',
+                    title="Daily Status Changes",
+                    labels={'transition_count': 'Status Changes', 'date': 'Date'}
+                )
+                st.plotly_chart(fig_daily_transitions, use_container_width=True)
     
     else:
         st.info("📊 No logs found for the selected filters. Try adjusting your filter criteria.")
@@ -1278,12 +1668,21 @@ if st.session_state.selected_dashboard == 'System Logs':
 st.subheader("📈 Key Performance Indicators")
 col1, col2, col3, col4 = st.columns(4)
 
+# Licence rounds as date intervals, so seat counts can be taken on a given day
+licence_index = LicenceIntervalIndex()
+licence_index.update(licence_window_df)
+licences_in_force = licence_index.seats_on(datetime.now().date())
+# Of those, the rounds still marked Active; utilisation is measured against seats in force
+active_licence_index = LicenceIntervalIndex()
+if not licence_window_df.empty:
+    active_licence_index.update(licence_window_df[licence_window_df['status'] == 'Active'])
+active_licences = active_licence_index.seats_on(datetime.now().date())
+
 with col1:
-    total_licences = filtered_df['number_of_licenses'].sum() if not filtered_df.empty else 0
     st.metric(
-        label="Total Licenses", 
-        value=f"{total_licences:,}",
-        help="Total number of licenses across all entities"
+        label="Licenses in Force", 
+        value=f"{licences_in_force:,}",
+        help="Seats of the licence rounds whose start and end dates cover today; rounds that have ended or not yet started are not counted"
     )
 
 with col2:
@@ -1295,19 +1694,17 @@ with col2:
     )
 
 with col3:
-    active_users = int(filtered_df['active_users'].sum()) if not filtered_df.empty else 0
     st.metric(
         label="Active Users", 
-        value=f"{active_users:,}",
-        help="Users with activity detected in the last 14 days"
+        value=f"{active_users_total:,}",
+        help=f"Users with activity detected in the last {activity_window_days} days"
     )
 
 with col4:
-    active_licences = filtered_df[filtered_df['status'] == 'Active']['number_of_licenses'].sum() if not filtered_df.empty else 0
     st.metric(
         label="Active Licenses", 
         value=f"{active_licences:,}",
-        help="Currently active licenses"
+        help="Seats in force today on licence rounds with status Active"
     )
 
 # Secondary Metrics Row - Financial and utilization metrics
@@ -1342,17 +1739,17 @@ with col2:
     st.metric(
         label="🔗 Active Relay Devices", 
         value=f"{active_relay_devices:,}",
-        help="Unique relay devices with activity in the last 14 days"
+        help=f"Unique relay devices with activity in the last {activity_window_days} days"
+             + (" (approximate)" if relay_count_mode == 'Approximate' else "")
     )
 
 with col3:
     if st.session_state.selected_dashboard == 'Relay Licenses' and not filtered_df.empty:
-        relay_licenses = filtered_df['number_of_licenses'].sum()
-        relay_utilization = (active_relay_devices / relay_licenses * 100) if relay_licenses > 0 else 0
+        relay_utilization = (active_relay_devices / licences_in_force * 100) if licences_in_force > 0 else 0
         st.metric(
             label="🔗 Relay Utilization", 
             value=f"{relay_utilization:.1f}%",
-            help="Percentage of relay licenses being actively used"
+            help="Active relay devices as a percentage of the relay seats in force today"
         )
     else:
         total_entities = len(filtered_df['entity'].unique()) if not filtered_df.empty else 0
@@ -1365,18 +1762,18 @@ with col3:
 with col4:
     if not filtered_df.empty:
         if st.session_state.selected_dashboard == 'Relay Licenses':
-            avg_utilization = (filtered_df['active_relay_devices'].sum() / filtered_df['number_of_licenses'].sum() * 100) if filtered_df['number_of_licenses'].sum() > 0 else 0
+            avg_utilization = (active_relay_devices / licences_in_force * 100) if licences_in_force > 0 else 0
             st.metric(
                 label="📈 Avg Relay Utilization", 
                 value=f"{avg_utilization:.1f}%",
-                help="Average relay device utilization across all entities"
+                help="Active relay devices across all entities as a percentage of the seats in force today"
             )
         else:
-            avg_utilization = (filtered_df['active_users'].sum() / filtered_df['number_of_licenses'].sum() * 100) if filtered_df['number_of_licenses'].sum() > 0 else 0
+            avg_utilization = (active_users_total / licences_in_force * 100) if licences_in_force > 0 else 0
             st.metric(
                 label="📈 Avg Utilization", 
                 value=f"{avg_utilization:.1f}%",
-                help="Average license utilization across all entities"
+                help="Active users across all entities as a percentage of the seats in force today"
             )
     else:
         st.metric(
@@ -1795,6 +2192,28 @@ if not filtered_df.empty:
                     st.info("📊 No trend data available")
             else:
                 st.info("📊 No date data available")
+        
+        # Daily and rolling-window active users for the filtered entities from the bitmap index
+        st.subheader("📈 Active Users Trend")
+        active_bitmap_index = get_active_bitmap_index()
+        active_bitmap_index.refresh(db, path=ACTIVE_BITMAP_PATH)
+        entity_keys = [('Company', entity_id) for entity_id in filtered_df['company_id'].dropna().unique()]
+        entity_keys += [('Partner', entity_id) for entity_id in filtered_df['partner_id'].dropna().unique()]
+        trend_end = datetime.now().date()
+        active_trend = active_bitmap_index.rolling_active_counts(
+            trend_end - timedelta(days=89), trend_end, activity_window_days, entity_keys=entity_keys
+        )
+        if active_trend['window_active_users'].sum() > 0:
+            fig_active_trend = px.line(
+                active_trend,
+                x='date',
+                y=['daily_active_users', 'window_active_users'],
+                title=f"Daily Active Users and {activity_window_days}-Day Active Users (last 90 days)",
+                labels={'value': 'Users', 'variable': 'Measure', 'date': 'Date'}
+            )
+            st.plotly_chart(fig_active_trend, use_container_width=True)
+        else:
+            st.info("📊 No activity recorded for the selected entities")
     
     else:
         # All Licenses - show original charts
@@ -1905,6 +2324,45 @@ if not filtered_df.empty:
     fig_timeline.update_yaxes(categoryorder="total ascending")
     st.plotly_chart(fig_timeline, use_container_width=True)
 
+    # Seats in force per day, from the licence interval index
+    st.subheader("Seats Over Time")
+    if len(licence_index):
+        today = datetime.now().date()
+        # From the first round's start to its last end, at most a year past today
+        seats_start = pd.to_datetime(licence_window_df['start_date']).min().date()
+        last_end = pd.to_datetime(licence_window_df['end_date']).max()
+        seats_end = today + timedelta(days=365) if pd.isna(last_end) else min(last_end.date(), today + timedelta(days=365))
+        seats_df = licence_index.seats_per_day(seats_start, max(seats_end, seats_start))
+        fig_seats = px.line(seats_df, x='date', y='seats', title="Seats in Force per Day",
+                            labels={'date': 'Date', 'seats': 'Seats in Force'})
+        fig_seats.add_vline(x=pd.Timestamp(today).timestamp() * 1000, line_dash="dash", line_color="gray", annotation_text="Today")
+        st.plotly_chart(fig_seats, use_container_width=True)
+        
+        overlaps_df = licence_index.overlaps()
+        with st.expander(f"🔁 Overlapping Licence Rounds ({len(overlaps_df):,})"):
+            if overlaps_df.empty:
+                st.info("No entity has licence rounds with overlapping dates.")
+            else:
+                entity_labels = filtered_df.set_index('id')['entity_with_type']
+                overlaps_df['entity'] = overlaps_df['licence_id'].map(entity_labels)
+                st.dataframe(
+                    overlaps_df[['entity', 'licence_id', 'other_licence_id', 'overlap_start', 'overlap_end', 'overlap_days', 'seats', 'other_seats']],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        'entity': 'Entity',
+                        'licence_id': 'Licence',
+                        'other_licence_id': 'Overlapping Licence',
+                        'overlap_start': st.column_config.DateColumn('Overlap From'),
+                        'overlap_end': st.column_config.DateColumn('Overlap To'),
+                        'overlap_days': st.column_config.NumberColumn('Days', format="%d"),
+                        'seats': 'Seats',
+                        'other_seats': 'Overlapping Seats'
+                    }
+                )
+    else:
+        st.info("📊 No dated licence rounds for the selected filters")
+
     # License utilization analysis
     if st.session_state.selected_dashboard == 'Relay Licenses':
         st.subheader("🔗 Relay Utilization Analysis")
@@ -2173,14 +2631,43 @@ if not filtered_df.empty:
         # Quick stats
         if not filtered_df.empty:
             total_entities = len(filtered_df['entity'].unique())
-            active_licenses = filtered_df[filtered_df['status'] == 'Active']['number_of_licenses'].sum()
             st.info(f"📊 **Quick Stats**")
             st.write(f"• **{total_entities}** entities")
-            st.write(f"• **{active_licenses:,}** active licenses")
+            st.write(f"• **{active_licences:,}** active licenses")
             if 'currency' in filtered_df.columns:
                 currencies = len(filtered_df['currency'].unique())
                 st.write(f"• **{currencies}** currencies")
 
+# Inactive seat report - enabled accounts with no activity in the selected window
+if not filtered_df.empty and st.session_state.selected_dashboard != 'Relay Licenses' and len(last_seen_index):
+    inactive_df = last_seen_index.inactive_users(activity_window_days)
+    licensed_company_ids = filtered_df['company_id'].dropna().astype(int).unique()
+    licensed_partner_ids = filtered_df['partner_id'].dropna().astype(int).unique()
+    inactive_df = inactive_df[
+        inactive_df['company_id'].isin(licensed_company_ids) | 
+        inactive_df['partner_id'].isin(licensed_partner_ids)
+    ]
+    
+    st.markdown("---")
+    st.subheader("🪑 Inactive Seats")
+    st.caption(f"Enabled users of licensed entities with no App or Waypoint activity in the last {activity_window_days} days")
+    if not inactive_df.empty:
+        st.metric("Inactive Seats", f"{len(inactive_df):,}")
+        st.dataframe(
+            inactive_df[['user_name', 'email', 'company_id', 'partner_id', 'last_seen']],
+            use_container_width=True,
+            column_config={
+                'user_name': st.column_config.TextColumn('User', width="medium"),
+                'email': st.column_config.TextColumn('Email', width="medium"),
+                'company_id': st.column_config.NumberColumn('Company ID', width="small"),
+                'partner_id': st.column_config.NumberColumn('Partner ID', width="small"),
+                'last_seen': st.column_config.DatetimeColumn('Last Seen', format='DD-MM-YYYY HH:mm')
+            },
+            hide_index=True
+        )
+    else:
+        st.success("✅ Every licensed seat has recent activity")
+
 # Footer
 st.markdown("---")
 st.markdown("""
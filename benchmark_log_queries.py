@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of per-row charset conversion in the log queries
+
+Builds synthetic portal (latin1, separate `date` and `time` columns like portal_logs)
+and app (utf8mb4) log tables as TEMPORARY tables on the configured database, then times
+four variants that each differ from a neighbour in exactly one factor:
+
+  query shape     conversion
+  UNION ALL       CONVERT(... USING utf8mb4) COLLATE ...   (the old query)
+  UNION ALL       none
+  per branch      CONVERT(... USING utf8mb4) COLLATE ...
+  per branch      none                                     (the current query)
+
+"UNION ALL" orders and limits once over both sources; "per branch" orders and limits
+each source on its own index and merges the pages in Python. Comparing rows of the
+same shape isolates the conversion; comparing rows with the same conversion isolates
+the branch limiting.
+
+Usage: python benchmark_log_queries.py [rows_per_table] [repeats]
+Nothing is written outside the session's temporary tables.
+"""
+
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseConnection
+from log_analytics import merge_log_pages
+import pandas as pd
+
+PAGE_SIZE = 1000
+
+SETUP_STATEMENTS = [
+    "SET SESSION cte_max_recursion_depth = 10000000",
+    '''
+    CREATE TEMPORARY TABLE bench_portal_logs (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        name VARCHAR(100),
+        email VARCHAR(150),
+        action VARCHAR(100),
+        status VARCHAR(20),
+        company_id INT,
+        KEY idx_bench_portal_date_time (date, time, id)
+    ) CHARACTER SET latin1
+    ''',
+    '''
+    CREATE TEMPORARY TABLE bench_app_log (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        timestamp DATETIME NOT NULL,
+        user_id INT,
+        action VARCHAR(100),
+        status VARCHAR(20),
+        session_id VARCHAR(64),
+        KEY idx_bench_app_timestamp (timestamp, id)
+    ) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci
+    '''
+]
+
+# Rows spread over 90 days with a realistic spread of users, actions and statuses
+POPULATE_STATEMENTS = [
+    '''
+    INSERT INTO bench_portal_logs (date, time, name, email, action, status, company_id)
+    WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+    SELECT
+        DATE(logged_at),
+        TIME(logged_at),
+        CONCAT('User ', n MOD 500),
+        CONCAT('user', n MOD 500, '@example.com'),
+        ELT(1 + n MOD 4, 'Login', 'Edit Licence', 'Export Report', 'Update User'),
+        ELT(1 + n MOD 3, 'success', 'success', 'failed'),
+        1 + n MOD 40
+    FROM (SELECT n, NOW() - INTERVAL (n * 7776000 DIV %s) SECOND AS logged_at FROM seq) seq_times
+    ''',
+    '''
+    INSERT INTO bench_app_log (timestamp, user_id, action, status, session_id)
+    WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+    SELECT
+        NOW() - INTERVAL (n * 7776000 DIV %s) SECOND,
+        1 + n MOD 2000,
+        ELT(1 + n MOD 5, 'login', 'sync', 'deploy', 'collect', 'logout'),
+        ELT(1 + n MOD 4, 'ok', 'ok', 'ok', 'error'),
+        MD5(n DIV 20)
+    FROM seq
+    '''
+]
+
+
+def text(column, convert):
+    """A text column, converted to the unified charset and collation when `convert` is set"""
+    if column == 'NULL':
+        return column
+    return f"CONVERT({column} USING utf8mb4) COLLATE utf8mb4_unicode_ci" if convert else column
+
+
+def branch_queries(convert, limited):
+    """The portal and app branches, each ordered and limited on its own index when `limited`"""
+    portal = f'''
+    SELECT CONCAT(p.date, ' ', p.time) as timestamp, {text('p.name', convert)} as user_name,
+           {text('p.email', convert)} as user_email, {text('p.action', convert)} as action,
+           {text('p.status', convert)} as status, 'portal_logs' as log_source, NULL as session_id, p.id as log_id
+    FROM bench_portal_logs p
+    WHERE p.date >= CURDATE() - INTERVAL 30 DAY
+    '''
+    app = f'''
+    SELECT a.timestamp, NULL as user_name, NULL as user_email, {text('a.action', convert)} as action,
+           {text('a.status', convert)} as status, 'app_log' as log_source,
+           {text('a.session_id', convert)} as session_id, a.id as log_id
+    FROM bench_app_log a
+    WHERE a.timestamp >= CURDATE() - INTERVAL 30 DAY
+    '''
+    if limited:
+        portal += f"ORDER BY p.date DESC, p.time DESC, p.id DESC LIMIT {PAGE_SIZE}"
+        app += f"ORDER BY a.timestamp DESC, a.id DESC LIMIT {PAGE_SIZE}"
+    return [portal, app]
+
+
+def union_query(convert):
+    """Both branches in one UNION ALL, ordered and limited once at the end"""
+    portal, app = branch_queries(convert, limited=False)
+    return f'''
+    SELECT * FROM ({portal} UNION ALL {app}) unified_logs
+    ORDER BY timestamp DESC, log_source DESC, log_id DESC
+    LIMIT {PAGE_SIZE}
+    '''
+
+
+def run_variant(connection, shape, convert):
+    """One page of logs from the given query shape"""
+    if shape == 'UNION ALL':
+        return pd.read_sql(union_query(convert), connection)
+    return merge_log_pages([pd.read_sql(query, connection) for query in branch_queries(convert, limited=True)], PAGE_SIZE)
+
+
+def time_runs(run, repeats):
+    """Median and best wall time of `repeats` calls to `run`"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), min(timings)
+
+
+def benchmark(rows_per_table=200000, repeats=5):
+    """Build the synthetic tables and compare both query shapes"""
+    print("⏱️ Unified log query benchmark")
+    print("=" * 50)
+
+    db = DatabaseConnection()
+    connection = db.get_connection()
+    if not connection:
+        print("❌ Could not connect to database")
+        return
+
+    try:
+        cursor = connection.cursor()
+        for statement in SETUP_STATEMENTS:
+            cursor.execute(statement)
+        print(f"\n1. Generating {rows_per_table:,} rows per table...")
+        started = time.perf_counter()
+        for statement in POPULATE_STATEMENTS:
+            cursor.execute(statement, (rows_per_table, rows_per_table))
+        connection.commit()
+        cursor.close()
+        print(f"✅ Generated in {time.perf_counter() - started:.1f}s")
+
+        print(f"\n2. Timing {repeats} runs of each variant...")
+        medians = {}
+        for shape in ('UNION ALL', 'per branch'):
+            for convert in (True, False):
+                median, best = time_runs(lambda: run_variant(connection, shape, convert), repeats)
+                medians[shape, convert] = median
+                label = f"{shape}, {'CONVERT' if convert else 'no CONVERT'}"
+                print(f"   {label:<26} median {median * 1000:8.1f} ms, best {best * 1000:8.1f} ms")
+
+        print("\n3. One factor at a time (median ratios)")
+        for shape in ('UNION ALL', 'per branch'):
+            print(f"   CONVERT cost, {shape:<11} {medians[shape, True] / medians[shape, False]:.2f}x")
+        for convert in (True, False):
+            label = 'CONVERT' if convert else 'no CONVERT'
+            print(f"   Branch limiting, {label:<10} {medians['UNION ALL', convert] / medians['per branch', convert]:.2f}x")
+
+        # Every variant must return the same page
+        pages = [run_variant(connection, shape, convert) for shape in ('UNION ALL', 'per branch') for convert in (True, False)]
+        keys = [set(zip(page['log_source'], page['log_id'])) for page in pages]
+        print("✅ All variants return the same rows" if all(key == keys[0] for key in keys) else "⚠️ Pages differ")
+
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+    finally:
+        if connection.is_connected():
+            connection.close()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(rows, runs)
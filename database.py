@@ -3,9 +3,17 @@ import pandas as pd
 import os
 from dotenv import load_dotenv
 import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import or_, false
 from sqlalchemy.orm import sessionmaker
 from models import engine, LicenseRecord, Company, Partner, LicenseProductCode, UserPortal, LoggerSession
 import streamlit as st
+from log_analytics import type_log_id_columns, merge_log_pages
+from log_cursors import LOG_PAGE_SIZE, keyset_filter, watermark_filter
+from entity_hierarchy import EntityHierarchy
+from access_scope import UNRESTRICTED, partner_condition
 
 # Load environment variables
 load_dotenv()
@@ -13,10 +21,191 @@ load_dotenv()
 # Create a new session
 Session = sessionmaker(bind=engine)
 
+# Daily activity rollup of fido1.app_log, maintained incrementally from an id high-water mark
+ACTIVITY_ROLLUP_BACKFILL_DAYS = 90
+# The mark only passes rows at least this old, so rows committed late with lower ids are still counted
+ACTIVITY_ROLLUP_SETTLE_SECONDS = 120
+ACTIVITY_ROLLUP_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS activity_daily_rollup (
+        day DATE NOT NULL,
+        user_id INT NOT NULL,
+        event_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, user_id),
+        KEY idx_activity_daily_rollup_user (user_id, day)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        source VARCHAR(64) NOT NULL PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        last_timestamp DATETIME NULL,
+        updated_at DATETIME NOT NULL
+    )
+    '''
+]
+
+# Normalised email → users_portal.id map; portal_logs rows only carry a name and email.
+# The email column takes the charset and collation of portal_logs.email, so the hot
+# join ui.email = pl.email compares like with like and can use the primary key.
+USER_IDENTITY_DDL = '''
+    CREATE TABLE IF NOT EXISTS user_email_identity (
+        email VARCHAR(255) CHARACTER SET {charset} COLLATE {collation} NOT NULL PRIMARY KEY,
+        user_id INT NOT NULL,
+        updated_at DATETIME NOT NULL,
+        KEY idx_user_email_identity_user (user_id)
+    )
+'''
+USER_IDENTITY_DEFAULT_COLLATION = ('utf8mb4', 'utf8mb4_unicode_ci')
+USER_IDENTITY_REFRESH_SECONDS = 600
+# email_collation caches fido1.portal_logs.email's (charset, collation) once read
+_user_identity_state = {'ready': False, 'refreshed_at': None, 'email_collation': None}
+_user_identity_lock = threading.Lock()
+
+# Partner → company → user hierarchy shared by every connection, used to expand partner filters
+ENTITY_HIERARCHY_REFRESH_SECONDS = 600
+_entity_hierarchy = EntityHierarchy()
+
+# Waypoint dimension tables (table, name column) labelled onto log rows by dimensions.WaypointDimension
+WAYPOINT_DIMENSION_TABLES = {
+    'waypoints': ('fido_way.waypoints', 'name'),
+    'waypoint_statuses': ('fido_way.waypoint_statuses', 'name')
+}
+
+# Raw row exports for the local Parquet snapshot store, streamed in id order
+LOG_EXPORT_QUERIES = {
+    'portal_logs': '''
+        SELECT 
+            pl.id,
+            CONCAT(pl.date, ' ', pl.time) AS timestamp,
+            pl.name AS user_name,
+            pl.email AS user_email,
+            pl.action,
+            pl.status,
+            pl.notes,
+            pl.company_id,
+            pl.partner_id,
+            pl.branch_id,
+            pl.object_data
+        FROM fido1.portal_logs pl
+        WHERE pl.id > %s
+        ORDER BY pl.id
+    ''',
+    'app_log': '''
+        SELECT 
+            al.id,
+            al.timestamp,
+            al.user_id,
+            al.action,
+            al.status,
+            al.notes,
+            al.session_id,
+            al.waypoint_id,
+            al.dma_id
+        FROM fido1.app_log al
+        WHERE al.id > %s
+        ORDER BY al.id
+    ''',
+    'waypoint_logs': '''
+        SELECT 
+            wl.id,
+            wl.datetime AS timestamp,
+            wl.user_id,
+            wl.waypoint_id,
+            wl.status_changed_from_id,
+            wl.status_changed_to_id,
+            wl.notes
+        FROM fido_way.waypoint_logs wl
+        WHERE wl.id > %s
+        ORDER BY wl.id
+    '''
+}
+
+# Heavy per-row detail columns, fetched by id only for the log rows being expanded or exported
+LOG_DETAIL_QUERIES = {
+    'portal_logs': 'SELECT pl.id AS log_id, pl.notes, pl.object_data FROM fido1.portal_logs pl WHERE pl.id IN ({ids})',
+    'app_log': 'SELECT al.id AS log_id, al.notes, NULL AS object_data FROM fido1.app_log al WHERE al.id IN ({ids})',
+    'waypoint_logs': 'SELECT wl.id AS log_id, wl.notes, NULL AS object_data FROM fido_way.waypoint_logs wl WHERE wl.id IN ({ids})'
+}
+LOG_DETAIL_BATCH_SIZE = 500
+
+# Column types of each exported chunk (nullable integers survive all-NULL chunks)
+LOG_EXPORT_DTYPES = {
+    'portal_logs': {'id': 'int64', 'timestamp': 'datetime64[ns]', 'company_id': 'Int64', 'partner_id': 'Int64', 'branch_id': 'Int64'},
+    'app_log': {'id': 'int64', 'timestamp': 'datetime64[ns]', 'user_id': 'Int64', 'waypoint_id': 'Int64', 'dma_id': 'Int64'},
+    'waypoint_logs': {'id': 'int64', 'timestamp': 'datetime64[ns]', 'user_id': 'Int64', 'waypoint_id': 'Int64',
+                      'status_changed_from_id': 'Int64', 'status_changed_to_id': 'Int64'}
+}
+EXPORT_CHUNK_SIZE = 50000
+
+# Building blocks of the per-source log aggregates behind the log summary: FROM clause,
+# day expression, indexed date range column, distinct-user key and the expressions each filter is applied to
+LOG_AGGREGATE_SOURCES = {
+    'portal_logs': {
+        'from': 'fido1.portal_logs pl',
+        'day': 'pl.date',
+        'timestamp': 'TIMESTAMP(pl.date, pl.time)',
+        'range_column': 'pl.date',
+        'user_key': 'LOWER(pl.email)',
+        # users_portal.email is converted to portal_logs.email's charset/collation (see portal_email_collation)
+        'user_filter': 'pl.email = (SELECT CONVERT(email USING {charset}) COLLATE {collation} FROM fido1.users_portal WHERE id = %s)',
+        'identity_user_filter': 'pl.email IN (SELECT email FROM user_email_identity WHERE user_id = %s)',
+        'company_column': 'pl.company_id',
+        'partner_column': 'pl.partner_id'
+    },
+    'app_log': {
+        'from': 'fido1.app_log al LEFT JOIN fido1.users_portal u ON al.user_id = u.id',
+        'day': 'DATE(al.timestamp)',
+        'timestamp': 'al.timestamp',
+        'range_column': 'al.timestamp',
+        'user_key': "COALESCE(LOWER(u.email), CONCAT('#', al.user_id))",
+        'user_filter': 'al.user_id = %s',
+        'company_column': 'u.company_id',
+        'partner_column': 'u.partner_id'
+    },
+    'waypoint_logs': {
+        'from': 'fido_way.waypoint_logs wl LEFT JOIN fido1.users_portal u ON wl.user_id = u.id',
+        'day': 'DATE(wl.datetime)',
+        'timestamp': 'wl.datetime',
+        'range_column': 'wl.datetime',
+        'user_key': "COALESCE(LOWER(u.email), CONCAT('#', wl.user_id))",
+        'user_filter': 'wl.user_id = %s',
+        'company_column': 'u.company_id',
+        'partner_column': 'u.partner_id'
+    }
+}
+
+# Start of the hour/day/week (Monday)/month bucket containing a timestamp expression
+LOG_TIME_BUCKETS = {
+    'hour': 'TIMESTAMP(DATE({ts}), MAKETIME(HOUR({ts}), 0, 0))',
+    'day': 'DATE({ts})',
+    'week': 'DATE({ts}) - INTERVAL WEEKDAY({ts}) DAY',
+    'month': 'DATE({ts}) - INTERVAL (DAYOFMONTH({ts}) - 1) DAY'
+}
+
+# Activity sources the per-user last-seen index can read: (table, timestamp column).
+# activity_index.LAST_SEEN_SOURCES picks app_log only, matching the activity rollup
+LAST_SEEN_BACKFILL_DAYS = 365
+LAST_SEEN_SOURCE_TABLES = {
+    'app_log': ('fido1.app_log', 'timestamp'),
+    'waypoint_logs': ('fido_way.waypoint_logs', 'datetime')
+}
+
+# History loaded by the first app session index refresh
+SESSION_BACKFILL_DAYS = 90
+
+
 class DatabaseConnection:
-    """Database connection handler for MySQL"""
+    """Database connection handler for MySQL
+
+    Tenant-facing queries are restricted to `scope` (an access_scope.AccessScope) in SQL.
+    The incremental index feeds (deltas, rollups, exports, dimension tables) stay global
+    because their results are shared by every session; readers of those indexes apply
+    the scope themselves.
+    """
     
-    def __init__(self):
+    def __init__(self, scope=None):
+        self.scope = scope or UNRESTRICTED
         self.host = st.secrets["database"]["host"]
         self.user = st.secrets["database"]["user"]
         self.password = st.secrets["database"]["password"]
@@ -24,6 +213,29 @@ class DatabaseConnection:
         self.port = int(st.secrets["database"].get("port", 3306))
         self.session = Session()
         
+    def scoped(self, scope):
+        """A connection handler for the same database restricted to another scope"""
+        return DatabaseConnection(scope)
+
+    def scope_condition(self, company_column=None, partner_column=None):
+        """SQL condition limiting rows to the session scope, or None when unrestricted (see AccessScope.condition)"""
+        partner_company_ids = ()
+        if self.scope.partner_id is not None and company_column:
+            partner_company_ids = self.get_entity_hierarchy().companies_of(self.scope.partner_id)
+        return self.scope.condition(company_column, partner_column, partner_company_ids)
+
+    def _scoped_users_filter(self, user_column):
+        """'AND user IN (in-scope users)' for tables that only carry a user id"""
+        condition = self.scope_condition('su.company_id', 'su.partner_id')
+        if not condition:
+            return ""
+        return f"AND {user_column} IN (SELECT su.id FROM fido1.users_portal su WHERE {condition})"
+
+    def scope_filter(self, company_column=None, partner_column=None):
+        """scope_condition() as an 'AND ...' fragment, empty when unrestricted"""
+        condition = self.scope_condition(company_column, partner_column)
+        return f"AND {condition}" if condition else ""
+
     def get_connection(self):
         """Establish database connection"""
         try:
@@ -32,15 +244,23 @@ class DatabaseConnection:
                 user=self.user,
                 password=self.password,
                 database=self.database,
-                port=self.port
+                port=self.port,
+                # Set once per connection so log text columns need no per-row CONVERT/COLLATE
+                charset='utf8mb4',
+                collation='utf8mb4_unicode_ci'
             )
             return connection
         except mysql.connector.Error as err:
             print(f"Error: {err}")
             return None
     
-    def fetch_license_data(self, start_date=None, end_date=None):
-        """Fetch license data from your existing database schema"""
+    def fetch_license_data(self, start_date=None, end_date=None, overlapping=False):
+        """Fetch license data from your existing database schema
+
+        By default rounds are selected by start_date; with `overlapping` every round whose
+        dates overlap start_date..end_date is returned, including open-ended rounds and
+        rounds that started earlier and are still in force.
+        """
         try:
             query = self.session.query(
                 LicenseRecord, 
@@ -52,10 +272,20 @@ class DatabaseConnection:
             query = query.outerjoin(Company, LicenseRecord.company_id == Company.id)
             query = query.outerjoin(Partner, LicenseRecord.partner_id == Partner.id)
             query = query.outerjoin(LicenseProductCode, LicenseRecord.product_code_id == LicenseProductCode.id)
-            if start_date:
+            if start_date and overlapping:
+                query = query.filter(or_(LicenseRecord.end_date.is_(None), LicenseRecord.end_date >= start_date))
+            elif start_date:
                 query = query.filter(LicenseRecord.start_date >= start_date)
             if end_date:
                 query = query.filter(LicenseRecord.start_date <= end_date)
+            if self.scope.denied:
+                query = query.filter(false())
+            elif self.scope.company_id is not None:
+                query = query.filter(LicenseRecord.company_id == self.scope.company_id)
+            elif self.scope.partner_id is not None:
+                partner_company_ids = self.get_entity_hierarchy().companies_of(self.scope.partner_id)
+                query = query.filter(or_(LicenseRecord.partner_id == self.scope.partner_id,
+                                         LicenseRecord.company_id.in_(sorted(partner_company_ids))))
             licenses = query.all()
             
             # Convert list of tuples to DataFrame
@@ -113,7 +343,7 @@ class DatabaseConnection:
         
         try:
             cursor = connection.cursor(dictionary=True)
-            query = "SELECT id, company_name FROM companies WHERE active = 1"
+            query = f"SELECT id, company_name FROM companies WHERE active = 1 {self.scope_filter('id', 'partner_id')}"
             cursor.execute(query)
             companies = cursor.fetchall()
             return companies
@@ -133,7 +363,7 @@ class DatabaseConnection:
         
         try:
             cursor = connection.cursor(dictionary=True)
-            query = "SELECT id, partner_name AS name FROM partners"
+            query = f"SELECT id, partner_name AS name FROM partners WHERE 1=1 {self.scope_filter(partner_column='id')}"
             cursor.execute(query)
             partners = cursor.fetchall()
             return partners
@@ -219,55 +449,285 @@ class DatabaseConnection:
     def close(self):
         self.session.close()
 
-    def get_active_users_per_company(self):
-        """Fetch active users per company or partner based on the last 14 days of activity from fido1.app_log table"""
+    def refresh_activity_rollup(self):
+        """Fold new fido1.app_log rows into activity_daily_rollup since the last high-water mark.
+
+        The watermark row is locked for the duration of the transaction so concurrent
+        refreshes cannot count the same log rows twice. The mark stops at the newest row
+        older than ACTIVITY_ROLLUP_SETTLE_SECONDS: it is found by walking the primary key
+        down from the top, and rows of transactions still open below it get time to commit
+        before it passes them. The first run backfills ACTIVITY_ROLLUP_BACKFILL_DAYS days
+        of history. Returns False when the rollup
+        tables cannot be created or updated, in which case callers should fall back
+        to scanning fido1.app_log directly.
+        """
         connection = self.get_connection()
         if not connection:
-            return pd.DataFrame()
+            return False
         
+        cursor = None
         try:
-            # Get active users for company and partner licenses using fido1.app_log table
-            query = '''
-            SELECT 
-              c.company_name as entity_name,
-              'Company' as entity_type,
-              lr.number_of_licenses,
-              COUNT(DISTINCT u.id) AS active_users,
-              ROUND(COUNT(DISTINCT u.id) / lr.number_of_licenses, 2) AS utilization_ratio
-            FROM license_records lr
-            JOIN companies c ON lr.company_id = c.id
-            LEFT JOIN users_portal u ON u.company_id = c.id
-            INNER JOIN (
-                SELECT DISTINCT user_id
+            cursor = connection.cursor()
+            for ddl in ACTIVITY_ROLLUP_DDL:
+                cursor.execute(ddl)
+            connection.commit()
+            
+            connection.start_transaction()
+            cursor.execute(
+                "INSERT IGNORE INTO rollup_watermarks (source, last_id, updated_at) VALUES ('app_log', 0, NOW())"
+            )
+            cursor.execute("SELECT last_id FROM rollup_watermarks WHERE source = 'app_log' FOR UPDATE")
+            last_id = cursor.fetchone()[0]
+            
+            cursor.execute('''
+                SELECT id, timestamp FROM fido1.app_log
+                WHERE id > %s AND timestamp < NOW() - INTERVAL %s SECOND
+                ORDER BY id DESC
+                LIMIT 1
+            ''', (last_id, ACTIVITY_ROLLUP_SETTLE_SECONDS))
+            row = cursor.fetchone()
+            if row is None:
+                connection.commit()
+                return True
+            new_last_id, new_last_timestamp = row
+            
+            # Only the first run needs the timestamp bound; afterwards the id range is already small
+            backfill_filter = ""
+            params = [last_id, new_last_id]
+            if last_id == 0:
+                backfill_filter = "AND timestamp >= CURDATE() - INTERVAL %s DAY"
+                params.append(ACTIVITY_ROLLUP_BACKFILL_DAYS)
+            
+            cursor.execute(f'''
+                INSERT INTO activity_daily_rollup (day, user_id, event_count)
+                SELECT DATE(timestamp), user_id, COUNT(*)
                 FROM fido1.app_log
-                WHERE timestamp >= NOW() - INTERVAL 14 DAY
+                WHERE id > %s AND id <= %s
                 AND user_id IS NOT NULL
-            ) recent_activity ON recent_activity.user_id = u.id
-            WHERE lr.company_id IS NOT NULL
-            GROUP BY lr.id, c.company_name, lr.number_of_licenses
+                {backfill_filter}
+                GROUP BY DATE(timestamp), user_id
+                ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count)
+            ''', params)
+            cursor.execute(
+                "UPDATE rollup_watermarks SET last_id = %s, last_timestamp = %s, updated_at = NOW() WHERE source = 'app_log'",
+                (new_last_id, new_last_timestamp)
+            )
+            connection.commit()
+            return True
             
-            UNION ALL
+        except Exception as e:
+            print(f"Error refreshing activity rollup: {e}")
+            connection.rollback()
+            return False
+        finally:
+            if connection.is_connected():
+                if cursor:
+                    cursor.close()
+                connection.close()
+
+    def _column_collation(self, cursor, schema, table, column):
+        """(charset, collation) of a column from information_schema, or None when not found
+
+        `schema` defaults to the connection's database.
+        """
+        cursor.execute('''
+            SELECT CHARACTER_SET_NAME, COLLATION_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (schema, table, column))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row and row[0] else None
+
+    def portal_email_collation(self):
+        """(charset, collation) of fido1.portal_logs.email, read once and then cached
+
+        Comparisons of users_portal.email with portal_logs.email convert the users_portal
+        side to it, since the two columns may be declared with different collations.
+        """
+        if _user_identity_state['email_collation'] is not None:
+            return _user_identity_state['email_collation']
+        connection = self.get_connection()
+        if not connection:
+            return USER_IDENTITY_DEFAULT_COLLATION
+        
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            collation = self._column_collation(cursor, 'fido1', 'portal_logs', 'email') or USER_IDENTITY_DEFAULT_COLLATION
+            _user_identity_state['email_collation'] = collation
+            return collation
             
-            SELECT 
-              p.partner_name as entity_name,
-              'Partner' as entity_type,
-              lr.number_of_licenses,
-              COUNT(DISTINCT u.id) AS active_users,
-              ROUND(COUNT(DISTINCT u.id) / lr.number_of_licenses, 2) AS utilization_ratio
-            FROM license_records lr
-            JOIN partners p ON lr.partner_id = p.id
-            LEFT JOIN users_portal u ON u.partner_id = p.id
-            INNER JOIN (
+        except Exception as e:
+            print(f"Error reading portal_logs.email collation: {e}")
+            return USER_IDENTITY_DEFAULT_COLLATION
+        finally:
+            if connection.is_connected():
+                if cursor:
+                    cursor.close()
+                connection.close()
+
+    def refresh_user_identity_index(self):
+        """Upsert the email → user id mappings of fido1.users_portal into user_email_identity.
+
+        Only emails whose mapping is missing or has changed are written, so repeat runs are
+        cheap. Emails are lower-cased and trimmed; when several accounts share an email the
+        lowest id wins. Old emails keep pointing at their user, so historic portal logs stay
+        attributed. Returns False when the table cannot be created or updated.
+        """
+        connection = self.get_connection()
+        if not connection:
+            return False
+        
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            charset, collation = self._column_collation(cursor, 'fido1', 'portal_logs', 'email') or USER_IDENTITY_DEFAULT_COLLATION
+            _user_identity_state['email_collation'] = (charset, collation)
+            cursor.execute(USER_IDENTITY_DDL.format(charset=charset, collation=collation))
+            # A table created before the collation was matched is converted once
+            if self._column_collation(cursor, None, 'user_email_identity', 'email') != (charset, collation):
+                cursor.execute(f"ALTER TABLE user_email_identity MODIFY email VARCHAR(255) CHARACTER SET {charset} COLLATE {collation} NOT NULL")
+            # users_portal.email may use yet another collation, so its side of the join is converted
+            cursor.execute(f'''
+                INSERT INTO user_email_identity (email, user_id, updated_at)
+                SELECT identities.email, identities.user_id, NOW()
+                FROM (
+                    SELECT LOWER(TRIM(u.email)) AS email, MIN(u.id) AS user_id
+                    FROM fido1.users_portal u
+                    WHERE u.email IS NOT NULL AND TRIM(u.email) <> ''
+                    GROUP BY LOWER(TRIM(u.email))
+                ) identities
+                LEFT JOIN user_email_identity ui ON ui.email = CONVERT(identities.email USING {charset}) COLLATE {collation}
+                WHERE ui.user_id IS NULL OR ui.user_id <> identities.user_id
+                ON DUPLICATE KEY UPDATE user_id = VALUES(user_id), updated_at = NOW()
+            ''')
+            connection.commit()
+            return True
+            
+        except Exception as e:
+            print(f"Error refreshing user identity index: {e}")
+            connection.rollback()
+            return False
+        finally:
+            if connection.is_connected():
+                if cursor:
+                    cursor.close()
+                connection.close()
+
+    def get_company_partners(self):
+        """Fetch the partner of every company"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            df = pd.read_sql("SELECT id, partner_id FROM fido1.companies WHERE partner_id IS NOT NULL", connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching company partners: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_company_dimension(self):
+        """Fetch every company's name and partner, unscoped, for the shared log analytics engine"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            df = pd.read_sql("SELECT id, company_name, partner_id FROM fido1.companies", connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching company dimension: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_partner_dimension(self):
+        """Fetch every partner's name, unscoped, for the shared log analytics engine"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            df = pd.read_sql("SELECT id, partner_name FROM fido1.partners", connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching partner dimension: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_entity_hierarchy(self):
+        """The shared partner → company → user hierarchy, refreshed at most every ENTITY_HIERARCHY_REFRESH_SECONDS"""
+        _entity_hierarchy.refresh(self, ENTITY_HIERARCHY_REFRESH_SECONDS)
+        return _entity_hierarchy
+
+    def partner_scope_condition(self, partner_column, company_column, partner_id):
+        """SQL condition matching rows of a partner and its companies, from the shared hierarchy"""
+        return partner_condition(partner_column, company_column, partner_id, self.get_entity_hierarchy().companies_of(partner_id))
+
+    def ensure_user_identity_index(self, max_age_seconds=USER_IDENTITY_REFRESH_SECONDS):
+        """True when user_email_identity can be joined; refreshes it at most every `max_age_seconds`"""
+        with _user_identity_lock:
+            refreshed_at = _user_identity_state['refreshed_at']
+            if refreshed_at is None or time.monotonic() - refreshed_at >= max_age_seconds:
+                _user_identity_state['ready'] = self.refresh_user_identity_index()
+                _user_identity_state['refreshed_at'] = time.monotonic()
+            return _user_identity_state['ready']
+
+    def get_active_users_per_entity(self, activity_days=14):
+        """Fetch active users per company and per partner based on the last `activity_days` days of activity.
+
+        Activity is read from the activity_daily_rollup table, which is brought up to date
+        first. If the rollup is unavailable the raw fido1.app_log table is scanned instead.
+        Returns one row per (entity_type, entity_id); attributing the counts to licence
+        rounds is left to activity_index.attribute_entity_counts().
+        """
+        if self.refresh_activity_rollup():
+            recent_activity_query = '''
+                SELECT DISTINCT user_id
+                FROM activity_daily_rollup
+                WHERE day >= CURDATE() - INTERVAL %s DAY
+            '''
+        else:
+            recent_activity_query = '''
                 SELECT DISTINCT user_id
                 FROM fido1.app_log
-                WHERE timestamp >= NOW() - INTERVAL 14 DAY
+                WHERE timestamp >= NOW() - INTERVAL %s DAY
                 AND user_id IS NOT NULL
-            ) recent_activity ON recent_activity.user_id = u.id
-            WHERE lr.partner_id IS NOT NULL
-            GROUP BY lr.id, p.partner_name, lr.number_of_licenses
+            '''
+        
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            # One pass over the active users, fanned out to their company and their partner;
+            # the derived table is already distinct per user, so COUNT(*) is a distinct count
+            query = f'''
+            SELECT 
+              entity.entity_type,
+              CASE entity.entity_type WHEN 'Company' THEN u.company_id ELSE u.partner_id END AS entity_id,
+              COUNT(*) AS active_users
+            FROM (
+                {recent_activity_query}
+            ) recent_activity
+            JOIN users_portal u ON u.id = recent_activity.user_id
+            CROSS JOIN (SELECT 'Company' AS entity_type UNION ALL SELECT 'Partner') entity
+            WHERE 1=1 {self.scope_filter('u.company_id', 'u.partner_id')}
+            GROUP BY entity.entity_type, entity_id
+            HAVING entity_id IS NOT NULL
             '''
             
-            df = pd.read_sql(query, connection)
+            df = pd.read_sql(query, connection, params=(activity_days,))
             return df
         
         except Exception as e:
@@ -285,14 +745,14 @@ class DatabaseConnection:
         
         try:
             # Get user counts for both company and partner licenses
-            query = '''
+            query = f'''
             SELECT 
                 c.company_name as entity_name,
                 'Company' as entity_type,
                 COUNT(u.id) as user_count
             FROM users_portal u
             JOIN companies c ON u.company_id = c.id
-            WHERE u.active = 1
+            WHERE u.active = 1 {self.scope_filter('c.id', 'c.partner_id')}
             GROUP BY c.id, c.company_name
             
             UNION ALL
@@ -303,7 +763,7 @@ class DatabaseConnection:
                 COUNT(u.id) as user_count
             FROM users_portal u
             JOIN partners p ON u.partner_id = p.id
-            WHERE u.active = 1
+            WHERE u.active = 1 {self.scope_filter(partner_column='p.id')}
             GROUP BY p.id, p.partner_name
             '''
             
@@ -317,20 +777,183 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_active_relay_devices(self, user_role=None, user_company_id=None, user_partner_id=None):
-        """Fetch active relay devices by user, company and partner based on 14-day activity"""
+    def get_portal_users(self):
+        """Fetch every portal user with company/partner membership and account status"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            query = '''
+            SELECT 
+                u.id,
+                u.company_id,
+                u.partner_id,
+                u.active,
+                CONCAT(u.first_name, ' ', u.last_name) AS user_name,
+                u.email
+            FROM fido1.users_portal u
+            '''
+            df = pd.read_sql(query, connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching portal users: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_user_last_seen_delta(self, source, after_id=0):
+        """Fetch the latest activity per user from `source` rows with an id above `after_id`
+
+        Returns user_id, last_seen and max_id (the new watermark for the source). The very
+        first call is bounded to LAST_SEEN_BACKFILL_DAYS days of history.
+        """
+        table, timestamp_column = LAST_SEEN_SOURCE_TABLES[source]
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            backfill_filter = ""
+            params = [after_id]
+            if not after_id:
+                backfill_filter = f"AND {timestamp_column} >= CURDATE() - INTERVAL %s DAY"
+                params.append(LAST_SEEN_BACKFILL_DAYS)
+            
+            query = f'''
+            SELECT 
+                user_id,
+                MAX({timestamp_column}) AS last_seen,
+                MAX(id) AS max_id
+            FROM {table}
+            WHERE id > %s
+            AND user_id IS NOT NULL
+            {backfill_filter}
+            GROUP BY user_id
+            '''
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching last seen activity from {source}: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_app_session_delta(self, after_id=0):
+        """Aggregate the fido1.app_log rows with an id above `after_id` per session in one pass
+
+        Returns session_id, user_id, started_at, ended_at, event_count, first_action,
+        last_action and max_id (the new watermark) per session. Sessions that continue past
+        the previous watermark come back as a piece to be merged by AppSessionIndex. The very
+        first call is bounded to SESSION_BACKFILL_DAYS days of history.
+        """
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            backfill_filter = ""
+            params = [after_id]
+            if not after_id:
+                backfill_filter = "AND timestamp >= CURDATE() - INTERVAL %s DAY"
+                params.append(SESSION_BACKFILL_DAYS)
+            
+            query = f'''
+            SELECT session_id, user_id, started_at, ended_at, event_count, first_action, last_action, max_id
+            FROM (
+                SELECT
+                    session_id,
+                    user_id,
+                    ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp, id) AS event_rank,
+                    MIN(timestamp) OVER session_rows AS started_at,
+                    MAX(timestamp) OVER session_rows AS ended_at,
+                    COUNT(*) OVER session_rows AS event_count,
+                    FIRST_VALUE(action) OVER (PARTITION BY session_id ORDER BY timestamp, id) AS first_action,
+                    FIRST_VALUE(action) OVER (PARTITION BY session_id ORDER BY timestamp DESC, id DESC) AS last_action,
+                    MAX(id) OVER session_rows AS max_id
+                FROM fido1.app_log
+                WHERE id > %s
+                AND session_id IS NOT NULL
+                {backfill_filter}
+                WINDOW session_rows AS (PARTITION BY session_id)
+            ) session_events
+            WHERE event_rank = 1
+            '''
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching app sessions: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_daily_active_user_ids(self, since_day=None):
+        """Fetch distinct (day, user_id) activity pairs from `since_day` onwards
+
+        Reads the activity_daily_rollup table when it can be refreshed, otherwise scans
+        fido1.app_log. Without `since_day`, ACTIVITY_ROLLUP_BACKFILL_DAYS days are returned.
+        """
+        if self.refresh_activity_rollup():
+            query = '''
+            SELECT day, user_id
+            FROM activity_daily_rollup
+            WHERE day >= %s
+            '''
+        else:
+            query = '''
+            SELECT DISTINCT DATE(timestamp) AS day, user_id
+            FROM fido1.app_log
+            WHERE timestamp >= %s
+            AND user_id IS NOT NULL
+            '''
+        if since_day is None:
+            since_day = datetime.date.today() - datetime.timedelta(days=ACTIVITY_ROLLUP_BACKFILL_DAYS)
+        
         connection = self.get_connection()
         if not connection:
             return pd.DataFrame()
         
         try:
-            # Build role-based filtering
-            role_filter = ""
-            if user_role == "Company User" and user_company_id:
-                role_filter = f"AND u.company_id = {user_company_id}"
-            elif user_role == "Partner Admin" and user_partner_id:
-                role_filter = f"AND (c.partner_id = {user_partner_id} OR u.partner_id = {user_partner_id})"
-            # Admin role sees all data, so no additional filter needed
+            df = pd.read_sql(query, connection, params=(since_day,))
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching daily active users: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def _relay_role_filter(self, user_role=None, user_company_id=None, user_partner_id=None):
+        """Role-based 'AND ...' fragment for the relay queries; without an explicit role the connection's scope is applied"""
+        if user_role is None and self.scope.denied:
+            return "AND 1=0"
+        if user_role is None and self.scope.is_restricted:
+            user_role, user_company_id, user_partner_id = self.scope.role, self.scope.company_id, self.scope.partner_id
+        if user_role == "Company User" and user_company_id:
+            return f"AND u.company_id = {int(user_company_id)}"
+        if user_role == "Partner Admin" and user_partner_id:
+            return f"AND (c.partner_id = {int(user_partner_id)} OR u.partner_id = {int(user_partner_id)})"
+        # Admin role sees all data, so no additional filter needed
+        return ""
+
+    def get_active_relay_devices(self, user_role=None, user_company_id=None, user_partner_id=None, activity_days=14):
+        """Fetch active relay devices by user, company and partner based on `activity_days` days of activity
+
+        Without an explicit role the connection's scope is applied.
+        """
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            role_filter = self._relay_role_filter(user_role, user_company_id, user_partner_id)
             
             # Use the corrected query with user-level granularity
             query = f'''
@@ -347,7 +970,7 @@ class DatabaseConnection:
             LEFT JOIN fido1.companies c ON u.company_id = c.id
             LEFT JOIN fido1.partners p_from_company ON c.partner_id = p_from_company.id
             LEFT JOIN fido1.partners p_direct ON u.partner_id = p_direct.id
-            WHERE ram.create_time >= CURDATE() - INTERVAL 14 DAY
+            WHERE ram.create_time >= CURDATE() - INTERVAL {int(activity_days)} DAY
             {role_filter}
             GROUP BY u.id, u.first_name, u.last_name, u.email, c.company_name, partner_name
             ORDER BY active_relay_devices DESC
@@ -363,7 +986,88 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_portal_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+    def get_active_relay_devices_per_entity(self, user_role=None, user_company_id=None, user_partner_id=None, activity_days=14):
+        """Fetch distinct active relay devices per company and per partner over `activity_days` days
+
+        A device used by several users of an entity counts once, as in the approximate
+        sketches; the partner is taken from the user's company when set, otherwise from
+        the user directly. Returns entity_type, entity_id, entity_name and active_relay_devices.
+        """
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            role_filter = self._relay_role_filter(user_role, user_company_id, user_partner_id)
+            
+            # One pass over the activity, fanned out to each user's company and partner
+            query = f'''
+            SELECT 
+                entity.entity_type,
+                CASE entity.entity_type WHEN 'Company' THEN u.company_id ELSE COALESCE(c.partner_id, u.partner_id) END AS entity_id,
+                MAX(CASE entity.entity_type WHEN 'Company' THEN c.company_name ELSE p.partner_name END) AS entity_name,
+                COUNT(DISTINCT ram.relay_id) AS active_relay_devices
+            FROM fido1.relay_activity_monitor ram
+            LEFT JOIN fido1.logger_sessions ls ON ram.session_id = ls.session_id
+            LEFT JOIN fido1.users_portal u ON ls.deployed_by = u.id
+            LEFT JOIN fido1.companies c ON u.company_id = c.id
+            LEFT JOIN fido1.partners p ON p.id = COALESCE(c.partner_id, u.partner_id)
+            CROSS JOIN (SELECT 'Company' AS entity_type UNION ALL SELECT 'Partner') entity
+            WHERE ram.create_time >= CURDATE() - INTERVAL {int(activity_days)} DAY
+            {role_filter}
+            GROUP BY entity.entity_type, entity_id
+            HAVING entity_id IS NOT NULL
+            '''
+            
+            df = pd.read_sql(query, connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching active relay devices per company/partner: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_daily_relay_activity(self, since_day=None):
+        """Fetch distinct (day, user, company, partner, relay) activity tuples from `since_day` onwards
+
+        Feeds the approximate relay device sketches. The partner is taken from the user's
+        company when set, otherwise from the user directly, matching get_active_relay_devices.
+        Without `since_day`, ACTIVITY_ROLLUP_BACKFILL_DAYS days are returned.
+        """
+        if since_day is None:
+            since_day = datetime.date.today() - datetime.timedelta(days=ACTIVITY_ROLLUP_BACKFILL_DAYS)
+        
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            query = '''
+            SELECT DISTINCT
+                DATE(ram.create_time) AS day,
+                u.id AS user_id,
+                u.company_id,
+                COALESCE(c.partner_id, u.partner_id) AS partner_id,
+                ram.relay_id
+            FROM fido1.relay_activity_monitor ram
+            LEFT JOIN fido1.logger_sessions ls ON ram.session_id = ls.session_id
+            LEFT JOIN fido1.users_portal u ON ls.deployed_by = u.id
+            LEFT JOIN fido1.companies c ON u.company_id = c.id
+            WHERE ram.create_time >= %s
+            '''
+            df = pd.read_sql(query, connection, params=(since_day,))
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching daily relay activity: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_portal_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, page_size=LOG_PAGE_SIZE, before=None, after=None):
         """Fetch logs from portal_logs table only"""
         connection = self.get_connection()
         if not connection:
@@ -371,13 +1075,26 @@ class DatabaseConnection:
         
         try:
             # Build filters
+            # Filter and sort on the date and time columns themselves so their index is usable
             date_filter = ""
             if start_date and end_date:
-                date_filter = f"AND CONCAT(pl.date, ' ', pl.time) BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'"
+                date_filter = f"AND pl.date BETWEEN '{start_date}' AND '{end_date}'"
             elif start_date:
-                date_filter = f"AND CONCAT(pl.date, ' ', pl.time) >= '{start_date} 00:00:00'"
+                date_filter = f"AND pl.date >= '{start_date}'"
             elif end_date:
-                date_filter = f"AND CONCAT(pl.date, ' ', pl.time) <= '{end_date} 23:59:59'"
+                date_filter = f"AND pl.date <= '{end_date}'"
+            
+            # Portal rows carry no user id; it comes from the email identity index when available
+            identity_ready = self.ensure_user_identity_index()
+            identity_join = "LEFT JOIN user_email_identity ui ON ui.email = pl.email" if identity_ready else ""
+            user_id_column = "ui.user_id" if identity_ready else "NULL"
+            user_filter = ""
+            if user_id and identity_ready:
+                user_filter = f"AND pl.email IN (SELECT email FROM user_email_identity WHERE user_id = {int(user_id)})"
+            elif user_id:
+                charset, collation = self.portal_email_collation()
+                user_filter = (f"AND pl.email = (SELECT CONVERT(email USING {charset}) COLLATE {collation} "
+                               f"FROM fido1.users_portal WHERE id = {int(user_id)})")
             
             company_filter = ""
             if company_id:
@@ -385,34 +1102,44 @@ class DatabaseConnection:
             
             partner_filter = ""
             if partner_id:
-                partner_filter = f"AND pl.partner_id = {partner_id}"
+                partner_filter = f"AND {self.partner_scope_condition('pl.partner_id', 'pl.company_id', partner_id)}"
+            
+            # Page after the `before` cursor, and/or rows newer than the `after` watermark
+            keyset_filter_sql, params = keyset_filter(('pl.date', 'pl.time'), "pl.id", 'portal_logs', before)
+            watermark_sql, watermark_params = watermark_filter(('pl.date', 'pl.time'), "pl.id", after)
+            keyset_filter_sql += " " + watermark_sql
+            params += watermark_params
             
             query = f'''
             SELECT 
                 CONCAT(pl.date, ' ', pl.time) as timestamp,
-                CONVERT(pl.name USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                CONVERT(pl.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                CONVERT(pl.action USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                CONVERT(pl.status USING utf8mb4) COLLATE utf8mb4_unicode_ci as status,
-                CONVERT(pl.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                'portal_logs' COLLATE utf8mb4_unicode_ci as log_source,
-                CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
+                pl.name as user_name,
+                pl.email as user_email,
+                pl.action as action,
+                pl.status as status,
+                'portal_logs' as log_source,
+                c.company_name as company_name,
+                p.partner_name as partner_name,
                 NULL as session_id,
                 NULL as waypoint_id,
                 NULL as waypoint_name,
-                CONVERT(pl.object_data USING utf8mb4) COLLATE utf8mb4_unicode_ci as object_data,
-                CONVERT(JSON_OBJECT('company_id', pl.company_id, 'partner_id', pl.partner_id, 'branch_id', pl.branch_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
+                {user_id_column} as user_id,
+                pl.company_id,
+                pl.partner_id,
+                pl.branch_id,
+                NULL as dma_id,
+                pl.id as log_id
             FROM fido1.portal_logs pl
+            {identity_join}
             LEFT JOIN fido1.companies c ON pl.company_id = c.id
             LEFT JOIN fido1.partners p ON pl.partner_id = p.id
-            WHERE 1=1 {date_filter} {company_filter} {partner_filter}
-            ORDER BY CONCAT(pl.date, ' ', pl.time) DESC
-            LIMIT 1000
+            WHERE 1=1 {date_filter} {user_filter} {company_filter} {partner_filter} {self.scope_filter('pl.company_id', 'pl.partner_id')} {keyset_filter_sql}
+            ORDER BY pl.date DESC, pl.time DESC, pl.id DESC
+            LIMIT %s
             '''
             
-            df = pd.read_sql(query, connection)
-            return df
+            df = pd.read_sql(query, connection, params=params + [int(page_size)])
+            return type_log_id_columns(df)
             
         except Exception as e:
             print(f"Error fetching portal logs: {e}")
@@ -421,7 +1148,7 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_app_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+    def get_app_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, page_size=LOG_PAGE_SIZE, before=None, after=None):
         """Fetch logs from app_log table only"""
         connection = self.get_connection()
         if not connection:
@@ -447,35 +1174,44 @@ class DatabaseConnection:
             
             partner_filter = ""
             if partner_id:
-                partner_filter = f"AND u.partner_id = {partner_id}"
+                partner_filter = f"AND {self.partner_scope_condition('u.partner_id', 'u.company_id', partner_id)}"
+            
+            # Page after the `before` cursor, and/or rows newer than the `after` watermark
+            keyset_filter_sql, params = keyset_filter("al.timestamp", "al.id", 'app_log', before)
+            watermark_sql, watermark_params = watermark_filter("al.timestamp", "al.id", after)
+            keyset_filter_sql += " " + watermark_sql
+            params += watermark_params
             
             query = f'''
             SELECT 
                 al.timestamp,
-                CONVERT(CONCAT(u.first_name, ' ', u.last_name) USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                CONVERT(u.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                CONVERT(al.action USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                CONVERT(al.status USING utf8mb4) COLLATE utf8mb4_unicode_ci as status,
-                CONVERT(al.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                'app_log' COLLATE utf8mb4_unicode_ci as log_source,
-                CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
+                CONCAT(u.first_name, ' ', u.last_name) as user_name,
+                u.email as user_email,
+                al.action as action,
+                al.status as status,
+                'app_log' as log_source,
+                c.company_name as company_name,
+                p.partner_name as partner_name,
                 al.session_id,
                 al.waypoint_id,
                 NULL as waypoint_name,
-                NULL as object_data,
-                CONVERT(JSON_OBJECT('user_id', al.user_id, 'dma_id', al.dma_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
+                al.user_id,
+                u.company_id,
+                u.partner_id,
+                NULL as branch_id,
+                al.dma_id,
+                al.id as log_id
             FROM fido1.app_log al
             LEFT JOIN fido1.users_portal u ON al.user_id = u.id
             LEFT JOIN fido1.companies c ON u.company_id = c.id
             LEFT JOIN fido1.partners p ON u.partner_id = p.id
-            WHERE 1=1 {date_filter} {user_filter} {company_filter} {partner_filter}
-            ORDER BY al.timestamp DESC
-            LIMIT 1000
+            WHERE 1=1 {date_filter} {user_filter} {company_filter} {partner_filter} {self.scope_filter('u.company_id', 'u.partner_id')} {keyset_filter_sql}
+            ORDER BY al.timestamp DESC, al.id DESC
+            LIMIT %s
             '''
             
-            df = pd.read_sql(query, connection)
-            return df
+            df = pd.read_sql(query, connection, params=params + [int(page_size)])
+            return type_log_id_columns(df)
             
         except Exception as e:
             print(f"Error fetching app logs: {e}")
@@ -484,8 +1220,12 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_waypoint_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
-        """Fetch logs from fido_way.waypoint_logs table only"""
+    def get_waypoint_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, page_size=LOG_PAGE_SIZE, before=None, after=None):
+        """Fetch logs from fido_way.waypoint_logs table only
+
+        Status changes are returned as status_changed_from_id/status_changed_to_id; the
+        readable action and waypoint_name are attached by WaypointDimension.label_logs().
+        """
         connection = self.get_connection()
         if not connection:
             return pd.DataFrame()
@@ -510,35 +1250,46 @@ class DatabaseConnection:
             
             partner_filter = ""
             if partner_id:
-                partner_filter = f"AND u.partner_id = {partner_id}"
+                partner_filter = f"AND {self.partner_scope_condition('u.partner_id', 'u.company_id', partner_id)}"
+            
+            # Page after the `before` cursor, and/or rows newer than the `after` watermark
+            keyset_filter_sql, params = keyset_filter("wl.datetime", "wl.id", 'waypoint_logs', before)
+            watermark_sql, watermark_params = watermark_filter("wl.datetime", "wl.id", after)
+            keyset_filter_sql += " " + watermark_sql
+            params += watermark_params
             
             query = f'''
             SELECT 
                 wl.datetime as timestamp,
-                CONVERT(CONCAT(u.first_name, ' ', u.last_name) USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                CONVERT(u.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                CONVERT(CONCAT('Status Change: ', wl.status_changed_from_id, '→', wl.status_changed_to_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                'completed' COLLATE utf8mb4_unicode_ci as status,
-                CONVERT(wl.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                'waypoint_logs' COLLATE utf8mb4_unicode_ci as log_source,
-                CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
+                CONCAT(u.first_name, ' ', u.last_name) as user_name,
+                u.email as user_email,
+                NULL as action,
+                wl.status_changed_from_id,
+                wl.status_changed_to_id,
+                'completed' as status,
+                'waypoint_logs' as log_source,
+                c.company_name as company_name,
+                p.partner_name as partner_name,
                 NULL as session_id,
                 wl.waypoint_id,
                 NULL as waypoint_name,
-                NULL as object_data,
-                CONVERT(JSON_OBJECT('user_id', wl.user_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
+                wl.user_id,
+                u.company_id,
+                u.partner_id,
+                NULL as branch_id,
+                NULL as dma_id,
+                wl.id as log_id
             FROM fido_way.waypoint_logs wl
             LEFT JOIN fido1.users_portal u ON wl.user_id = u.id
             LEFT JOIN fido1.companies c ON u.company_id = c.id
             LEFT JOIN fido1.partners p ON u.partner_id = p.id
-            WHERE 1=1 {date_filter} {user_filter} {company_filter} {partner_filter}
-            ORDER BY wl.datetime DESC
-            LIMIT 1000
+            WHERE 1=1 {date_filter} {user_filter} {company_filter} {partner_filter} {self.scope_filter('u.company_id', 'u.partner_id')} {keyset_filter_sql}
+            ORDER BY wl.datetime DESC, wl.id DESC
+            LIMIT %s
             '''
             
-            df = pd.read_sql(query, connection)
-            return df
+            df = pd.read_sql(query, connection, params=params + [int(page_size)])
+            return type_log_id_columns(df)
             
         except Exception as e:
             print(f"Error fetching waypoint logs: {e}")
@@ -547,195 +1298,315 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_unified_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None):
-        """Fetch unified logs from portal_logs, app_log, and fido_way.waypoint_logs tables"""
+    def get_unified_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None, page_size=LOG_PAGE_SIZE, before=None):
+        """Fetch one page of unified logs from portal_logs, app_log, and fido_way.waypoint_logs tables
+
+        Each source's page is fetched separately and concurrently, then merged in Python, so
+        the sources never have to share UNION column types or collations.
+        """
+        fetchers = {
+            'Portal': self.get_portal_logs,
+            'App': self.get_app_logs,
+            'Waypoint': self.get_waypoint_logs
+        }
+        if log_type:
+            fetchers = {source: fetch for source, fetch in fetchers.items() if source == log_type}
+        filters = dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id,
+                       partner_id=partner_id, page_size=page_size, before=before)
+        with ThreadPoolExecutor(max_workers=len(fetchers) or 1) as executor:
+            pages = list(executor.map(lambda fetch: fetch(**filters), fetchers.values()))
+        return merge_log_pages(pages, page_size)
+
+    def get_log_details(self, log_keys, batch_size=LOG_DETAIL_BATCH_SIZE):
+        """Fetch notes and object_data for the given (log_source, log_id) rows in batched id lookups"""
         connection = self.get_connection()
         if not connection:
             return pd.DataFrame()
         
         try:
-            # Build date filter for each table type
-            portal_date_filter = ""
-            app_date_filter = ""
-            waypoint_date_filter = ""
+            frames = []
+            for source, keys in log_keys.groupby('log_source'):
+                ids = keys['log_id'].dropna().astype(int).unique().tolist()
+                for start in range(0, len(ids), batch_size):
+                    batch = ids[start:start + batch_size]
+                    query = LOG_DETAIL_QUERIES[source].format(ids=', '.join(['%s'] * len(batch)))
+                    frames.append(pd.read_sql(query, connection, params=batch).assign(log_source=source))
+            if not frames:
+                return pd.DataFrame(columns=['log_source', 'log_id', 'notes', 'object_data'])
+            df = pd.concat(frames, ignore_index=True)
+            return df[['log_source', 'log_id', 'notes', 'object_data']]
             
-            if start_date and end_date:
-                portal_date_filter = f"AND CONCAT(pl.date, ' ', pl.time) BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'"
-                app_date_filter = f"AND al.timestamp BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'"
-                waypoint_date_filter = f"AND wl.datetime BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'"
-            elif start_date:
-                portal_date_filter = f"AND CONCAT(pl.date, ' ', pl.time) >= '{start_date} 00:00:00'"
-                app_date_filter = f"AND al.timestamp >= '{start_date} 00:00:00'"
-                waypoint_date_filter = f"AND wl.datetime >= '{start_date} 00:00:00'"
-            elif end_date:
-                portal_date_filter = f"AND CONCAT(pl.date, ' ', pl.time) <= '{end_date} 23:59:59'"
-                app_date_filter = f"AND al.timestamp <= '{end_date} 23:59:59'"
-                waypoint_date_filter = f"AND wl.datetime <= '{end_date} 23:59:59'"
-            
-            # Build company filter
-            portal_company_filter = ""
-            app_company_filter = ""
-            waypoint_company_filter = ""
-            if company_id:
-                portal_company_filter = f"AND pl.company_id = {company_id}"
-                app_company_filter = f"AND u.company_id = {company_id}"
-                waypoint_company_filter = f"AND u.company_id = {company_id}"
-            
-            # Build partner filter
-            portal_partner_filter = ""
-            app_partner_filter = ""
-            waypoint_partner_filter = ""
-            if partner_id:
-                portal_partner_filter = f"AND pl.partner_id = {partner_id}"
-                app_partner_filter = f"AND u.partner_id = {partner_id}"
-                waypoint_partner_filter = f"AND u.partner_id = {partner_id}"
+        except Exception as e:
+            print(f"Error fetching log details: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def iter_query_chunks(self, query, params=None, chunksize=EXPORT_CHUNK_SIZE, dtypes=None):
+        """Stream a query's rows as DataFrames of at most `chunksize` rows
+
+        Rows are read through an unbuffered cursor, so the server streams the result and
+        only one chunk is held in memory at a time. `dtypes` maps column names to the
+        pandas dtypes each chunk is cast to. Errors, including a failed connection, are
+        raised so a cut-off stream is never mistaken for a complete one.
+        """
+        connection = self.get_connection()
+        if not connection:
+            raise ConnectionError("Could not connect to the database to stream query results")
+        
+        cursor = None
+        try:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute(query, params or ())
+            columns = [column[0] for column in cursor.description]
+            column_dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if column in columns}
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns).astype(column_dtypes)
             
-            # Build user filter (only for app and waypoint logs)
-            app_user_filter = ""
-            waypoint_user_filter = ""
-            if user_id:
-                app_user_filter = f"AND al.user_id = {user_id}"
-                waypoint_user_filter = f"AND wl.user_id = {user_id}"
-            
-            # Build log type filter
-            log_type_filter = ""
-            if log_type:
-                if log_type == "Portal":
-                    log_type_filter = "AND log_source = 'portal_logs'"
-                elif log_type == "App":
-                    log_type_filter = "AND log_source = 'app_log'"
-                elif log_type == "Waypoint":
-                    log_type_filter = "AND log_source = 'waypoint_logs'"
-            
-            # Build the query dynamically based on available tables and log type filter
-            union_parts = []
-            
-            # Always include Portal Logs (if not specifically filtered out)
-            if not log_type or log_type == "Portal":
-                portal_query = f'''
-                SELECT 
-                    CONCAT(pl.date, ' ', pl.time) as datetime,
-                    CONVERT(pl.name USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                    CONVERT(pl.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                    CONVERT(pl.action USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                    CONVERT(pl.status USING utf8mb4) COLLATE utf8mb4_unicode_ci as status,
-                    CONVERT(pl.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                    'portal_logs' COLLATE utf8mb4_unicode_ci as log_source,
-                    CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                    CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
-                    NULL as session_id,
-                    NULL as waypoint_id,
-                    NULL as waypoint_name,
-                    CONVERT(pl.object_data USING utf8mb4) COLLATE utf8mb4_unicode_ci as object_data,
-                    CONVERT(JSON_OBJECT('company_id', pl.company_id, 'partner_id', pl.partner_id, 'branch_id', pl.branch_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
-                FROM fido1.portal_logs pl
-                LEFT JOIN fido1.companies c ON pl.company_id = c.id
-                LEFT JOIN fido1.partners p ON pl.partner_id = p.id
-                WHERE 1=1 {portal_date_filter} {portal_company_filter} {portal_partner_filter}
-                '''
-                union_parts.append(portal_query)
+        except Exception as e:
+            print(f"Error streaming query results: {e}")
+            raise
+        finally:
+            # Closing an unbuffered cursor early discards the rest of the result
+            try:
+                if cursor is not None:
+                    cursor.close()
+            except Exception:
+                pass
+            if connection.is_connected():
+                connection.close()
+
+    def iter_log_export(self, source, after_id=0, chunksize=EXPORT_CHUNK_SIZE):
+        """Stream every raw row of a log table above `after_id` in id order, one typed chunk at a time"""
+        return self.iter_query_chunks(LOG_EXPORT_QUERIES[source], params=(after_id,), chunksize=chunksize, dtypes=LOG_EXPORT_DTYPES[source])
+
+    def _log_aggregate_filters(self, source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """WHERE clause and parameters applying the log filters to one source"""
+        spec = LOG_AGGREGATE_SOURCES[source]
+        conditions = ["1=1"]
+        params = []
+        if start_date:
+            conditions.append(f"{spec['range_column']} >= %s")
+            params.append(f"{start_date} 00:00:00")
+        if end_date:
+            conditions.append(f"{spec['range_column']} <= %s")
+            params.append(f"{end_date} 23:59:59")
+        if user_id:
+            if 'identity_user_filter' in spec and self.ensure_user_identity_index():
+                conditions.append(spec['identity_user_filter'])
+            elif '{collation}' in spec['user_filter']:
+                charset, collation = self.portal_email_collation()
+                conditions.append(spec['user_filter'].format(charset=charset, collation=collation))
+            else:
+                conditions.append(spec['user_filter'])
+            params.append(int(user_id))
+        if company_id:
+            conditions.append(f"{spec['company_column']} = %s")
+            params.append(int(company_id))
+        if partner_id:
+            conditions.append(self.partner_scope_condition(spec['partner_column'], spec['company_column'], partner_id))
+        scope_condition = self.scope_condition(spec['company_column'], spec['partner_column'])
+        if scope_condition:
+            conditions.append(scope_condition)
+        return ' AND '.join(conditions), params
+
+    def get_log_daily_counts(self, source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Count one log source's rows per day for the given filters"""
+        connection = self.get_connection()
+        if not connection:
+            raise ConnectionError(f"Could not connect to the database to aggregate {source}")
+        
+        try:
+            spec = LOG_AGGREGATE_SOURCES[source]
+            where, params = self._log_aggregate_filters(source, start_date, end_date, user_id, company_id, partner_id)
+            query = f'''
+            SELECT {spec['day']} AS date, COUNT(*) AS activity_count
+            FROM {spec['from']}
+            WHERE {where}
+            GROUP BY {spec['day']}
+            '''
             
-            # Always include App Logs (if not specifically filtered out)
-            if not log_type or log_type == "App":
-                app_query = f'''
-                SELECT 
-                    al.timestamp as datetime,
-                    CONVERT(CONCAT(u.first_name, ' ', u.last_name) USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                    CONVERT(u.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                    CONVERT(al.action USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                    CONVERT(al.status USING utf8mb4) COLLATE utf8mb4_unicode_ci as status,
-                    CONVERT(al.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                    'app_log' COLLATE utf8mb4_unicode_ci as log_source,
-                    CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                    CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
-                    al.session_id,
-                    al.waypoint_id,
-                    NULL as waypoint_name,
-                    NULL as object_data,
-                    CONVERT(JSON_OBJECT('user_id', al.user_id, 'dma_id', al.dma_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
-                FROM fido1.app_log al
-                LEFT JOIN fido1.users_portal u ON al.user_id = u.id
-                LEFT JOIN fido1.companies c ON u.company_id = c.id
-                LEFT JOIN fido1.partners p ON u.partner_id = p.id
-                WHERE 1=1 {app_date_filter} {app_user_filter} {app_company_filter} {app_partner_filter}
-                '''
-                union_parts.append(app_query)
-            
-            # Always include Waypoint Logs (if not specifically filtered out)
-            if not log_type or log_type == "Waypoint":
-                try:
-                    # Test if waypoint table is accessible
-                    test_cursor = connection.cursor()
-                    test_cursor.execute("SELECT 1 FROM fido_way.waypoint_logs LIMIT 1")
-                    _ = test_cursor.fetchall()  # Fetch the result to avoid 'Unread result found'
-                    test_cursor.close()
-                    
-                    # If we get here, the table is accessible
-                    waypoint_query = f'''
-                    SELECT 
-                        wl.datetime,
-                        CONVERT(CONCAT(u.first_name, ' ', u.last_name) USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_name,
-                        CONVERT(u.email USING utf8mb4) COLLATE utf8mb4_unicode_ci as user_email,
-                        CONVERT(CONCAT('Status Change: ', wl.status_changed_from_id, '→', wl.status_changed_to_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as action,
-                        'completed' COLLATE utf8mb4_unicode_ci as status,
-                        CONVERT(wl.notes USING utf8mb4) COLLATE utf8mb4_unicode_ci as notes,
-                        'waypoint_logs' COLLATE utf8mb4_unicode_ci as log_source,
-                        CONVERT(c.company_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as company_name,
-                        CONVERT(p.partner_name USING utf8mb4) COLLATE utf8mb4_unicode_ci as partner_name,
-                        NULL as session_id,
-                        wl.waypoint_id,
-                        NULL as waypoint_name,
-                        NULL as object_data,
-                        CONVERT(JSON_OBJECT('user_id', wl.user_id) USING utf8mb4) COLLATE utf8mb4_unicode_ci as metadata
-                    FROM fido_way.waypoint_logs wl
-                    LEFT JOIN fido1.users_portal u ON wl.user_id = u.id
-                    LEFT JOIN fido1.companies c ON u.company_id = c.id
-                    LEFT JOIN fido1.partners p ON u.partner_id = p.id
-                    WHERE 1=1 {waypoint_date_filter} {waypoint_user_filter} {waypoint_company_filter} {waypoint_partner_filter}
-                    '''
-                    union_parts.append(waypoint_query)
-                except Exception:
-                    # Table not accessible, skip waypoint logs
-                    pass
-            
-            if not union_parts:
-                return pd.DataFrame()
+            df = pd.read_sql(query, connection, params=params)
+            return df
             
-            # Combine all accessible parts
+        except Exception as e:
+            print(f"Error counting {source} rows: {e}")
+            raise
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_log_activity_buckets(self, source, bucket='day', entity=None, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Count one log source's rows per time bucket (hour, day, week or month)
+
+        With `entity` set to 'company' or 'partner' the counts are also split by that
+        entity's id. Returns bucket_start, [entity_id,] activity_count.
+        """
+        connection = self.get_connection()
+        if not connection:
+            raise ConnectionError(f"Could not connect to the database to aggregate {source}")
+        
+        try:
+            spec = LOG_AGGREGATE_SOURCES[source]
+            where, params = self._log_aggregate_filters(source, start_date, end_date, user_id, company_id, partner_id)
+            bucket_expr = LOG_TIME_BUCKETS[bucket].format(ts=spec['timestamp'])
+            group_columns = [bucket_expr]
+            entity_select = ""
+            if entity:
+                group_columns.append(spec[f'{entity}_column'])
+                entity_select = f"{spec[f'{entity}_column']} AS entity_id,"
             query = f'''
-            SELECT 
-                datetime as timestamp,
-                user_name,
-                user_email,
-                action,
-                status,
-                notes,
-                log_source,
-                company_name,
-                partner_name,
-                session_id,
-                waypoint_id,
-                waypoint_name,
-                object_data,
-                metadata
-            FROM (
-                {' UNION ALL '.join(union_parts)}
-            ) unified_logs
-            WHERE 1=1 {log_type_filter}
-            ORDER BY datetime DESC
-            LIMIT 1000
+            SELECT {bucket_expr} AS bucket_start, {entity_select} COUNT(*) AS activity_count
+            FROM {spec['from']}
+            WHERE {where}
+            GROUP BY {', '.join(group_columns)}
+            '''
+            
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error bucketing {source} rows: {e}")
+            raise
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_log_hour_weekday_counts(self, source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Count one log source's rows per weekday (0 = Monday) and hour of day"""
+        connection = self.get_connection()
+        if not connection:
+            raise ConnectionError(f"Could not connect to the database to aggregate {source}")
+        
+        try:
+            spec = LOG_AGGREGATE_SOURCES[source]
+            where, params = self._log_aggregate_filters(source, start_date, end_date, user_id, company_id, partner_id)
+            query = f'''
+            SELECT WEEKDAY({spec['timestamp']}) AS weekday, HOUR({spec['timestamp']}) AS hour, COUNT(*) AS activity_count
+            FROM {spec['from']}
+            WHERE {where}
+            GROUP BY WEEKDAY({spec['timestamp']}), HOUR({spec['timestamp']})
+            '''
+            
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error counting {source} rows per hour: {e}")
+            raise
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_log_user_keys(self, source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Distinct users (lower-cased email, or #user_id) appearing in one log source for the given filters"""
+        connection = self.get_connection()
+        if not connection:
+            raise ConnectionError(f"Could not connect to the database to aggregate {source}")
+        
+        try:
+            spec = LOG_AGGREGATE_SOURCES[source]
+            where, params = self._log_aggregate_filters(source, start_date, end_date, user_id, company_id, partner_id)
+            query = f'''
+            SELECT DISTINCT {spec['user_key']} AS user_key
+            FROM {spec['from']}
+            WHERE {where}
+            '''
+            
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching {source} users: {e}")
+            raise
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_waypoint_status_transitions(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Count waypoint status changes per day and (status_changed_from_id, status_changed_to_id) pair"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            spec = LOG_AGGREGATE_SOURCES['waypoint_logs']
+            where, params = self._log_aggregate_filters('waypoint_logs', start_date, end_date, user_id, company_id, partner_id)
+            query = f'''
+            SELECT {spec['day']} AS date, wl.status_changed_from_id, wl.status_changed_to_id, COUNT(*) AS transition_count
+            FROM {spec['from']}
+            WHERE {where}
+            AND wl.status_changed_from_id IS NOT NULL
+            AND wl.status_changed_to_id IS NOT NULL
+            GROUP BY {spec['day']}, wl.status_changed_from_id, wl.status_changed_to_id
             '''
             
+            df = pd.read_sql(query, connection, params=params)
+            return df
+            
+        except Exception as e:
+            print(f"Error counting waypoint status transitions: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def get_waypoint_dimension_fingerprint(self):
+        """Row count, max id and last update time of each waypoint dimension table, to detect changes"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            query = ' UNION ALL '.join(
+                f'''
+                SELECT '{name}' AS table_name, COUNT(*) AS row_count, MAX(id) AS max_id,
+                    (SELECT UPDATE_TIME FROM information_schema.TABLES
+                     WHERE TABLE_SCHEMA = '{table.split('.')[0]}' AND TABLE_NAME = '{table.split('.')[1]}') AS updated_at
+                FROM {table}
+                '''
+                for name, (table, _) in WAYPOINT_DIMENSION_TABLES.items()
+            )
             df = pd.read_sql(query, connection)
             return df
             
         except Exception as e:
-            print(f"Error fetching unified logs: {e}")
+            print(f"Error fetching waypoint dimension fingerprint: {e}")
+            return pd.DataFrame()
+        finally:
+            if connection.is_connected():
+                connection.close()
+
+    def _get_dimension_table(self, name):
+        """Fetch an (id, name) dimension table listed in WAYPOINT_DIMENSION_TABLES"""
+        connection = self.get_connection()
+        if not connection:
+            return pd.DataFrame()
+        
+        try:
+            table, name_column = WAYPOINT_DIMENSION_TABLES[name]
+            df = pd.read_sql(f"SELECT id, {name_column} AS name FROM {table}", connection)
+            return df
+            
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
             return pd.DataFrame()
         finally:
             if connection.is_connected():
                 connection.close()
 
+    def get_waypoints(self):
+        """Fetch waypoint ids and names"""
+        return self._get_dimension_table('waypoints')
+
+    def get_waypoint_statuses(self):
+        """Fetch waypoint status ids and labels"""
+        return self._get_dimension_table('waypoint_statuses')
+
     def get_top_waypoints_today(self):
         """Get top 3 most active waypoints worked on today"""
         connection = self.get_connection()
@@ -749,13 +1620,14 @@ class DatabaseConnection:
             test_cursor.close()
             
             # If we get here, the table is accessible
-            query = '''
+            query = f'''
             SELECT 
                 waypoint_id, 
                 waypoint_name, 
                 COUNT(*) AS actions_today
             FROM fido_way.waypoint_logs
             WHERE DATE(datetime) = CURRENT_DATE
+            {self._scoped_users_filter('user_id')}
             GROUP BY waypoint_id, waypoint_name
             ORDER BY actions_today DESC
             LIMIT 3
@@ -778,7 +1650,7 @@ class DatabaseConnection:
             return pd.DataFrame()
         
         try:
-            query = '''
+            query = f'''
             SELECT 
                 session_id, 
                 COUNT(*) AS activity_count,
@@ -787,6 +1659,7 @@ class DatabaseConnection:
             FROM fido1.app_log
             WHERE DATE(timestamp) = CURRENT_DATE
             AND session_id IS NOT NULL
+            {self._scoped_users_filter('user_id')}
             GROUP BY session_id
             ORDER BY activity_count DESC
             LIMIT 3
@@ -802,8 +1675,12 @@ class DatabaseConnection:
             if connection.is_connected():
                 connection.close()
 
-    def get_log_filters(self):
-        """Get available filter options for logs"""
+    def get_log_filters(self, include_users=True):
+        """Get available filter options for logs
+
+        The dashboard searches users through user_search.UserPrefixIndex and passes
+        include_users=False to skip loading every active user here.
+        """
         connection = self.get_connection()
         if not connection:
             return {
@@ -815,34 +1692,35 @@ class DatabaseConnection:
         
         try:
             # Get unique users
-            users_query = '''
-            SELECT DISTINCT 
-                u.id,
-                CONCAT(u.first_name, ' ', u.last_name) as user_name,
-                u.email
-            FROM fido1.users_portal u
-            WHERE u.active = 1
-            ORDER BY user_name
-            '''
-            users_df = pd.read_sql(users_query, connection)
-            users = [{'id': row['id'], 'name': row['user_name'], 'email': row['email']} 
-                    for _, row in users_df.iterrows()]
+            users = []
+            if include_users:
+                users_query = f'''
+                SELECT DISTINCT 
+                    u.id,
+                    CONCAT(u.first_name, ' ', u.last_name) as user_name,
+                    u.email
+                FROM fido1.users_portal u
+                WHERE u.active = 1 {self.scope_filter('u.company_id', 'u.partner_id')}
+                ORDER BY user_name
+                '''
+                users_df = pd.read_sql(users_query, connection)
+                users = users_df.rename(columns={'user_name': 'name'})[['id', 'name', 'email']].to_dict('records')
             
             # Get companies
-            companies_query = '''
-            SELECT id, company_name 
+            companies_query = f'''
+            SELECT id, company_name, partner_id 
             FROM fido1.companies 
-            WHERE active = 1 
+            WHERE active = 1 {self.scope_filter('id', 'partner_id')}
             ORDER BY company_name
             '''
             companies_df = pd.read_sql(companies_query, connection)
-            companies = [{'id': row['id'], 'name': row['company_name']} 
-                        for _, row in companies_df.iterrows()]
+            companies = companies_df.rename(columns={'company_name': 'name'})[['id', 'name', 'partner_id']].to_dict('records')
             
             # Get partners
-            partners_query = '''
+            partners_query = f'''
             SELECT id, partner_name 
             FROM fido1.partners 
+            WHERE 1=1 {self.scope_filter(partner_column='id')}
             ORDER BY partner_name
             '''
             partners_df = pd.read_sql(partners_query, connection)
@@ -906,7 +1784,7 @@ class DatabaseConnection:
             
             partner_filter = ""
             if partner_id:
-                partner_filter = f"AND u.partner_id = {partner_id}"
+                partner_filter = f"AND {self.partner_scope_condition('u.partner_id', 'u.company_id', partner_id)}"
             
             query = f'''
                 SELECT 
@@ -916,7 +1794,7 @@ class DatabaseConnection:
                     COUNT(DISTINCT al.session_id) AS session_count
                 FROM fido1.app_log al
                 LEFT JOIN fido1.users_portal u ON al.user_id = u.id
-                WHERE al.user_id IS NOT NULL {date_filter} {user_filter} {company_filter} {partner_filter}
+                WHERE al.user_id IS NOT NULL {date_filter} {user_filter} {company_filter} {partner_filter} {self.scope_filter('u.company_id', 'u.partner_id')}
                 GROUP BY al.user_id, user_name, u.email
                 ORDER BY session_count DESC
                 LIMIT 3
@@ -962,7 +1840,7 @@ class DatabaseConnection:
             
             partner_filter = ""
             if partner_id:
-                partner_filter = f"AND u.partner_id = {partner_id}"
+                partner_filter = f"AND {self.partner_scope_condition('u.partner_id', 'u.company_id', partner_id)}"
             
             query = f'''
                 SELECT 
@@ -972,7 +1850,7 @@ class DatabaseConnection:
                     COUNT(*) AS waypoint_count
                 FROM fido_way.waypoint_logs wl
                 LEFT JOIN fido1.users_portal u ON wl.user_id = u.id
-                WHERE wl.user_id IS NOT NULL {date_filter} {user_filter} {company_filter} {partner_filter}
+                WHERE wl.user_id IS NOT NULL {date_filter} {user_filter} {company_filter} {partner_filter} {self.scope_filter('u.company_id', 'u.partner_id')}
                 GROUP BY wl.user_id, user_name, u.email
                 ORDER BY waypoint_count DESC
                 LIMIT 3
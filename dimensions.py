@@ -0,0 +1,73 @@
+"""
+Small cached dimension tables attached to log rows in Python
+
+Dimensions are loaded once, kept in memory as id-indexed Series and only reloaded
+when the source tables' fingerprint changes, so labelling a page of logs is a couple
+of vectorised lookups instead of extra joins on the hot log queries.
+"""
+
+import pandas as pd
+
+from refresh_throttle import ThrottledRefresh
+
+
+class WaypointDimension(ThrottledRefresh):
+    """Waypoint names and waypoint status labels keyed by id"""
+
+    REFRESH_SECONDS = 300
+
+    def __init__(self):
+        self.waypoint_names = pd.Series(dtype=object)
+        self.status_labels = pd.Series(dtype=object)
+        self.fingerprint = None
+        self._init_refresh()
+
+    def update(self, waypoints_df, statuses_df):
+        """Replace both lookups from (id, name) frames"""
+        self.waypoint_names = _lookup(waypoints_df)
+        self.status_labels = _lookup(statuses_df)
+
+    def _reload(self, db):
+        """Reload the lookups when the source tables have changed
+
+        Only the fingerprint is read on each refresh; the tables themselves are read
+        when it differs from the one they were loaded with.
+        """
+        fingerprint_df = db.get_waypoint_dimension_fingerprint()
+        fingerprint = tuple(fingerprint_df.astype(str).itertuples(index=False, name=None))
+        if fingerprint_df.empty or fingerprint != self.fingerprint:
+            self.update(db.get_waypoints(), db.get_waypoint_statuses())
+            self.fingerprint = fingerprint
+
+    def label_logs(self, logs_df):
+        """Attach waypoint names and readable status-change actions to a page of logs
+
+        Returns a new frame; ids without a known name or label are shown as the id.
+        """
+        if logs_df.empty:
+            return logs_df
+        labelled = logs_df.copy()
+        if 'waypoint_id' in labelled.columns:
+            waypoint_ids = pd.to_numeric(labelled['waypoint_id'], errors='coerce')
+            labelled['waypoint_name'] = waypoint_ids.map(self.waypoint_names)
+        if {'status_changed_from_id', 'status_changed_to_id'} <= set(labelled.columns):
+            from_ids = pd.to_numeric(labelled['status_changed_from_id'], errors='coerce')
+            to_ids = pd.to_numeric(labelled['status_changed_to_id'], errors='coerce')
+            transitions = from_ids.notna() & to_ids.notna()
+            if transitions.any():
+                from_labels = self._status_text(from_ids[transitions])
+                to_labels = self._status_text(to_ids[transitions])
+                labelled.loc[transitions, 'action'] = 'Status Change: ' + from_labels + ' → ' + to_labels
+        return labelled
+
+    def _status_text(self, status_ids):
+        """Status labels for a Series of ids, falling back to the id itself"""
+        return status_ids.map(self.status_labels).fillna(status_ids.astype('int64').astype(str))
+
+
+def _lookup(df):
+    """id → name Series from an (id, name) frame"""
+    if df.empty:
+        return pd.Series(dtype=object)
+    df = df.dropna(subset=['id'])
+    return pd.Series(df['name'].to_numpy(), index=df['id'].astype('int64'))
@@ -0,0 +1,86 @@
+"""
+Partner → company → user hierarchy with precomputed descendant id sets
+"""
+
+import pandas as pd
+
+from refresh_throttle import ThrottledRefresh
+
+EMPTY_IDS = frozenset()
+
+
+class EntityHierarchy(ThrottledRefresh):
+    """Which companies belong to each partner, and which users to each company and partner.
+
+    A user belongs to a company through users_portal.company_id and to a partner both
+    directly through users_portal.partner_id and through their company's partner. All
+    descendant sets are frozensets built once per refresh, so expanding a filter is a
+    dictionary lookup.
+    """
+
+    REFRESH_SECONDS = 600
+
+    def __init__(self):
+        self.partner_companies = {}
+        self.company_users = {}
+        self.partner_users = {}
+        self.company_partner = {}
+        self._init_refresh()
+
+    def update(self, companies_df, users_df):
+        """Rebuild the id sets from (id, partner_id) companies and (id, company_id, partner_id) users"""
+        companies = companies_df.dropna(subset=['id', 'partner_id'])
+        company_partner = dict(zip(companies['id'].astype('int64'), companies['partner_id'].astype('int64')))
+        partner_companies = {
+            int(partner_id): frozenset(company_ids.astype('int64'))
+            for partner_id, company_ids in companies['id'].groupby(companies['partner_id'].astype('int64'))
+        }
+
+        users = users_df.dropna(subset=['id'])
+        members = users[users['company_id'].notna()]
+        company_users = {
+            int(company_id): frozenset(user_ids.astype('int64'))
+            for company_id, user_ids in members['id'].groupby(members['company_id'].astype('int64'))
+        }
+
+        # Users of a partner: direct partner_id, plus every user of the partner's companies
+        direct = users[users['partner_id'].notna()]
+        partner_users = {
+            int(partner_id): set(user_ids.astype('int64'))
+            for partner_id, user_ids in direct['id'].groupby(direct['partner_id'].astype('int64'))
+        }
+        for partner_id, company_ids in partner_companies.items():
+            company_members = partner_users.setdefault(partner_id, set())
+            for company_id in company_ids:
+                company_members.update(company_users.get(company_id, EMPTY_IDS))
+        partner_users = {partner_id: frozenset(user_ids) for partner_id, user_ids in partner_users.items()}
+
+        self.partner_companies = partner_companies
+        self.company_users = company_users
+        self.partner_users = partner_users
+        self.company_partner = company_partner
+
+    def companies_of(self, partner_id):
+        """Ids of the companies under a partner"""
+        return self.partner_companies.get(int(partner_id), EMPTY_IDS) if partner_id else EMPTY_IDS
+
+    def users_of(self, company_id=None, partner_id=None):
+        """Ids of the users under a company and/or partner (the intersection when both are given)"""
+        scopes = []
+        if company_id:
+            scopes.append(self.company_users.get(int(company_id), EMPTY_IDS))
+        if partner_id:
+            scopes.append(self.partner_users.get(int(partner_id), EMPTY_IDS))
+        if not scopes:
+            return EMPTY_IDS
+        return scopes[0] if len(scopes) == 1 else scopes[0] & scopes[1]
+
+    def _reload(self, db):
+        """Reload companies and users from the database"""
+        companies_df = db.get_company_partners()
+        users_df = db.get_portal_users()
+        if not companies_df.empty or not users_df.empty:
+            self.update(
+                companies_df if not companies_df.empty else pd.DataFrame(columns=['id', 'partner_id']),
+                users_df if not users_df.empty else pd.DataFrame(columns=['id', 'company_id', 'partner_id'])
+            )
@@ -0,0 +1,206 @@
+"""
+Interval index over licence rounds for point-in-time seat queries
+"""
+
+import numpy as np
+import pandas as pd
+
+INTERVAL_COLUMNS = ['id', 'entity_type', 'entity_id', 'start_day', 'end_day', 'seats']
+
+
+def _to_days(dates):
+    """Dates as int64 days since the epoch; missing dates become -1"""
+    days = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy(dtype='datetime64[D]')
+    return np.where(np.isnat(days), -1, days.astype(np.int64))
+
+
+def _from_days(days):
+    return pd.to_datetime(np.asarray(days, dtype=np.int64).astype('datetime64[D]'))
+
+
+def _sweep(start_days, end_days, seats):
+    """Sorted event days and the seats in force from each one on
+
+    A round adds its seats on its start day and removes them the day after its end
+    day (end dates are inclusive); rounds without an end date stay in force.
+    """
+    if not len(start_days):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    closed = end_days >= 0
+    days = np.concatenate([start_days, end_days[closed] + 1])
+    deltas = np.concatenate([seats, -seats[closed]])
+    order = np.argsort(days, kind='stable')
+    days, deltas = days[order], np.cumsum(deltas[order])
+    # Several events on one day: keep the running total after the last of them
+    last = np.r_[days[1:] != days[:-1], True]
+    return days[last], deltas[last]
+
+
+def _lookup(event_days, in_force, days):
+    """Seats in force on each of `days` from a _sweep() result"""
+    if not len(event_days):
+        return np.zeros(len(days), dtype=np.int64)
+    positions = np.searchsorted(event_days, days, side='right') - 1
+    return np.where(positions >= 0, in_force[np.maximum(positions, 0)], 0)
+
+
+class LicenceIntervalIndex:
+    """Licence rounds as (start_date, end_date, seats) intervals per company or partner.
+
+    Rounds are keyed by entity the same way active users are attributed: company_id when
+    set, otherwise partner_id. Totals come from one sorted sweep of start and end events
+    with a running seat count, so "seats on day D" is a binary search and a daily series
+    is one vectorised lookup. Per-entity questions use the same sweep laid out per entity
+    under a composite (entity, day) key.
+    """
+
+    def __init__(self):
+        self.intervals = pd.DataFrame(columns=INTERVAL_COLUMNS)
+        self.entities = []
+        self._event_days = np.array([], dtype=np.int64)
+        self._in_force = np.array([], dtype=np.int64)
+        self._entity_event_keys = np.array([], dtype=np.int64)
+        self._entity_in_force = np.array([], dtype=np.int64)
+        self._stride = 1
+        self._origin = 0
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def update(self, licences_df):
+        """Rebuild the index from licence rows (id, company_id, partner_id, start_date, end_date, number_of_licenses)"""
+        if licences_df.empty:
+            self.__init__()
+            return
+        is_company = licences_df['company_id'].notna()
+        intervals = pd.DataFrame({
+            'id': licences_df['id'].to_numpy() if 'id' in licences_df.columns else np.arange(len(licences_df)),
+            'entity_type': np.where(is_company, 'Company', np.where(licences_df['partner_id'].notna(), 'Partner', 'Unknown')),
+            'entity_id': licences_df['company_id'].where(is_company, licences_df['partner_id']).fillna(0).astype(np.int64).to_numpy(),
+            'start_day': _to_days(licences_df['start_date']),
+            'end_day': _to_days(licences_df['end_date']),
+            'seats': pd.to_numeric(licences_df['number_of_licenses'], errors='coerce').fillna(0).astype(np.int64).to_numpy()
+        })
+        # A round without a start date is never in force; an end before the start is a data error
+        intervals = intervals[(intervals['start_day'] >= 0) &
+                              ((intervals['end_day'] < 0) | (intervals['end_day'] >= intervals['start_day']))]
+        if intervals.empty:
+            self.__init__()
+            return
+        intervals = intervals.reset_index(drop=True)
+        codes, entities = pd.factorize(pd.MultiIndex.from_arrays([intervals['entity_type'], intervals['entity_id']]))
+        intervals['entity_code'] = codes
+
+        starts = intervals['start_day'].to_numpy()
+        ends = intervals['end_day'].to_numpy()
+        seats = intervals['seats'].to_numpy()
+        self._event_days, self._in_force = _sweep(starts, ends, seats)
+
+        # Per-entity sweep: entity code * stride + day keeps each entity's events contiguous and sorted
+        self._origin = int(starts.min())
+        self._stride = int(max(starts.max(), ends.max()) - self._origin + 3)
+        closed = ends >= 0
+        event_codes = np.concatenate([codes, codes[closed]])
+        event_keys = event_codes * self._stride + np.concatenate([starts, ends[closed] + 1]) - self._origin
+        deltas = np.concatenate([seats, -seats[closed]])
+        order = np.argsort(event_keys, kind='stable')
+        event_keys, event_codes, deltas = event_keys[order], event_codes[order], deltas[order]
+        running = np.cumsum(deltas)
+        # Subtract the running total carried in from earlier entities (open rounds never return it to zero)
+        first = np.r_[True, event_codes[1:] != event_codes[:-1]]
+        carried = np.repeat(np.r_[0, running][np.flatnonzero(first)], np.diff(np.r_[np.flatnonzero(first), len(running)]))
+        last = np.r_[event_keys[1:] != event_keys[:-1], True]
+        self._entity_event_keys = event_keys[last]
+        self._entity_in_force = (running - carried)[last]
+
+        self.intervals = intervals
+        self.entities = list(entities)
+
+    def seats_on(self, day):
+        """Total seats of the rounds in force on `day`"""
+        return int(_lookup(self._event_days, self._in_force, _to_days([day]))[0])
+
+    def seats_on_by_entity(self, day):
+        """Seats in force on `day` per entity; entities with none in force are left out
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns entity_type, entity_id and seats.
+        """
+        if not self.entities:
+            return pd.DataFrame(columns=['entity_type', 'entity_id', 'seats'])
+        day = int(_to_days([day])[0]) - self._origin
+        codes = np.arange(len(self.entities), dtype=np.int64)
+        if day < 0:
+            seats = np.zeros(len(codes), dtype=np.int64)
+        else:
+            # Days past the last event see whatever each entity still holds open-ended
+            keys = codes * self._stride + min(day, self._stride - 1)
+            positions = np.searchsorted(self._entity_event_keys, keys, side='right') - 1
+            # A position in an earlier entity's block means no event of this entity yet
+            valid = (positions >= 0) & (self._entity_event_keys[np.maximum(positions, 0)] // self._stride == codes)
+            seats = np.where(valid, self._entity_in_force[np.maximum(positions, 0)], 0)
+        in_force = np.flatnonzero(seats)
+        return pd.DataFrame({
+            'entity_type': [self.entities[code][0] for code in in_force],
+            'entity_id': np.array([self.entities[code][1] for code in in_force], dtype=np.int64),
+            'seats': seats[in_force]
+        })
+
+    def seats_per_day(self, start_day, end_day, entity_keys=None):
+        """Seats in force on every day of a range
+
+        When `entity_keys` ((entity_type, entity_id) pairs) is given, only those entities'
+        rounds are counted. Returns a frame of date and seats.
+        """
+        days = np.arange(_to_days([start_day])[0], _to_days([end_day])[0] + 1, dtype=np.int64)
+        event_days, in_force = self._event_days, self._in_force
+        if entity_keys is not None:
+            wanted = [(entity_type, int(entity_id)) for entity_type, entity_id in entity_keys]
+            keys = pd.MultiIndex.from_arrays([self.intervals['entity_type'], self.intervals['entity_id']])
+            selected = self.intervals[keys.isin(wanted)]
+            event_days, in_force = _sweep(selected['start_day'].to_numpy(), selected['end_day'].to_numpy(),
+                                          selected['seats'].to_numpy())
+        return pd.DataFrame({'date': _from_days(days), 'seats': _lookup(event_days, in_force, days)})
+
+    def overlaps(self):
+        """Pairs of rounds of the same entity whose date ranges overlap
+
+        Returns
+        -------
+        pd.DataFrame
+            entity_type, entity_id, licence_id, other_licence_id, overlap_start, overlap_end
+            (NaT when both rounds are open-ended), overlap_days (NaN when open-ended),
+            seats and other_seats.
+        """
+        columns = ['entity_type', 'entity_id', 'licence_id', 'other_licence_id', 'overlap_start',
+                   'overlap_end', 'overlap_days', 'seats', 'other_seats']
+        if self.intervals.empty:
+            return pd.DataFrame(columns=columns)
+        rounds = self.intervals.sort_values(['entity_code', 'start_day'], kind='stable').reset_index(drop=True)
+        codes = rounds['entity_code'].to_numpy(dtype=np.int64)
+        starts = rounds['start_day'].to_numpy() - self._origin
+        ends = rounds['end_day'].to_numpy()
+        open_ended = ends < 0
+        ends = np.where(open_ended, self._stride - 1, ends - self._origin)
+        start_keys = codes * self._stride + starts
+        # Later rounds of the same entity starting on or before this round's end overlap it
+        last_overlapping = np.searchsorted(start_keys, codes * self._stride + ends, side='right')
+        counts = last_overlapping - np.arange(len(rounds)) - 1
+        left = np.repeat(np.arange(len(rounds)), counts)
+        right = left + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        both_open = open_ended[left] & open_ended[right]
+        overlap_end = np.minimum(ends[left], ends[right]) + self._origin
+        overlap_start = starts[right] + self._origin
+        return pd.DataFrame({
+            'entity_type': rounds['entity_type'].to_numpy()[left],
+            'entity_id': rounds['entity_id'].to_numpy()[left],
+            'licence_id': rounds['id'].to_numpy()[left],
+            'other_licence_id': rounds['id'].to_numpy()[right],
+            'overlap_start': _from_days(overlap_start),
+            'overlap_end': pd.Series(_from_days(overlap_end)).where(~both_open).to_numpy(),
+            'overlap_days': pd.Series(overlap_end - overlap_start + 1, dtype='float64').where(~both_open).to_numpy(),
+            'seats': rounds['seats'].to_numpy()[left],
+            'other_seats': rounds['seats'].to_numpy()[right]
+        }, columns=columns)
@@ -0,0 +1,91 @@
+"""
+Live tail of the portal, app and waypoint logs
+
+Each source keeps a (timestamp, id) watermark of the newest row seen; a poll asks only
+for rows above it (one index range seek per source) and appends them to a fixed-size
+ring buffer, so following the logs never re-runs the full unified query.
+"""
+
+from collections import deque
+import threading
+import pandas as pd
+
+from log_summary import LOG_TYPE_SOURCES, ALL_LOG_SOURCES
+
+# DatabaseConnection method serving each source's rows
+LIVE_TAIL_FETCHERS = {
+    'portal_logs': 'get_portal_logs',
+    'app_log': 'get_app_logs',
+    'waypoint_logs': 'get_waypoint_logs'
+}
+
+LIVE_TAIL_CAPACITY = 500
+
+
+class LiveLogTail:
+    """Ring buffer of the newest log rows for one filter set"""
+
+    def __init__(self, capacity=LIVE_TAIL_CAPACITY, user_id=None, company_id=None, partner_id=None, log_type=None):
+        self.capacity = capacity
+        self.filters = dict(user_id=user_id, company_id=company_id, partner_id=partner_id)
+        self.sources = LOG_TYPE_SOURCES.get(log_type, ALL_LOG_SOURCES)
+        self.watermarks = {source: None for source in self.sources}
+        self.polls = 0
+        self._rows = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _new_rows(self, source, logs_df):
+        """A source's rows above its watermark, advancing the watermark past them"""
+        if logs_df.empty:
+            return logs_df
+        logs_df = logs_df.assign(timestamp=pd.to_datetime(logs_df['timestamp']))
+        watermark = self.watermarks.get(source)
+        if watermark is not None:
+            # Rows at or below the watermark were already buffered
+            newer = (logs_df['timestamp'] > watermark[0]) | (
+                (logs_df['timestamp'] == watermark[0]) & (logs_df['log_id'] > watermark[1])
+            )
+            logs_df = logs_df[newer]
+            if logs_df.empty:
+                return logs_df
+        newest = logs_df.sort_values(['timestamp', 'log_id'], kind='stable').iloc[-1]
+        self.watermarks[source] = (newest['timestamp'], int(newest['log_id']))
+        return logs_df
+
+    def append(self, source_frames):
+        """Add each source's new rows to the buffer and advance the watermarks; returns the number added
+
+        The sources are merged in (timestamp, log_source, log_id) order before trimming, so a
+        full buffer keeps the newest rows across all sources rather than the last source polled.
+        """
+        new_frames = [self._new_rows(source, logs_df) for source, logs_df in source_frames.items()]
+        new_frames = [logs_df for logs_df in new_frames if not logs_df.empty]
+        if not new_frames:
+            return 0
+        new_rows = pd.concat(new_frames, ignore_index=True).to_dict('records')
+        merged = sorted(list(self._rows) + new_rows, key=lambda row: (row['timestamp'], row['log_source'], row['log_id']))
+        self._rows = deque(merged[-self.capacity:], maxlen=self.capacity)
+        return len(new_rows)
+
+    def poll(self, db):
+        """Fetch every source's rows above its watermark; returns the number of new rows"""
+        with self._lock:
+            source_frames = {}
+            for source in self.sources:
+                fetch = getattr(db, LIVE_TAIL_FETCHERS[source])
+                watermark = self.watermarks[source]
+                after = None if watermark is None else (str(watermark[0]), watermark[1])
+                source_frames[source] = fetch(**self.filters, page_size=self.capacity, after=after)
+            self.polls += 1
+            return self.append(source_frames)
+
+    def rows(self):
+        """Buffered rows, newest first"""
+        with self._lock:
+            logs_df = pd.DataFrame(list(self._rows))
+        if logs_df.empty:
+            return logs_df
+        return logs_df.sort_values(['timestamp', 'log_source', 'log_id'], ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,453 @@
+"""
+Embedded DuckDB analytics over the local log snapshots
+
+Queries run against the Parquet files written by ``snapshot_store.LogSnapshotStore``
+using DuckDB's multi-threaded engine, so log listings and summary aggregates cover
+every matching row instead of a 1,000-row sample, with no load on MySQL.
+"""
+
+import json
+import threading
+import pandas as pd
+import pyarrow as pa
+
+from snapshot_store import SNAPSHOT_SCHEMAS
+from log_cursors import LOG_PAGE_SIZE
+from refresh_throttle import ThrottledRefresh
+
+try:
+    import duckdb
+except ImportError:  # The dashboard falls back to live MySQL queries
+    duckdb = None
+
+# Per-source SELECTs normalised to the unified log layout; {where} receives the pushed-down filters
+SOURCE_SELECTS = {
+    'Portal': '''
+        SELECT
+            pl.timestamp,
+            CAST(pl.user_name AS VARCHAR) AS user_name,
+            CAST(pl.user_email AS VARCHAR) AS user_email,
+            CAST(pl.action AS VARCHAR) AS action,
+            CAST(pl.status AS VARCHAR) AS status,
+            'portal_logs' AS log_source,
+            pl.company_id,
+            pl.partner_id,
+            pl.branch_id,
+            CAST(NULL AS BIGINT) AS dma_id,
+            ui.user_id,
+            CAST(NULL AS VARCHAR) AS session_id,
+            CAST(NULL AS BIGINT) AS waypoint_id,
+            CAST(NULL AS BIGINT) AS status_changed_from_id,
+            CAST(NULL AS BIGINT) AS status_changed_to_id,
+            pl.id AS log_id
+        FROM portal_logs pl
+        LEFT JOIN user_identities ui ON lower(trim(CAST(pl.user_email AS VARCHAR))) = ui.email
+        WHERE {where}
+    ''',
+    'App': '''
+        SELECT
+            al.timestamp,
+            u.user_name,
+            u.email AS user_email,
+            CAST(al.action AS VARCHAR) AS action,
+            CAST(al.status AS VARCHAR) AS status,
+            'app_log' AS log_source,
+            u.company_id,
+            u.partner_id,
+            CAST(NULL AS BIGINT) AS branch_id,
+            al.dma_id,
+            al.user_id,
+            CAST(al.session_id AS VARCHAR) AS session_id,
+            al.waypoint_id,
+            CAST(NULL AS BIGINT) AS status_changed_from_id,
+            CAST(NULL AS BIGINT) AS status_changed_to_id,
+            al.id AS log_id
+        FROM app_log al
+        LEFT JOIN users u ON al.user_id = u.id
+        WHERE {where}
+    ''',
+    'Waypoint': '''
+        SELECT
+            wl.timestamp,
+            u.user_name,
+            u.email AS user_email,
+            CAST(NULL AS VARCHAR) AS action,
+            'completed' AS status,
+            'waypoint_logs' AS log_source,
+            u.company_id,
+            u.partner_id,
+            CAST(NULL AS BIGINT) AS branch_id,
+            CAST(NULL AS BIGINT) AS dma_id,
+            wl.user_id,
+            CAST(NULL AS VARCHAR) AS session_id,
+            wl.waypoint_id,
+            wl.status_changed_from_id,
+            wl.status_changed_to_id,
+            wl.id AS log_id
+        FROM waypoint_logs wl
+        LEFT JOIN users u ON wl.user_id = u.id
+        WHERE {where}
+    '''
+}
+
+# Snapshot table and column aliases used by each source's filters
+SOURCE_TABLES = {'Portal': ('portal_logs', 'pl'), 'App': ('app_log', 'al'), 'Waypoint': ('waypoint_logs', 'wl')}
+
+# Entity ids returned with every log row, as nullable integers
+LOG_ID_COLUMNS = ['user_id', 'company_id', 'partner_id', 'branch_id', 'dma_id']
+
+
+def type_log_id_columns(logs_df):
+    """Cast the log id columns present in a frame to nullable integers"""
+    return logs_df.astype({column: 'Int64' for column in LOG_ID_COLUMNS if column in logs_df.columns})
+
+
+def merge_log_pages(pages, page_size=LOG_PAGE_SIZE):
+    """Merge per-source log pages into one page ordered by timestamp, log_source and log_id descending"""
+    pages = [page for page in pages if not page.empty]
+    if not pages:
+        return pd.DataFrame()
+    merged = pd.concat(pages, ignore_index=True)
+    merged['timestamp'] = pd.to_datetime(merged['timestamp'])
+    merged = merged.sort_values(['timestamp', 'log_source', 'log_id'], ascending=False, kind='stable')
+    return merged.head(page_size).reset_index(drop=True)
+
+
+def build_log_metadata(logs_df):
+    """JSON metadata strings built from the non-null id columns of each row, for display"""
+    columns = [column for column in LOG_ID_COLUMNS if column in logs_df.columns]
+    records = logs_df[columns].astype(object).where(logs_df[columns].notna(), None).to_dict('records')
+    return pd.Series(
+        [json.dumps({key: int(value) for key, value in record.items() if value is not None}) for record in records],
+        index=logs_df.index,
+        dtype=object
+    )
+
+
+def summarise_logs(logs_df):
+    """Summary metrics computed from an already loaded log frame
+
+    Returns
+    -------
+    dict
+        total_logs, unique_users, source_counts (log_source → rows) and daily_counts
+        (a frame of date and activity_count).
+    """
+    if logs_df.empty:
+        return {
+            'total_logs': 0,
+            'unique_users': 0,
+            'source_counts': {},
+            'daily_counts': pd.DataFrame(columns=['date', 'activity_count'])
+        }
+    daily_counts = logs_df.groupby(pd.to_datetime(logs_df['timestamp']).dt.date).size().reset_index(name='activity_count')
+    daily_counts.columns = ['date', 'activity_count']
+    return {
+        'total_logs': len(logs_df),
+        'unique_users': logs_df['user_name'].nunique(),
+        'source_counts': logs_df['log_source'].value_counts().to_dict() if 'log_source' in logs_df.columns else {},
+        'daily_counts': daily_counts
+    }
+
+
+def pivot_status_transitions(transitions_df, status_labels=None):
+    """From-status × to-status matrix of transition counts summed over every day
+
+    Parameters
+    ----------
+    transitions_df : DataFrame
+        status_changed_from_id, status_changed_to_id and transition_count rows, as returned
+        by DatabaseConnection.get_waypoint_status_transitions().
+    status_labels : Series, optional
+        Status id → label used for the row and column names; unknown ids keep the id.
+
+    Returns
+    -------
+    DataFrame
+        One row per from-status and one column per to-status, zero where no change occurred.
+    """
+    if transitions_df.empty:
+        return pd.DataFrame()
+    matrix = transitions_df.pivot_table(
+        index='status_changed_from_id',
+        columns='status_changed_to_id',
+        values='transition_count',
+        aggfunc='sum',
+        fill_value=0
+    )
+    matrix.index = matrix.index.astype('int64')
+    matrix.columns = matrix.columns.astype('int64')
+    if status_labels is not None:
+        def label(status_id):
+            return str(status_labels.get(status_id, status_id))
+        matrix = matrix.rename(index=label, columns=label)
+    matrix.index.name = 'From status'
+    matrix.columns.name = 'To status'
+    return matrix.astype('int64')
+
+
+# Empty users/companies/partners tables, used until the dimensions are first loaded
+EMPTY_DIMENSIONS = {
+    'users': {'id': 'int64', 'user_name': object, 'email': object, 'company_id': 'float64', 'partner_id': 'float64'},
+    'companies': {'id': 'int64', 'company_name': object, 'partner_id': 'float64'},
+    'partners': {'id': 'int64', 'partner_name': object}
+}
+
+
+def _empty_dimension(name):
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in EMPTY_DIMENSIONS[name].items()})
+
+
+class LogAnalyticsEngine(ThrottledRefresh):
+    """DuckDB engine over the snapshot store plus small user/company/partner dimensions
+
+    One engine is shared by every session, so the dimensions always hold every user,
+    company and partner; a session's tenant scope is applied through its filters.
+    """
+
+    REFRESH_SECONDS = 300
+
+    def __init__(self, snapshot_store, threads=None):
+        self.snapshot_store = snapshot_store
+        self._connection = duckdb.connect(':memory:')
+        if threads:
+            self._connection.execute(f"SET threads TO {int(threads)}")
+        self._views = {}
+        self._lock = threading.Lock()
+        self.set_dimensions(_empty_dimension('users'), _empty_dimension('companies'), _empty_dimension('partners'))
+        self._init_refresh()
+
+    def _reload(self, db):
+        """Reload the dimensions from unscoped queries; a failed query keeps the previous table"""
+        frames = [db.get_portal_users(), db.get_company_dimension(), db.get_partner_dimension()]
+        # Loaders return a column-less frame on error, while an empty result keeps its columns
+        self.set_dimensions(*(df if len(df.columns) else None for df in frames))
+
+    @staticmethod
+    def is_supported():
+        """True when DuckDB is installed"""
+        return duckdb is not None
+
+    def has_data(self):
+        """True when at least one log table has been snapshotted"""
+        return any(self.snapshot_store.partitions(table) for table in SNAPSHOT_SCHEMAS)
+
+    def set_dimensions(self, users_df, companies_df, partners_df):
+        """Replace the users/companies/partners lookup tables used to label log rows; None keeps a table"""
+        if companies_df is not None and 'partner_id' not in companies_df.columns:
+            companies_df = companies_df.assign(partner_id=pd.Series(dtype='float64'))
+        with self._lock:
+            for name, df in (('users', users_df), ('companies', companies_df), ('partners', partners_df)):
+                if df is None:
+                    continue
+                if df.empty:
+                    df = _empty_dimension(name)
+                self._connection.register('dimension_frame', df)
+                self._connection.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM dimension_frame")
+                self._connection.unregister('dimension_frame')
+            # Normalised email → user id, the lowest id winning when accounts share an email
+            self._connection.execute('''
+                CREATE OR REPLACE TABLE user_identities AS
+                SELECT lower(trim(CAST(email AS VARCHAR))) AS email, min(id) AS user_id
+                FROM users
+                WHERE email IS NOT NULL AND trim(CAST(email AS VARCHAR)) <> ''
+                GROUP BY 1
+            ''')
+
+    def _refresh_views(self):
+        """Point each log table at its Parquet files, or at an empty table until it has data"""
+        for table, schema in SNAPSHOT_SCHEMAS.items():
+            has_partitions = bool(self.snapshot_store.partitions(table))
+            if self._views.get(table) == has_partitions:
+                continue
+            if table in self._views:
+                self._connection.execute(f"DROP {'VIEW' if self._views[table] else 'TABLE'} {table}")
+            if has_partitions:
+                pattern = f"{self.snapshot_store.root}/{table}/day=*/*.parquet".replace("'", "''")
+                self._connection.execute(
+                    f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, hive_types = {{'day': DATE}})"
+                )
+            else:
+                self._connection.register('empty_frame', schema.empty_table().append_column('day', pa.array([], pa.date32())))
+                self._connection.execute(f"CREATE TABLE {table} AS SELECT * FROM empty_frame")
+                self._connection.unregister('empty_frame')
+            self._views[table] = has_partitions
+
+    def _cursor(self):
+        """Thread-local cursor on the shared in-memory database"""
+        with self._lock:
+            self._refresh_views()
+            return self._connection.cursor()
+
+    def _unified_query(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None, before=None):
+        """Build the unified log query with every filter, and the optional page cursor, pushed into each source branch"""
+        parts = []
+        params = []
+        for source, select in SOURCE_SELECTS.items():
+            if log_type and log_type != source:
+                continue
+            alias = SOURCE_TABLES[source][1]
+            company_column = 'pl.company_id' if source == 'Portal' else 'u.company_id'
+            partner_column = 'pl.partner_id' if source == 'Portal' else 'u.partner_id'
+            conditions = ['1=1']
+            if start_date:
+                conditions.append(f"{alias}.day >= CAST(? AS DATE)")
+                params.append(str(start_date))
+            if end_date:
+                conditions.append(f"{alias}.day <= CAST(? AS DATE)")
+                params.append(str(end_date))
+            if user_id:
+                # Portal rows get their user id from the email identity map
+                conditions.append("ui.user_id = ?" if source == 'Portal' else f"{alias}.user_id = ?")
+                params.append(int(user_id))
+            if company_id:
+                conditions.append(f"{company_column} = ?")
+                params.append(int(company_id))
+            if partner_id:
+                # A partner covers its own rows and those of every company under it
+                conditions.append(f"({partner_column} = ? OR {company_column} IN (SELECT id FROM companies WHERE partner_id = ?))")
+                params.extend([int(partner_id), int(partner_id)])
+            if before is not None:
+                # Same (timestamp, log_source, id) descending keyset order as DatabaseConnection
+                cursor_timestamp, cursor_source, cursor_id = before
+                table = SOURCE_TABLES[source][0]
+                if table < cursor_source:
+                    conditions.append(f"{alias}.timestamp <= CAST(? AS TIMESTAMP)")
+                    params.append(str(cursor_timestamp))
+                elif table > cursor_source:
+                    conditions.append(f"{alias}.timestamp < CAST(? AS TIMESTAMP)")
+                    params.append(str(cursor_timestamp))
+                else:
+                    conditions.append(f"({alias}.timestamp, {alias}.id) < (CAST(? AS TIMESTAMP), ?)")
+                    params.extend([str(cursor_timestamp), int(cursor_id)])
+            parts.append(select.format(where=' AND '.join(conditions)))
+        return ' UNION ALL '.join(parts), params
+
+    def unified_logs(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None,
+                     page_size=LOG_PAGE_SIZE, before=None):
+        """One page of log rows matching the filters, in the layout of DatabaseConnection.get_unified_logs()"""
+        union, params = self._unified_query(start_date, end_date, user_id, company_id, partner_id, log_type, before)
+        if not union:
+            return pd.DataFrame()
+        query = f'''
+            SELECT
+                logs.timestamp,
+                logs.user_name,
+                logs.user_email,
+                logs.action,
+                logs.status,
+                logs.log_source,
+                c.company_name,
+                p.partner_name,
+                logs.session_id,
+                logs.waypoint_id,
+                CAST(NULL AS VARCHAR) AS waypoint_name,
+                logs.status_changed_from_id,
+                logs.status_changed_to_id,
+                logs.user_id,
+                logs.company_id,
+                logs.partner_id,
+                logs.branch_id,
+                logs.dma_id,
+                logs.log_id
+            FROM ({union}) logs
+            LEFT JOIN companies c ON logs.company_id = c.id
+            LEFT JOIN partners p ON logs.partner_id = p.id
+            ORDER BY logs.timestamp DESC, logs.log_source DESC, logs.log_id DESC
+            LIMIT ?
+        '''
+        return type_log_id_columns(self._cursor().execute(query, params + [int(page_size)]).df())
+
+    def log_details(self, log_keys):
+        """notes and object_data for the given (log_source, log_id) rows, like DatabaseConnection.get_log_details()"""
+        if log_keys.empty:
+            return pd.DataFrame(columns=['log_source', 'log_id', 'notes', 'object_data'])
+        cursor = self._cursor()
+        cursor.register('detail_keys', log_keys[['log_source', 'log_id']])
+        return cursor.execute('''
+            SELECT k.log_source, k.log_id, pl.notes, pl.object_data
+            FROM detail_keys k JOIN portal_logs pl ON k.log_source = 'portal_logs' AND pl.id = k.log_id
+            UNION ALL
+            SELECT k.log_source, k.log_id, al.notes, CAST(NULL AS VARCHAR)
+            FROM detail_keys k JOIN app_log al ON k.log_source = 'app_log' AND al.id = k.log_id
+            UNION ALL
+            SELECT k.log_source, k.log_id, wl.notes, CAST(NULL AS VARCHAR)
+            FROM detail_keys k JOIN waypoint_logs wl ON k.log_source = 'waypoint_logs' AND wl.id = k.log_id
+        ''').df()
+
+    def summary(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None):
+        """Exact summary metrics over every matching snapshot row (same shape as summarise_logs)"""
+        union, params = self._unified_query(start_date, end_date, user_id, company_id, partner_id, log_type)
+        if not union:
+            return summarise_logs(pd.DataFrame())
+        cursor = self._cursor()
+        # Users are identified by id, or by email for portal rows that carry no user id
+        totals = cursor.execute(f'''
+            SELECT
+                COUNT(*) AS total_logs,
+                COUNT(DISTINCT COALESCE('u' || CAST(user_id AS VARCHAR), 'e' || lower(user_email))) AS unique_users
+            FROM ({union}) logs
+        ''', params).fetchone()
+        source_counts = cursor.execute(f'''
+            SELECT log_source, COUNT(*) AS log_count
+            FROM ({union}) logs
+            GROUP BY log_source
+        ''', params).df()
+        daily_counts = cursor.execute(f'''
+            SELECT CAST(timestamp AS DATE) AS date, COUNT(*) AS activity_count
+            FROM ({union}) logs
+            GROUP BY 1
+            ORDER BY 1
+        ''', params).df()
+        return {
+            'total_logs': int(totals[0]),
+            'unique_users': int(totals[1]),
+            'source_counts': dict(zip(source_counts['log_source'], source_counts['log_count'].astype(int))),
+            'daily_counts': daily_counts
+        }
+
+    def status_transitions(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None):
+        """Waypoint status changes per day and status pair, like DatabaseConnection.get_waypoint_status_transitions()"""
+        union, params = self._unified_query(start_date, end_date, user_id, company_id, partner_id, log_type='Waypoint')
+        return self._cursor().execute(f'''
+            SELECT
+                CAST(timestamp AS DATE) AS date,
+                status_changed_from_id,
+                status_changed_to_id,
+                COUNT(*) AS transition_count
+            FROM ({union}) logs
+            WHERE status_changed_from_id IS NOT NULL AND status_changed_to_id IS NOT NULL
+            GROUP BY 1, 2, 3
+            ORDER BY 1, 2, 3
+        ''', params).df()
+
+    def activity_buckets(self, bucket='day', entity=None, start_date=None, end_date=None, user_id=None, company_id=None,
+                         partner_id=None, log_type=None):
+        """Activity counts per time bucket and source (and company or partner), like LogSummaryService.activity_buckets()"""
+        union, params = self._unified_query(start_date, end_date, user_id, company_id, partner_id, log_type)
+        if not union:
+            return pd.DataFrame(columns=['bucket_start', 'log_source', 'activity_count'])
+        entity_select = f"{entity}_id AS entity_id," if entity else ""
+        keys = 3 if entity else 2
+        return self._cursor().execute(f'''
+            SELECT
+                date_trunc('{bucket}', timestamp) AS bucket_start,
+                log_source,
+                {entity_select}
+                COUNT(*) AS activity_count
+            FROM ({union}) logs
+            GROUP BY {', '.join(str(position) for position in range(1, keys + 1))}
+            ORDER BY {', '.join(str(position) for position in range(1, keys + 1))}
+        ''', params).df()
+
+    def hour_weekday_counts(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None):
+        """Activity counts per weekday (0 = Monday) and hour of day over every matching snapshot row"""
+        union, params = self._unified_query(start_date, end_date, user_id, company_id, partner_id, log_type)
+        if not union:
+            return pd.DataFrame(columns=['weekday', 'hour', 'activity_count'])
+        return self._cursor().execute(f'''
+            SELECT isodow(timestamp) - 1 AS weekday, hour(timestamp) AS hour, COUNT(*) AS activity_count
+            FROM ({union}) logs
+            GROUP BY 1, 2
+        ''', params).df()
+
@@ -0,0 +1,83 @@
+"""
+Keyset cursors and watermarks for the paged log listings
+
+A log source's sort key is its timestamp column(s) followed by its id. portal_logs keeps
+the timestamp in separate `date` and `time` columns, so its key is (pl.date, pl.time,
+pl.id); predicates are written column by column so an index on those columns serves
+both the range and the sort.
+"""
+
+import pandas as pd
+
+# Log listings are paged newest first with a (timestamp, log_source, id) keyset cursor
+LOG_PAGE_SIZE = 1000
+
+
+def _key_values(timestamp_columns, timestamp):
+    """A cursor timestamp split to match the source's timestamp column(s)"""
+    if isinstance(timestamp_columns, str):
+        return [timestamp_columns], [str(timestamp)]
+    timestamp = pd.Timestamp(timestamp)
+    return list(timestamp_columns), [timestamp.strftime('%Y-%m-%d'), timestamp.strftime('%H:%M:%S')]
+
+
+def row_comparison(columns, values, op, inclusive=False):
+    """Lexicographic comparison of a column tuple against values, expanded column by column
+
+    `op` is '<' or '>'; with `inclusive` the last column compares with '<=' / '>='. The
+    leading column is also bounded on its own so the optimizer sees a plain range.
+    Returns the SQL fragment and its parameters.
+    """
+    last = len(columns) - 1
+    sql, params = None, []
+    for position in range(last, -1, -1):
+        column, value = columns[position], values[position]
+        compare = f"{op}=" if inclusive and position == last else op
+        if sql is None:
+            sql, params = f"{column} {compare} %s", [value]
+        else:
+            sql, params = f"{column} {op} %s OR ({column} = %s AND ({sql}))", [value, value] + params
+    if last == 0:
+        return f"({sql})", params
+    return f"({columns[0]} {op}= %s AND ({sql}))", [values[0]] + params
+
+
+def keyset_filter(timestamp_columns, id_expr, source, cursor):
+    """Predicate selecting one log source's rows that sort after a (timestamp, log_source, id) cursor
+
+    Pages are ordered by timestamp, log_source and id, all descending, so each page is a
+    range scan starting just below the last row of the previous one instead of an OFFSET.
+    `timestamp_columns` is one datetime column or a (date, time) column pair.
+    Returns the SQL fragment and its parameters.
+    """
+    if cursor is None:
+        return "", []
+    cursor_timestamp, cursor_source, cursor_id = cursor
+    columns, values = _key_values(timestamp_columns, cursor_timestamp)
+    if source == cursor_source:
+        sql, params = row_comparison(columns + [id_expr], values + [int(cursor_id)], '<')
+    else:
+        # Sources sort after the cursor's within a timestamp, so a later source may repeat it
+        sql, params = row_comparison(columns, values, '<', inclusive=source < cursor_source)
+    return f"AND {sql}", params
+
+
+def watermark_filter(timestamp_columns, id_expr, watermark):
+    """Predicate selecting one log source's rows newer than a (timestamp, id) watermark
+
+    Used by the live tail: with the rows still ordered newest first, each poll is a single
+    range seek on the timestamp index above the last row already seen.
+    """
+    if watermark is None:
+        return "", []
+    columns, values = _key_values(timestamp_columns, watermark[0])
+    sql, params = row_comparison(columns + [id_expr], values + [int(watermark[1])], '>')
+    return f"AND {sql}", params
+
+
+def next_log_cursor(logs_df, page_size=LOG_PAGE_SIZE):
+    """Cursor for the page following `logs_df`, or None when it was the last page"""
+    if len(logs_df) < page_size:
+        return None
+    last_row = logs_df.iloc[-1]
+    return (str(last_row['timestamp']), last_row['log_source'], int(last_row['log_id']))
@@ -0,0 +1,197 @@
+"""
+Exact log summary metrics from concurrent aggregate queries
+
+The log listing only holds one page of rows, so the summary block (totals, distinct
+users, per-source split and daily timeline) is computed from per-source GROUP BY
+aggregates instead. Each source's queries run on their own connection in a thread
+pool while the page itself is being fetched, and results are cached per filter
+signature.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from query_cache import QueryCache, log_query_key
+
+# Log type choices in the dashboard and the sources they cover
+LOG_TYPE_SOURCES = {
+    'Portal': ['portal_logs'],
+    'App': ['app_log'],
+    'Waypoint': ['waypoint_logs']
+}
+ALL_LOG_SOURCES = ['portal_logs', 'app_log', 'waypoint_logs']
+
+# Time buckets from finest to coarsest, with their approximate length in hours
+TIME_BUCKET_HOURS = {'hour': 1, 'day': 24, 'week': 24 * 7, 'month': 24 * 30}
+
+# Weekday labels for weekday numbers 0 (Monday) to 6
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def choose_time_bucket(start_date, end_date, max_points=400):
+    """Finest time bucket that keeps a date range to at most `max_points` buckets"""
+    if not start_date or not end_date:
+        return 'month'
+    span_hours = ((pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1) * 24
+    for bucket, hours in TIME_BUCKET_HOURS.items():
+        if span_hours / hours <= max_points:
+            return bucket
+    return 'month'
+
+
+def combine_source_aggregates(daily_counts, user_keys):
+    """Merge per-source aggregates into one summary
+
+    Parameters
+    ----------
+    daily_counts : dict
+        log_source → frame of date and activity_count.
+    user_keys : dict
+        log_source → frame with a user_key column of distinct users.
+
+    Returns
+    -------
+    dict
+        total_logs, unique_users, source_counts and daily_counts, the same shape as
+        log_analytics.summarise_logs().
+    """
+    source_counts = {}
+    frames = []
+    for source, df in daily_counts.items():
+        if df.empty:
+            continue
+        source_counts[source] = int(df['activity_count'].sum())
+        frames.append(df[['date', 'activity_count']])
+    if frames:
+        combined = pd.concat(frames, ignore_index=True)
+        combined['date'] = pd.to_datetime(combined['date']).dt.date
+        combined = combined.groupby('date', as_index=False)['activity_count'].sum().sort_values('date')
+    else:
+        combined = pd.DataFrame(columns=['date', 'activity_count'])
+    # A user active in several sources is counted once
+    users = set()
+    for df in user_keys.values():
+        if not df.empty:
+            users.update(df['user_key'].dropna())
+    return {
+        'total_logs': sum(source_counts.values()),
+        'unique_users': len(users),
+        'source_counts': source_counts,
+        'daily_counts': combined.reset_index(drop=True)
+    }
+
+
+def combine_bucket_counts(bucket_counts):
+    """Stack per-source bucket counts into one frame with a log_source column
+
+    Parameters
+    ----------
+    bucket_counts : dict
+        log_source → frame of bucket_start, optional entity_id and activity_count.
+
+    Returns
+    -------
+    DataFrame
+        bucket_start, log_source, [entity_id,] activity_count ordered by bucket_start.
+    """
+    frames = [df.assign(log_source=source) for source, df in bucket_counts.items() if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=['bucket_start', 'log_source', 'activity_count'])
+    combined = pd.concat(frames, ignore_index=True)
+    combined['bucket_start'] = pd.to_datetime(combined['bucket_start'])
+    combined['activity_count'] = combined['activity_count'].astype('int64')
+    keys = ['bucket_start', 'log_source'] + (['entity_id'] if 'entity_id' in combined.columns else [])
+    return combined[keys + ['activity_count']].sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def hour_weekday_matrix(counts):
+    """7 × 24 weekday-by-hour matrix of activity counts, summed over sources
+
+    `counts` is a frame (or list of frames) of weekday (0 = Monday), hour and activity_count.
+    """
+    if isinstance(counts, pd.DataFrame):
+        counts = [counts]
+    frames = [df for df in counts if not df.empty]
+    matrix = pd.DataFrame(0, index=range(7), columns=range(24), dtype='int64')
+    if frames:
+        combined = pd.concat(frames, ignore_index=True).astype({'weekday': 'int64', 'hour': 'int64', 'activity_count': 'int64'})
+        totals = combined.groupby(['weekday', 'hour'])['activity_count'].sum().unstack(fill_value=0)
+        matrix = matrix.add(totals, fill_value=0).astype('int64')
+    matrix.index = WEEKDAY_NAMES
+    matrix.index.name = 'Weekday'
+    matrix.columns.name = 'Hour'
+    return matrix
+
+
+class LogSummaryService:
+    """Concurrent, cached log summary aggregates for a DatabaseConnection
+
+    The aggregate queries raise on failure rather than returning empty frames, so an
+    outage is never cached as an all-zero summary: a failed future is replaced on the
+    next submit() and a failed load is not stored.
+    """
+
+    def __init__(self, db, max_workers=6, ttl_seconds=300, max_entries=128):
+        self.db = db
+        # Summaries are assembled on one pool and their per-source queries run on another,
+        # so a busy summary pool can never starve the queries it is waiting on
+        self._summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='log-summary')
+        self._query_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='log-aggregate')
+        self.cache = QueryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def submit(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None, scope=None):
+        """Start (or reuse) the summary for a filter set; returns a Future of the summary dict"""
+        signature = log_query_key(log_type, start_date, end_date, user_id, company_id, partner_id, scope=scope)
+        future = self.cache.get(signature)
+        if future is None or (future.done() and future.exception() is not None):
+            future = self._summary_executor.submit(
+                self._compute, self._db_for(scope), log_type,
+                dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id, partner_id=partner_id)
+            )
+            self.cache.put(signature, future)
+        return future
+
+    def summary(self, **filters):
+        """Summary dict for a filter set, waiting for it if necessary"""
+        return self.submit(**filters).result()
+
+    def _db_for(self, scope):
+        """The service's connection handler, restricted to `scope` when one is given"""
+        return self.db.scoped(scope) if scope is not None and scope.is_restricted else self.db
+
+    def _compute(self, db, log_type, filters):
+        sources = LOG_TYPE_SOURCES.get(log_type, ALL_LOG_SOURCES)
+        daily_futures = {source: self._query_executor.submit(db.get_log_daily_counts, source, **filters) for source in sources}
+        user_futures = {source: self._query_executor.submit(db.get_log_user_keys, source, **filters) for source in sources}
+        return combine_source_aggregates(
+            {source: future.result() for source, future in daily_futures.items()},
+            {source: future.result() for source, future in user_futures.items()}
+        )
+
+    def activity_buckets(self, bucket='day', entity=None, start_date=None, end_date=None, user_id=None, company_id=None,
+                         partner_id=None, log_type=None, scope=None):
+        """Activity counts per time bucket and source (and entity), see combine_bucket_counts()"""
+        filters = dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id, partner_id=partner_id)
+        signature = ('activity_buckets', bucket, entity, log_query_key(log_type, **filters, scope=scope))
+        sources = LOG_TYPE_SOURCES.get(log_type, ALL_LOG_SOURCES)
+        db = self._db_for(scope)
+
+        def load():
+            futures = {source: self._query_executor.submit(db.get_log_activity_buckets, source, bucket, entity, **filters)
+                       for source in sources}
+            return combine_bucket_counts({source: future.result() for source, future in futures.items()})
+
+        return self.cache.get_or_load(signature, load)
+
+    def hour_weekday(self, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None, log_type=None, scope=None):
+        """Weekday × hour activity matrix for a filter set, see hour_weekday_matrix()"""
+        filters = dict(start_date=start_date, end_date=end_date, user_id=user_id, company_id=company_id, partner_id=partner_id)
+        signature = ('hour_weekday', log_query_key(log_type, **filters, scope=scope))
+        sources = LOG_TYPE_SOURCES.get(log_type, ALL_LOG_SOURCES)
+        db = self._db_for(scope)
+
+        def load():
+            futures = [self._query_executor.submit(db.get_log_hour_weekday_counts, source, **filters) for source in sources]
+            return hour_weekday_matrix([future.result() for future in futures])
+
+        return self.cache.get_or_load(signature, load)
@@ -0,0 +1,116 @@
+"""
+Bounded TTL cache for log query results
+
+Entries are keyed on a normalised filter signature, expire after a fixed time-to-live
+and are evicted least-recently-used once the cache is full. Hit, miss, expiry and
+eviction counts are kept so the dashboard can show how well the cache is doing.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def _normalise(value):
+    """Canonical, hashable form of one filter value"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (tuple, list)):
+        return tuple(_normalise(item) for item in value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if hasattr(value, 'item'):  # numpy scalars
+        return _normalise(value.item())
+    return value
+
+
+def log_query_key(log_source, start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None,
+                  page_size=None, before=None, scope=None):
+    """Normalised signature of a log page request
+
+    Dates become ISO strings and numeric ids plain ints, so equal filters always map
+    to the same key whatever types the widgets produced. `scope` (an AccessScope) keeps
+    the entries of differently scoped sessions apart.
+    """
+    if before is not None:
+        before = (str(pd.Timestamp(before[0])), before[1], int(before[2]))
+    return (
+        log_source,
+        _normalise(start_date),
+        _normalise(end_date),
+        _normalise(user_id),
+        _normalise(company_id),
+        _normalise(partner_id),
+        _normalise(page_size),
+        before,
+        getattr(scope, 'key', scope)
+    )
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a per-entry time-to-live and hit/miss statistics"""
+
+    def __init__(self, max_entries=128, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def get(self, key, default=None):
+        """Cached value for `key`, or `default` when it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def get_or_load(self, key, loader):
+        """Cached value for `key`, calling `loader()` and caching its result on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Hit/miss/expiry/eviction counts, current size and hit rate"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,36 @@
+"""
+Throttled reloading for the in-memory indexes shared across sessions
+"""
+
+import threading
+import time
+
+
+class ThrottledRefresh:
+    """Mixin giving an index a thread-safe `refresh(db)` that reloads at most every few minutes.
+
+    Subclasses call `_init_refresh()` from `__init__`, implement `_reload(db, **kwargs)`
+    and set REFRESH_SECONDS to their default maximum age.
+    """
+
+    REFRESH_SECONDS = 60
+
+    def _init_refresh(self):
+        self.refreshed_at = None
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, db, max_age_seconds=None, **kwargs):
+        """Reload from the database unless the last reload is younger than `max_age_seconds`
+
+        Defaults to the class's REFRESH_SECONDS; keyword arguments are passed to `_reload()`.
+        """
+        if max_age_seconds is None:
+            max_age_seconds = self.REFRESH_SECONDS
+        with self._refresh_lock:
+            if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < max_age_seconds:
+                return
+            self._reload(db, **kwargs)
+            self.refreshed_at = time.monotonic()
+
+    def _reload(self, db, **kwargs):
+        raise NotImplementedError
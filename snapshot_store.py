@@ -0,0 +1,251 @@
+"""
+Local day-partitioned Parquet snapshots of the portal, app and waypoint log tables
+
+Each table is streamed incrementally (by id watermark) into
+``<root>/<table>/day=YYYY-MM-DD/part-<first_id>-<last_id>.parquet`` with
+dictionary-encoded string columns. After each sync the days it touched are compacted
+back to one file each. Rows without a timestamp are kept apart under
+``<root>/<table>/_undated/``. Readers prune partitions by date range and only decode
+the requested columns, so months of history can be analysed without querying the
+production MySQL database.
+
+Run ``python snapshot_store.py`` to bring every snapshot up to date.
+"""
+
+import json
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Dictionary-encoded string type used for every text column
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# Fixed schemas keep every partition file compatible regardless of which values are null
+SNAPSHOT_SCHEMAS = {
+    'portal_logs': pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('s')),
+        ('user_name', DICT_STRING),
+        ('user_email', DICT_STRING),
+        ('action', DICT_STRING),
+        ('status', DICT_STRING),
+        ('notes', pa.string()),
+        ('company_id', pa.int64()),
+        ('partner_id', pa.int64()),
+        ('branch_id', pa.int64()),
+        ('object_data', pa.string())
+    ]),
+    'app_log': pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('s')),
+        ('user_id', pa.int64()),
+        ('action', DICT_STRING),
+        ('status', DICT_STRING),
+        ('notes', pa.string()),
+        ('session_id', DICT_STRING),
+        ('waypoint_id', pa.int64()),
+        ('dma_id', pa.int64())
+    ]),
+    'waypoint_logs': pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('s')),
+        ('user_id', pa.int64()),
+        ('waypoint_id', pa.int64()),
+        ('status_changed_from_id', pa.int64()),
+        ('status_changed_to_id', pa.int64()),
+        ('notes', pa.string())
+    ])
+}
+
+DAY_PARTITIONING = ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive')
+
+# Rows whose timestamp is missing belong to no day; the leading underscore keeps readers out
+UNDATED_DIR = '_undated'
+
+
+class LogSnapshotStore:
+    """Incrementally maintained Parquet snapshots of the log tables"""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _table_dir(self, table):
+        return os.path.join(self.root, table)
+
+    def _watermark_path(self, table):
+        return os.path.join(self._table_dir(table), '_watermark.json')
+
+    def get_watermark(self, table):
+        """Highest exported id for a table (0 when nothing has been exported)"""
+        try:
+            with open(self._watermark_path(table)) as f:
+                return json.load(f)['last_id']
+        except FileNotFoundError:
+            return 0
+
+    def _set_watermark(self, table, last_id):
+        path = self._watermark_path(table)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'last_id': int(last_id), 'updated_at': pd.Timestamp.now().isoformat()}, f)
+        os.replace(path + '.tmp', path)
+
+    def _write_part(self, table, partition_dir, df):
+        """Write rows as one part file named after their id range, in a partition directory"""
+        os.makedirs(partition_dir, exist_ok=True)
+        part_path = os.path.join(partition_dir, f"part-{df['id'].min()}-{df['id'].max()}.parquet")
+        arrow_table = pa.Table.from_pandas(df, schema=SNAPSHOT_SCHEMAS[table], preserve_index=False)
+        pq.write_table(arrow_table, part_path, use_dictionary=True, compression='zstd')
+        return part_path
+
+    def append(self, table, df):
+        """Write a batch of exported rows into day partitions and advance the watermark
+
+        Part files are named after the id range they hold, so re-exporting a batch after an
+        interrupted run overwrites the same files instead of duplicating rows. Rows without a
+        timestamp go to the undated directory rather than being dropped.
+
+        Returns the days written to.
+        """
+        if df.empty:
+            return []
+        schema = SNAPSHOT_SCHEMAS[table]
+        df = df.assign(timestamp=pd.to_datetime(df['timestamp']).dt.floor('s'))[schema.names]
+        undated = df['timestamp'].isna()
+        if undated.any():
+            self._write_part(table, os.path.join(self._table_dir(table), UNDATED_DIR), df[undated])
+        days = []
+        for day, day_df in df[~undated].groupby(df.loc[~undated, 'timestamp'].dt.date):
+            self._write_part(table, os.path.join(self._table_dir(table), f"day={day.isoformat()}"), day_df)
+            days.append(day.isoformat())
+        self._set_watermark(table, df['id'].max())
+        return days
+
+    def compact(self, table, day):
+        """Merge a day partition's part files into one, keeping each id once
+
+        The merged file is written before the old parts are removed, so a crash leaves at
+        worst a duplicate that the next compaction of the day removes.
+        """
+        partition_dir = os.path.join(self._table_dir(table), f"day={day}")
+        parts = sorted(name for name in os.listdir(partition_dir) if name.endswith('.parquet'))
+        if len(parts) < 2:
+            return
+        schema = SNAPSHOT_SCHEMAS[table]
+        merged = pa.concat_tables([pq.read_table(os.path.join(partition_dir, name), schema=schema) for name in parts])
+        merged_df = merged.to_pandas().drop_duplicates('id', keep='last').sort_values('id', kind='stable')
+        merged_path = self._write_part(table, partition_dir, merged_df)
+        for name in parts:
+            path = os.path.join(partition_dir, name)
+            if path != merged_path:
+                os.remove(path)
+
+    def sync(self, db, table, chunksize=50000):
+        """Stream every row above the table's watermark into the snapshot
+
+        Chunks are written as they arrive, so memory stays bounded by `chunksize` rows and an
+        interrupted export resumes from the last written chunk. An error during the export
+        is raised after the chunks written so far are kept. Either way the days written to
+        are then compacted to one file each.
+
+        Returns the number of rows exported.
+        """
+        exported = 0
+        touched = set()
+        with self._lock:
+            try:
+                for chunk in db.iter_log_export(table, after_id=self.get_watermark(table), chunksize=chunksize):
+                    touched.update(self.append(table, chunk))
+                    exported += len(chunk)
+            finally:
+                for day in sorted(touched):
+                    self.compact(table, day)
+        return exported
+
+    def undated_rows(self, table):
+        """Rows exported without a timestamp, kept outside the day partitions"""
+        undated_dir = os.path.join(self._table_dir(table), UNDATED_DIR)
+        if not os.path.isdir(undated_dir):
+            return pd.DataFrame({name: pd.Series(dtype=object) for name in SNAPSHOT_SCHEMAS[table].names})
+        return ds.dataset(undated_dir, schema=SNAPSHOT_SCHEMAS[table], format='parquet').to_table().to_pandas()
+
+    def partitions(self, table, start_date=None, end_date=None):
+        """Days with snapshot data for a table, optionally limited to a date range"""
+        table_dir = self._table_dir(table)
+        if not os.path.isdir(table_dir):
+            return []
+        days = sorted(name.split('=', 1)[1] for name in os.listdir(table_dir) if name.startswith('day='))
+        if start_date:
+            days = [day for day in days if day >= str(start_date)]
+        if end_date:
+            days = [day for day in days if day <= str(end_date)]
+        return days
+
+    def read(self, table, start_date=None, end_date=None, columns=None, predicate=None):
+        """Read snapshot rows for a date range
+
+        Parameters
+        ----------
+        table : str
+            One of 'portal_logs', 'app_log' or 'waypoint_logs'.
+        start_date, end_date : date or str, optional
+            Inclusive day bounds; partitions outside the range are never opened.
+        columns : list of str, optional
+            Columns to decode (projection pushdown). Defaults to every column.
+        predicate : pyarrow.dataset.Expression, optional
+            Extra row predicate evaluated while scanning.
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        schema = SNAPSHOT_SCHEMAS[table]
+        columns = columns or schema.names
+        if not self.partitions(table, start_date, end_date):
+            return pd.DataFrame({name: pd.Series(dtype=object) for name in columns})
+        dataset = self.dataset(table)
+        expression = predicate
+        if start_date:
+            expression = _and(expression, ds.field('day') >= str(start_date))
+        if end_date:
+            expression = _and(expression, ds.field('day') <= str(end_date))
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def dataset(self, table):
+        """pyarrow dataset over every partition of a table"""
+        return ds.dataset(
+            self._table_dir(table),
+            schema=SNAPSHOT_SCHEMAS[table].append(pa.field('day', pa.string())),
+            format='parquet',
+            partitioning=DAY_PARTITIONING
+        )
+
+
+def _and(left, right):
+    """Combine two optional dataset expressions with AND"""
+    return right if left is None else left & right
+
+
+if __name__ == "__main__":
+    import streamlit as st
+    from database import DatabaseConnection
+
+    store = LogSnapshotStore(os.path.join(st.secrets.get("storage", {}).get("data_dir", "data"), "snapshots"))
+    db = DatabaseConnection()
+    failed = False
+    for table in SNAPSHOT_SCHEMAS:
+        try:
+            count = store.sync(db, table)
+        except Exception as e:
+            failed = True
+            print(f"❌ {table}: export stopped at watermark {store.get_watermark(table)}: {e}")
+            continue
+        print(f"✅ {table}: exported {count:,} new rows (watermark {store.get_watermark(table)})")
+        undated = len(store.undated_rows(table))
+        if undated:
+            print(f"⚠️ {table}: {undated:,} rows without a timestamp kept in {UNDATED_DIR}/")
+    if failed:
+        raise SystemExit(1)
@@ -84,9 +84,9 @@ def test_app_log_active_users():
         if not result4.empty:
             print(result4)
         
-        # Test 5: Test the actual get_active_users_per_company method
-        print("\n🔍 Test 5: Testing get_active_users_per_company method...")
-        active_users_df = db.get_active_users_per_company()
+        # Test 5: Test the actual get_active_users_per_entity method
+        print("\n🔍 Test 5: Testing get_active_users_per_entity method...")
+        active_users_df = db.get_active_users_per_entity()
         print(f"Active users per company/partner: {len(active_users_df)} entities found")
         if not active_users_df.empty:
             print(active_users_df)
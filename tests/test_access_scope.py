@@ -0,0 +1,71 @@
+import sqlite3
+import pytest
+
+from access_scope import AccessScope, UNRESTRICTED, partner_condition
+from query_cache import log_query_key
+
+
+def test_scope_from_user_role():
+    company = AccessScope.from_user({'role': 'Company User', 'company_id': 7, 'partner_id': 3})
+    partner = AccessScope.from_user({'role': 'Partner Admin', 'company_id': None, 'partner_id': 3})
+    admin = AccessScope.from_user({'role': 'Admin', 'company_id': 7})
+
+    assert company.key == ('company', 7) and company.partner_id is None
+    assert partner.key == ('partner', 3) and partner.role == 'Partner Admin'
+    assert admin == UNRESTRICTED and not admin.is_restricted
+    assert AccessScope.from_user(None) == UNRESTRICTED
+    # A tenant role without its tenant id fails closed: restricted, and matching no rows
+    for user in ({'role': 'Company User'}, {'role': 'Partner Admin', 'partner_id': None}):
+        denied = AccessScope.from_user(user)
+        assert denied != UNRESTRICTED and denied.is_restricted and denied.denied
+        assert denied.condition('u.company_id', 'u.partner_id') == "1=0"
+        assert denied.condition() == "1=0"
+        with pytest.raises(PermissionError):
+            denied.apply_to_filters(9, 3)
+
+
+def test_scope_narrows_filters_and_cache_keys():
+    company = AccessScope(company_id=7)
+    partner = AccessScope(partner_id=3)
+
+    assert company.apply_to_filters(None, None) == (7, None)
+    assert company.apply_to_filters(9, 3) == (7, 3)
+    assert partner.apply_to_filters(9, None) == (9, 3)
+    assert UNRESTRICTED.apply_to_filters(9, 3) == (9, 3)
+
+    filters = dict(start_date=None, end_date=None, user_id=None, company_id=None, partner_id=None)
+    keys = {log_query_key('app_log', **filters, scope=scope) for scope in (company, partner, UNRESTRICTED, None)}
+    assert len(keys) == 3
+
+
+def test_partner_condition_matches_partner_and_its_companies():
+    assert partner_condition('u.partner_id', 'u.company_id', 3) == "u.partner_id = 3"
+    assert partner_condition('u.partner_id', 'u.company_id', 3, {12, 5}) == \
+        "(u.partner_id = 3 OR u.company_id IN (5, 12))"
+
+    connection = sqlite3.connect(':memory:')
+    connection.execute("CREATE TABLE u (id INTEGER, company_id INTEGER, partner_id INTEGER)")
+    connection.executemany("INSERT INTO u VALUES (?, ?, ?)",
+                           [(1, None, 3), (2, 5, None), (3, 12, 4), (4, 7, None), (5, None, 4)])
+    condition = partner_condition('partner_id', 'company_id', 3, [5, 12])
+    rows = connection.execute(f"SELECT id FROM u WHERE {condition} ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == [1, 2, 3]
+
+
+def test_scope_condition_per_scope_and_columns():
+    company = AccessScope(company_id=7)
+    partner = AccessScope(partner_id=3)
+
+    assert company.condition('u.company_id', 'u.partner_id') == "u.company_id = 7"
+    # Rows without a company column are never visible to a company user
+    assert company.condition(partner_column='u.partner_id') == "1=0"
+
+    assert partner.condition('u.company_id', 'u.partner_id', [12, 5]) == \
+        "(u.partner_id = 3 OR u.company_id IN (5, 12))"
+    assert partner.condition('u.company_id', 'u.partner_id') == "u.partner_id = 3"
+    assert partner.condition(partner_column='u.partner_id') == "u.partner_id = 3"
+    assert partner.condition('c.id', partner_company_ids=[12, 5]) == "c.id IN (5, 12)"
+    assert partner.condition('c.id') == "1=0"
+    assert partner.condition() == "1=0"
+
+    assert UNRESTRICTED.condition('u.company_id', 'u.partner_id') is None
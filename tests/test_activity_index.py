@@ -0,0 +1,206 @@
+import pandas as pd
+from activity_index import (
+    UserLastSeenIndex, DailyActiveBitmapIndex, pack_ids,
+    bitmap_or, bitmap_and, bitmap_cardinality, bitmap_ids,
+    AppSessionIndex, user_session_stats, attribute_entity_counts, entity_total
+)
+
+
+class FakeActivityDB:
+    """Minimal stand-in for DatabaseConnection serving fixed users and activity deltas"""
+
+    def __init__(self, users_df, deltas):
+        self.users_df = users_df
+        self.deltas = deltas
+        self.calls = []
+
+    def get_portal_users(self):
+        return self.users_df
+
+    def get_user_last_seen_delta(self, source, after_id=0):
+        self.calls.append((source, after_id))
+        df = self.deltas.get(source, pd.DataFrame())
+        if df.empty:
+            return df
+        return df[df['max_id'] > after_id]
+
+
+def make_users():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 5],
+        'company_id': [10, 10, None, 11],
+        'partner_id': [None, None, 7, None],
+        'active': [1, 1, 1, 0],
+        'user_name': ['A', 'B', 'C', 'E'],
+        'email': ['a@x', 'b@x', 'c@x', 'e@x']
+    })
+
+
+def test_active_users_per_entity():
+    index = UserLastSeenIndex()
+    index.update_users(make_users())
+    index.update_activity(pd.DataFrame({
+        'user_id': [1, 2, 3],
+        'last_seen': pd.to_datetime(['2024-06-10', '2024-05-01', '2024-06-12'])
+    }))
+
+    counts = index.active_users_per_entity(14, now=pd.Timestamp('2024-06-14'))
+    counts = counts.set_index(['entity_type', 'entity_id'])['active_users'].to_dict()
+    assert counts == {('Company', 10): 1, ('Partner', 7): 1}
+
+
+
+def test_attribute_entity_counts_to_licence_rounds():
+    licences = pd.DataFrame({
+        'company_id': [10, 10, None, 11],
+        'partner_id': [7, 7, 7, None],
+        'number_of_licenses': [5, 20, 8, 3]
+    })
+    counts = pd.DataFrame({'entity_type': ['Company', 'Partner'], 'entity_id': [10, 7], 'active_users': [4, 9]})
+
+    # Both rounds of company 10 get its count once each; rows stay one per round
+    assert attribute_entity_counts(licences, counts).tolist() == [4, 4, 9, 0]
+    # The KPI counts company 10 once, not once per round
+    assert entity_total(licences, counts) == 13
+    assert entity_total(licences.iloc[3:], counts) == 0
+    assert entity_total(licences.iloc[:0], counts) == 0
+
+
+def test_update_activity_keeps_latest_timestamp():
+    index = UserLastSeenIndex()
+    index.update_users(make_users())
+    index.update_activity(pd.DataFrame({'user_id': [1], 'last_seen': pd.to_datetime(['2024-06-10'])}))
+    index.update_activity(pd.DataFrame({'user_id': [1, 1], 'last_seen': pd.to_datetime(['2024-01-01', '2024-06-11'])}))
+    assert str(index.last_seen[1]) == '2024-06-11T00:00:00'
+
+
+def test_inactive_users_excludes_disabled_accounts():
+    index = UserLastSeenIndex()
+    index.update_users(make_users())
+    index.update_activity(pd.DataFrame({'user_id': [1], 'last_seen': pd.to_datetime(['2024-06-10'])}))
+
+    report = index.inactive_users(14, now=pd.Timestamp('2024-06-14'))
+    # User 5 is disabled, user 1 is active - only 2 and 3 hold idle seats
+    assert sorted(report['id'].tolist()) == [2, 3]
+
+
+def test_refresh_advances_watermarks():
+    db = FakeActivityDB(make_users(), {
+        'app_log': pd.DataFrame({'user_id': [1], 'last_seen': pd.to_datetime(['2024-06-10']), 'max_id': [40]}),
+        'waypoint_logs': pd.DataFrame({'user_id': [2], 'last_seen': pd.to_datetime(['2024-06-11']), 'max_id': [9]})
+    })
+    index = UserLastSeenIndex()
+    index.refresh(db)
+    # Only app activity counts, as in the activity rollup and the daily bitmaps
+    assert index.watermarks == {'app_log': 40}
+    assert index.active_mask(14, now=pd.Timestamp('2024-06-14'))[[1, 2]].tolist() == [True, False]
+
+    # Second refresh inside max_age is skipped entirely
+    index.refresh(db)
+    assert len(db.calls) == 1
+
+    index.refresh(db, max_age_seconds=0)
+    assert ('app_log', 40) in db.calls
+
+
+def make_bitmap_index():
+    index = DailyActiveBitmapIndex()
+    index.update_entities(make_users())
+    index.update_daily_activity(pd.DataFrame({
+        'day': pd.to_datetime(['2024-06-01', '2024-06-01', '2024-06-02', '2024-06-03']),
+        'user_id': [1, 3, 2, 1]
+    }))
+    return index
+
+
+def test_bitmap_window_counts():
+    index = make_bitmap_index()
+    assert index.active_count('2024-06-01', '2024-06-03') == 3
+    assert index.active_count('2024-06-02', '2024-06-03') == 2
+    assert index.active_count('2024-06-01', '2024-06-03', 'Company', 10) == 2
+    assert index.active_count('2024-06-01', '2024-06-01', 'Partner', 7) == 1
+
+    per_entity = index.active_users_per_entity('2024-06-02', '2024-06-03')
+    assert per_entity.set_index('entity_id')['active_users'].to_dict() == {10: 2}
+
+
+def test_bitmap_rolling_counts():
+    index = make_bitmap_index()
+    trend = index.rolling_active_counts('2024-06-01', '2024-06-03', 2, entity_keys=[('Company', 10)])
+    assert trend['daily_active_users'].tolist() == [1, 1, 1]
+    assert trend['window_active_users'].tolist() == [1, 2, 2]
+
+
+def test_bitmap_persistence_roundtrip(tmp_path):
+    index = make_bitmap_index()
+    path = tmp_path / 'bitmaps.npz'
+    index.save(path)
+
+    loaded = DailyActiveBitmapIndex.load(path)
+    assert loaded.last_day == index.last_day
+    assert loaded.active_count('2024-06-01', '2024-06-03', 'Company', 10) == 2
+    assert DailyActiveBitmapIndex.load(tmp_path / 'missing.npz').days == {}
+
+
+def test_bitmap_ops():
+    left = pack_ids([1, 9, 20])
+    right = pack_ids([9, 20, 21])
+    assert bitmap_ids(bitmap_or([left, right])).tolist() == [1, 9, 20, 21]
+    assert bitmap_cardinality(bitmap_and(left, right)) == 2
+
+
+class FakeSessionDB:
+    """Serves app session pieces above an id watermark"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.calls = []
+
+    def get_app_session_delta(self, after_id=0):
+        self.calls.append(after_id)
+        return self.pieces[self.pieces['max_id'] > after_id]
+
+
+def test_app_session_index_merges_open_sessions():
+    first = pd.DataFrame({
+        'session_id': ['s1', 's2'],
+        'user_id': [1, 2],
+        'started_at': pd.to_datetime(['2024-06-01 09:00', '2024-06-01 10:00']),
+        'ended_at': pd.to_datetime(['2024-06-01 09:10', '2024-06-01 10:05']),
+        'event_count': [3, 2],
+        'first_action': ['login', 'login'],
+        'last_action': ['sync', 'deploy'],
+        'max_id': [5, 6]
+    })
+    index = AppSessionIndex()
+    index.refresh(FakeSessionDB(first))
+    assert index.watermark == 6 and len(index) == 2
+
+    # s1 was still open: its later rows arrive as a second piece
+    later = pd.DataFrame({
+        'session_id': ['s1', 's3'],
+        'user_id': [1, 1],
+        'started_at': pd.to_datetime(['2024-06-01 09:20', '2024-06-02 08:00']),
+        'ended_at': pd.to_datetime(['2024-06-01 09:30', '2024-06-02 08:01']),
+        'event_count': [2, 1],
+        'first_action': ['collect', 'login'],
+        'last_action': ['logout', 'login'],
+        'max_id': [9, 10]
+    })
+    db = FakeSessionDB(pd.concat([first, later], ignore_index=True))
+    index.refresh(db, max_age_seconds=0)
+    assert db.calls == [6]
+
+    s1 = index.sessions.set_index('session_id').loc['s1']
+    assert (s1['event_count'], s1['first_action'], s1['last_action']) == (5, 'login', 'logout')
+    assert s1['ended_at'] == pd.Timestamp('2024-06-01 09:30')
+
+    june_1 = index.sessions_between('2024-06-01', '2024-06-01')
+    assert sorted(june_1['session_id']) == ['s1', 's2']
+    assert june_1.set_index('session_id').loc['s1', 'duration_seconds'] == 1800
+
+    stats = user_session_stats(index.sessions_between(user_ids=[1]))
+    assert stats['user_id'].tolist() == [1]
+    assert stats.loc[0, 'session_count'] == 2
+    assert stats.loc[0, 'avg_events_per_session'] == 3
+    assert user_session_stats(AppSessionIndex().sessions_between()).empty
@@ -0,0 +1,61 @@
+import pandas as pd
+from dimensions import WaypointDimension
+
+
+class FakeDimensionDB:
+    """Serves fixed waypoint tables and a fingerprint that can be changed between refreshes"""
+
+    def __init__(self):
+        self.fingerprint = pd.DataFrame({'table_name': ['waypoints'], 'row_count': [2], 'max_id': [11]})
+        self.loads = 0
+
+    def get_waypoint_dimension_fingerprint(self):
+        return self.fingerprint
+
+    def get_waypoints(self):
+        self.loads += 1
+        return pd.DataFrame({'id': [10, 11], 'name': ['Main St', 'High St']})
+
+    def get_waypoint_statuses(self):
+        return pd.DataFrame({'id': [1, 2], 'name': ['Deployed', 'Collected']})
+
+
+def make_logs():
+    return pd.DataFrame({
+        'log_source': ['waypoint_logs', 'waypoint_logs', 'app_log'],
+        'action': [None, None, 'login'],
+        'waypoint_id': pd.array([10, 12, 11], dtype='Int64'),
+        'status_changed_from_id': pd.array([1, 2, None], dtype='Int64'),
+        'status_changed_to_id': pd.array([2, 3, None], dtype='Int64')
+    })
+
+
+def test_label_logs():
+    dimension = WaypointDimension()
+    db = FakeDimensionDB()
+    dimension.refresh(db)
+    labelled = dimension.label_logs(make_logs())
+
+    assert labelled['waypoint_name'].tolist()[::2] == ['Main St', 'High St']
+    assert pd.isna(labelled['waypoint_name'].iloc[1])
+    # Unknown status 3 falls back to its id, non-waypoint rows keep their action
+    assert labelled['action'].tolist() == ['Status Change: Deployed → Collected', 'Status Change: Collected → 3', 'login']
+
+
+def test_refresh_reloads_only_on_change():
+    dimension = WaypointDimension()
+    db = FakeDimensionDB()
+    dimension.refresh(db)
+    dimension.refresh(db, max_age_seconds=0)
+    assert db.loads == 1
+
+    db.fingerprint = pd.DataFrame({'table_name': ['waypoints'], 'row_count': [3], 'max_id': [12]})
+    dimension.refresh(db)
+    assert db.loads == 1  # still inside max_age
+    dimension.refresh(db, max_age_seconds=0)
+    assert db.loads == 2
+
+
+def test_label_logs_without_dimension_keeps_ids():
+    labelled = WaypointDimension().label_logs(make_logs())
+    assert labelled['action'].iloc[0] == 'Status Change: 1 → 2'
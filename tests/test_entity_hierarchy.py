@@ -0,0 +1,36 @@
+import pandas as pd
+from entity_hierarchy import EntityHierarchy
+
+
+class FakeHierarchyDB:
+    def __init__(self):
+        self.loads = 0
+
+    def get_company_partners(self):
+        self.loads += 1
+        return pd.DataFrame({'id': [10, 11, 12], 'partner_id': [7, 7, 8]})
+
+    def get_portal_users(self):
+        return pd.DataFrame({
+            'id': [1, 2, 3, 4, 5],
+            'company_id': [10, 11, 12, None, 10],
+            'partner_id': [None, None, None, 7, 8],
+            'active': [1, 1, 1, 1, 1]
+        })
+
+
+def test_partner_expands_to_companies_and_users():
+    hierarchy = EntityHierarchy()
+    db = FakeHierarchyDB()
+    hierarchy.refresh(db)
+    hierarchy.refresh(db)
+    assert db.loads == 1
+
+    assert hierarchy.companies_of(7) == {10, 11}
+    assert hierarchy.companies_of(None) == set()
+    # Users 1, 2 and 5 through their companies, 4 directly; user 5 is also linked to partner 8
+    assert hierarchy.users_of(partner_id=7) == {1, 2, 4, 5}
+    assert hierarchy.users_of(partner_id=8) == {3, 5}
+    assert hierarchy.users_of(company_id=10) == {1, 5}
+    assert hierarchy.users_of(company_id=10, partner_id=8) == {5}
+    assert hierarchy.users_of() == set()
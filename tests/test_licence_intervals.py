@@ -0,0 +1,63 @@
+import pandas as pd
+from licence_intervals import LicenceIntervalIndex
+
+
+def make_licences():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'company_id': [10, 10, None, 11],
+        'partner_id': [7, 7, 7, None],
+        'start_date': ['2024-01-01', '2024-06-01', '2024-03-01', '2024-02-01'],
+        'end_date': ['2024-12-31', '2025-05-31', None, '2024-02-29'],
+        'number_of_licenses': [10, 5, 8, 3]
+    })
+
+
+def test_seats_in_force_on_a_day():
+    index = LicenceIntervalIndex()
+    index.update(make_licences())
+
+    assert index.seats_on('2023-12-31') == 0
+    assert index.seats_on('2024-02-29') == 13  # end dates are inclusive
+    assert index.seats_on('2024-03-01') == 18
+    assert index.seats_on('2024-07-01') == 23
+    assert index.seats_on('2030-01-01') == 8  # the open-ended partner round
+
+    by_entity = index.seats_on_by_entity('2025-01-01')
+    assert by_entity.set_index(['entity_type', 'entity_id'])['seats'].to_dict() == {('Company', 10): 5, ('Partner', 7): 8}
+    assert index.seats_on_by_entity('2023-01-01').empty
+
+
+def test_seats_per_day_and_overlaps():
+    index = LicenceIntervalIndex()
+    index.update(make_licences())
+
+    assert index.seats_per_day('2024-05-31', '2024-06-01')['seats'].tolist() == [18, 23]
+    assert index.seats_per_day('2024-05-31', '2024-06-01', [('Company', 10)])['seats'].tolist() == [10, 15]
+
+    overlaps = index.overlaps()
+    assert overlaps[['licence_id', 'other_licence_id', 'overlap_days']].values.tolist() == [[1, 2, 214]]
+    assert overlaps['overlap_end'].iloc[0] == pd.Timestamp('2024-12-31')
+
+
+def test_empty_index():
+    index = LicenceIntervalIndex()
+    index.update(make_licences().iloc[:0])
+    assert index.seats_on('2024-01-01') == 0
+    assert index.seats_per_day('2024-01-01', '2024-01-02')['seats'].tolist() == [0, 0]
+    assert index.overlaps().empty
+
+
+def test_no_valid_rounds_and_unknown_entities():
+    licences = make_licences()
+    # Every round undated or ending before it starts: nothing survives the filter
+    invalid = licences.assign(start_date=[None, None, '2024-03-01', None], end_date=[None, None, '2024-02-01', None])
+    index = LicenceIntervalIndex()
+    index.update(invalid)
+    assert len(index) == 0
+    assert index.seats_on('2024-03-01') == 0
+    assert index.seats_on_by_entity('2024-03-01').empty
+    assert index.seats_per_day('2024-03-01', '2024-03-02')['seats'].tolist() == [0, 0]
+
+    index.update(licences)
+    assert index.seats_per_day('2024-03-01', '2024-03-02', [('Company', 99)])['seats'].tolist() == [0, 0]
@@ -0,0 +1,72 @@
+import pandas as pd
+from live_tail import LiveLogTail
+
+
+class FakeTailDB:
+    """Serves each source's rows above the requested watermark, newest first, like get_app_logs()"""
+
+    def __init__(self):
+        self.rows = pd.DataFrame(columns=['timestamp', 'log_source', 'log_id'])
+        self.calls = []
+
+    def add(self, timestamps, ids, log_source='app_log'):
+        new_rows = pd.DataFrame({'timestamp': pd.to_datetime(timestamps), 'log_source': log_source, 'log_id': ids})
+        self.rows = pd.concat([self.rows, new_rows], ignore_index=True)
+
+    def _fetch(self, log_source, page_size, after):
+        rows = self.rows[self.rows['log_source'] == log_source]
+        if after is not None:
+            timestamp, log_id = pd.Timestamp(after[0]), after[1]
+            rows = rows[(rows['timestamp'] > timestamp) | ((rows['timestamp'] == timestamp) & (rows['log_id'] > log_id))]
+        return rows.sort_values(['timestamp', 'log_id'], ascending=False).head(page_size)
+
+    def get_app_logs(self, user_id=None, company_id=None, partner_id=None, page_size=1000, before=None, after=None):
+        self.calls.append(after)
+        return self._fetch('app_log', page_size, after)
+
+    def get_portal_logs(self, user_id=None, company_id=None, partner_id=None, page_size=1000, before=None, after=None):
+        return self._fetch('portal_logs', page_size, after)
+
+    def get_waypoint_logs(self, user_id=None, company_id=None, partner_id=None, page_size=1000, before=None, after=None):
+        return self._fetch('waypoint_logs', page_size, after)
+
+
+def test_poll_appends_only_new_rows():
+    db = FakeTailDB()
+    db.add(['2024-06-01 09:00', '2024-06-01 09:01'], [1, 2])
+    tail = LiveLogTail(capacity=3, log_type='App')
+
+    assert tail.poll(db) == 2
+    assert tail.watermarks['app_log'] == (pd.Timestamp('2024-06-01 09:01'), 2)
+    assert tail.poll(db) == 0
+    assert db.calls == [None, ('2024-06-01 09:01:00', 2)]
+
+    # Same second, higher id, is still new; the ring buffer keeps the newest three
+    db.add(['2024-06-01 09:01', '2024-06-01 09:02'], [3, 4])
+    assert tail.poll(db) == 2
+    assert len(tail) == 3
+    assert tail.rows()['log_id'].tolist() == [4, 3, 2]
+
+
+def test_empty_tail():
+    tail = LiveLogTail(log_type='App')
+    assert tail.poll(FakeTailDB()) == 0
+    assert tail.rows().empty
+    assert tail.watermarks == {'app_log': None}
+
+
+def test_full_buffer_keeps_newest_rows_across_sources():
+    db = FakeTailDB()
+    db.add(['2024-06-10 09:00', '2024-06-10 09:05'], [1, 2], 'portal_logs')
+    db.add(['2024-06-10 09:01', '2024-06-10 09:02'], [7, 8], 'app_log')
+    # Waypoint rows are weeks older and polled last
+    db.add(['2024-05-01 08:00', '2024-05-02 08:00', '2024-05-03 08:00'], [30, 31, 32], 'waypoint_logs')
+    tail = LiveLogTail(capacity=5)
+
+    assert tail.poll(db) == 7
+    assert tail.rows()['log_id'].tolist() == [2, 8, 7, 1, 32]
+
+    # A late row older than the buffer is skipped; a newer one pushes out the oldest
+    db.add(['2024-04-01 08:00', '2024-06-10 10:00'], [33, 34], 'waypoint_logs')
+    assert tail.poll(db) == 1
+    assert tail.rows()['log_id'].tolist() == [34, 2, 8, 7, 1]
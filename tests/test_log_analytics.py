@@ -0,0 +1,219 @@
+import pandas as pd
+import pytest
+from snapshot_store import LogSnapshotStore
+from dimensions import WaypointDimension
+from log_analytics import LogAnalyticsEngine, summarise_logs, type_log_id_columns, build_log_metadata, merge_log_pages, \
+    pivot_status_transitions
+
+pytestmark = pytest.mark.skipif(not LogAnalyticsEngine.is_supported(), reason="duckdb is not installed")
+
+
+def make_engine(tmp_path):
+    store = LogSnapshotStore(str(tmp_path))
+    store.append('app_log', pd.DataFrame({
+        'id': [1, 2, 3],
+        'timestamp': pd.to_datetime(['2024-06-01 09:00', '2024-06-01 10:00', '2024-06-02 11:00']),
+        'user_id': [1, 2, 1],
+        'action': ['login', 'login', 'sync'],
+        'status': ['ok', 'ok', 'ok'],
+        'notes': [None, None, None],
+        'session_id': ['s1', 's2', 's3'],
+        'waypoint_id': [None, 5, None],
+        'dma_id': [None, None, None]
+    }))
+    store.append('portal_logs', pd.DataFrame({
+        'id': [1],
+        'timestamp': pd.to_datetime(['2024-06-02 12:00']),
+        'user_name': ['A'],
+        'user_email': ['A@x'],
+        'action': ['edit'],
+        'status': ['ok'],
+        'notes': [None],
+        'company_id': [10],
+        'partner_id': [None],
+        'branch_id': [None],
+        'object_data': [None]
+    }))
+    engine = LogAnalyticsEngine(store)
+    engine.set_dimensions(
+        pd.DataFrame({'id': [1, 2], 'user_name': ['A', 'B'], 'email': ['a@x', 'b@x'],
+                      'company_id': [10, 11], 'partner_id': [None, 7]}),
+        pd.DataFrame({'id': [10, 11], 'company_name': ['Acme', 'Globex']}),
+        pd.DataFrame({'id': [7], 'partner_name': ['Partner Co']})
+    )
+    return engine
+
+
+def test_unified_logs_pushes_filters(tmp_path):
+    engine = make_engine(tmp_path)
+    assert engine.has_data()
+
+    logs = engine.unified_logs(start_date='2024-06-01', end_date='2024-06-02')
+    assert len(logs) == 4
+    assert logs['timestamp'].is_monotonic_decreasing
+
+    # User 1's app rows plus the portal row matched by email
+    user_logs = engine.unified_logs(user_id=1)
+    assert sorted(user_logs['log_source'].tolist()) == ['app_log', 'app_log', 'portal_logs']
+    # The portal row only has an email ('A@x'); the identity map resolves it to user 1
+    assert user_logs['user_id'].tolist() == [1, 1, 1]
+
+    partner_logs = engine.unified_logs(partner_id=7, log_type='App')
+    assert partner_logs['partner_name'].tolist() == ['Partner Co']
+
+
+def test_summary_matches_in_memory_summary(tmp_path):
+    engine = make_engine(tmp_path)
+    summary = engine.summary(start_date='2024-06-01', end_date='2024-06-01')
+    expected = summarise_logs(engine.unified_logs(start_date='2024-06-01', end_date='2024-06-01'))
+
+    assert summary['total_logs'] == expected['total_logs'] == 2
+    assert summary['unique_users'] == 2
+    assert summary['source_counts'] == {'app_log': 2}
+    assert summary['daily_counts']['activity_count'].tolist() == [2]
+
+
+def test_empty_store(tmp_path):
+    engine = LogAnalyticsEngine(LogSnapshotStore(str(tmp_path)))
+    assert not engine.has_data()
+    assert engine.unified_logs().empty
+    assert engine.summary()['total_logs'] == 0
+
+
+def test_keyset_pages_cover_every_row_once(tmp_path):
+    engine = make_engine(tmp_path)
+    seen = []
+    cursor = None
+    while True:
+        page = engine.unified_logs(page_size=1, before=cursor)
+        if page.empty:
+            break
+        seen.extend(zip(page['log_source'], page['log_id']))
+        last = page.iloc[-1]
+        cursor = (last['timestamp'], last['log_source'], last['log_id'])
+    assert sorted(seen) == [('app_log', 1), ('app_log', 2), ('app_log', 3), ('portal_logs', 1)]
+    assert seen == list(zip(*[engine.unified_logs()[c] for c in ('log_source', 'log_id')]))
+
+
+def test_typed_id_columns_and_lazy_metadata():
+    logs = type_log_id_columns(pd.DataFrame({
+        'user_id': [3.0, None],
+        'company_id': [None, None],
+        'partner_id': [7, 8],
+        'action': ['login', 'edit']
+    }))
+    assert str(logs['user_id'].dtype) == 'Int64'
+    assert str(logs['company_id'].dtype) == 'Int64'
+    assert logs['user_id'].eq(3).fillna(False).tolist() == [True, False]
+    assert build_log_metadata(logs).tolist() == ['{"user_id": 3, "partner_id": 7}', '{"partner_id": 8}']
+
+
+def test_log_details_are_fetched_by_key(tmp_path):
+    engine = make_engine(tmp_path)
+    logs = engine.unified_logs()
+    assert 'notes' not in logs.columns and 'object_data' not in logs.columns
+
+    details = engine.log_details(pd.DataFrame({'log_source': ['app_log', 'portal_logs'], 'log_id': [2, 1]}))
+    assert sorted(zip(details['log_source'], details['log_id'])) == [('app_log', 2), ('portal_logs', 1)]
+    assert set(details.columns) == {'log_source', 'log_id', 'notes', 'object_data'}
+
+
+def test_merge_log_pages_keeps_keyset_order():
+    portal = pd.DataFrame({'timestamp': ['2024-06-01 10:00:00', '2024-06-01 08:00:00'],
+                           'log_source': 'portal_logs', 'log_id': [4, 3]})
+    app = pd.DataFrame({'timestamp': pd.to_datetime(['2024-06-01 10:00:00', '2024-06-01 09:00:00']),
+                        'log_source': 'app_log', 'log_id': [9, 8]})
+    merged = merge_log_pages([portal, app, pd.DataFrame()], page_size=3)
+    assert list(zip(merged['log_source'], merged['log_id'])) == [('portal_logs', 4), ('app_log', 9), ('app_log', 8)]
+    assert merge_log_pages([pd.DataFrame()]).empty
+
+
+def test_status_transitions_and_matrix(tmp_path):
+    engine = make_engine(tmp_path)
+    engine.snapshot_store.append('waypoint_logs', pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'timestamp': pd.to_datetime(['2024-06-01 09:00', '2024-06-01 10:00', '2024-06-02 09:00', '2024-06-02 10:00']),
+        'user_id': [1, 1, 2, 2],
+        'waypoint_id': [5, 6, 5, 5],
+        'status_changed_from_id': [1, 1, 1, None],
+        'status_changed_to_id': [2, 2, 3, None],
+        'notes': [None, None, None, None]
+    }))
+    transitions = engine.status_transitions(start_date='2024-06-01', end_date='2024-06-02')
+    assert transitions['transition_count'].tolist() == [2, 1]
+    assert engine.status_transitions(partner_id=7)['transition_count'].tolist() == [1]
+
+    matrix = pivot_status_transitions(transitions, pd.Series({1: 'Deployed', 2: 'Collected'}))
+    assert matrix.loc['Deployed', 'Collected'] == 2
+    # Status 3 has no label and keeps its id
+    assert matrix.loc['Deployed', '3'] == 1
+    assert pivot_status_transitions(pd.DataFrame()).empty
+
+    # Listed rows carry the status ids only; labelling is left to WaypointDimension like the live rows
+    waypoint_logs = engine.unified_logs(log_type='Waypoint').sort_values('log_id')
+    assert waypoint_logs['action'].isna().all()
+    labelled = WaypointDimension().label_logs(waypoint_logs)
+    assert labelled['action'].iloc[0] == 'Status Change: 1 → 2'
+
+
+def test_activity_buckets_and_hour_weekday(tmp_path):
+    engine = make_engine(tmp_path)
+    daily = engine.activity_buckets('day')
+    assert daily['activity_count'].tolist() == [2, 1, 1]
+    assert daily['log_source'].tolist() == ['app_log', 'app_log', 'portal_logs']
+
+    by_company = engine.activity_buckets('month', entity='company', log_type='App')
+    assert by_company[['entity_id', 'activity_count']].values.tolist() == [[10, 2], [11, 1]]
+
+    # 2024-06-01 was a Saturday
+    hours = engine.hour_weekday_counts(log_type='App').sort_values(['weekday', 'hour'])
+    assert hours[['weekday', 'hour', 'activity_count']].values.tolist() == [[5, 9, 1], [5, 10, 1], [6, 11, 1]]
+
+
+def test_partner_filter_covers_its_companies(tmp_path):
+    engine = make_engine(tmp_path)
+    # Company 10 belongs to partner 7: user 1's rows and the company 10 portal row are now included
+    engine.set_dimensions(
+        pd.DataFrame({'id': [1, 2], 'user_name': ['A', 'B'], 'email': ['a@x', 'b@x'],
+                      'company_id': [10, 11], 'partner_id': [None, 7]}),
+        pd.DataFrame({'id': [10, 11], 'company_name': ['Acme', 'Globex'], 'partner_id': [7, None]}),
+        pd.DataFrame({'id': [7], 'partner_name': ['Partner Co']})
+    )
+    partner_logs = engine.unified_logs(partner_id=7)
+    assert sorted(partner_logs['log_source'].tolist()) == ['app_log', 'app_log', 'app_log', 'portal_logs']
+
+
+
+class FakeDimensionDB:
+    """Serves unscoped dimension frames; a column-less frame stands for a failed query"""
+
+    def __init__(self, users_df, companies_df, partners_df):
+        self.frames = (users_df, companies_df, partners_df)
+
+    def get_portal_users(self):
+        return self.frames[0]
+
+    def get_company_dimension(self):
+        return self.frames[1]
+
+    def get_partner_dimension(self):
+        return self.frames[2]
+
+
+def test_dimension_refresh_is_throttled_and_keeps_tables_on_error(tmp_path):
+    engine = make_engine(tmp_path)
+    engine.refresh(FakeDimensionDB(
+        pd.DataFrame({'id': [1, 2], 'user_name': ['A', 'B'], 'email': ['a@x', 'b@x'],
+                      'company_id': [10, 11], 'partner_id': [None, 7]}),
+        pd.DataFrame({'id': [10, 11], 'company_name': ['Acme', 'Globex'], 'partner_id': [7, None]}),
+        pd.DataFrame({'id': pd.Series(dtype='int64'), 'partner_name': pd.Series(dtype=object)})
+    ))
+    # An empty partner result still leaves a queryable table
+    assert engine.unified_logs(partner_id=7)['partner_name'].isna().all()
+    assert sorted(engine.unified_logs(company_id=10)['company_name'].unique()) == ['Acme']
+
+    # Within REFRESH_SECONDS another session's refresh is a no-op
+    engine.refresh(FakeDimensionDB(pd.DataFrame(), pd.DataFrame(), pd.DataFrame()))
+    engine.refresh(FakeDimensionDB(pd.DataFrame(), pd.DataFrame(), pd.DataFrame()), max_age_seconds=0)
+    # A failed reload keeps the tables it could not replace
+    assert sorted(engine.unified_logs(company_id=10)['company_name'].unique()) == ['Acme']
@@ -0,0 +1,64 @@
+import sqlite3
+import pandas as pd
+from log_cursors import keyset_filter, watermark_filter, next_log_cursor, row_comparison
+
+CURSOR = ('2024-06-01 09:30:00', 'app_log', 42)
+
+
+def test_row_comparison_is_expanded_column_by_column():
+    sql, params = row_comparison(['d', 't', 'id'], ['2024-06-01', '09:30:00', 42], '<')
+    assert sql == "(d <= %s AND (d < %s OR (d = %s AND (t < %s OR (t = %s AND (id < %s))))))"
+    assert params == ['2024-06-01', '2024-06-01', '2024-06-01', '09:30:00', '09:30:00', 42]
+    assert row_comparison(['ts'], ['x'], '<', inclusive=True) == ("(ts <= %s)", ['x'])
+
+
+def test_keyset_filter_on_date_and_time_columns():
+    # Same source: strictly below (date, time, id); no CONCAT, so the index serves the range
+    sql, params = keyset_filter(('pl.date', 'pl.time'), 'pl.id', 'app_log', CURSOR)
+    assert 'CONCAT' not in sql and sql.startswith('AND (pl.date <= %s AND ')
+    assert params == ['2024-06-01', '2024-06-01', '2024-06-01', '09:30:00', '09:30:00', 42]
+
+    # portal_logs sorts after app_log within a timestamp, so the cursor's second is repeated
+    sql, params = keyset_filter(('pl.date', 'pl.time'), 'pl.id', 'portal_logs', CURSOR)
+    assert sql == "AND (pl.date <= %s AND (pl.date < %s OR (pl.date = %s AND (pl.time < %s))))"
+    assert params == ['2024-06-01', '2024-06-01', '2024-06-01', '09:30:00']
+    sql, params = keyset_filter('al.timestamp', 'al.id', 'portal_logs', ('2024-06-01 09:30:00', 'waypoint_logs', 7))
+    assert sql == "AND (al.timestamp <= %s)"
+    assert keyset_filter('al.timestamp', 'al.id', 'app_log', None) == ("", [])
+
+
+def test_keyset_predicate_matches_sort_order():
+    # Run the predicate against a table to check it selects exactly the rows after the cursor
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE logs (date TEXT, time TEXT, id INTEGER)')
+    connection.executemany('INSERT INTO logs VALUES (?, ?, ?)', [
+        ('2024-06-01', '09:30:00', 41), ('2024-06-01', '09:30:00', 43), ('2024-06-01', '09:31:00', 1),
+        ('2024-06-01', '09:29:59', 99), ('2024-05-31', '23:59:59', 100)
+    ])
+    sql, params = keyset_filter(('date', 'time'), 'id', 'app_log', CURSOR)
+    selected = connection.execute(f"SELECT id FROM logs WHERE 1=1 {sql.replace('%s', '?')} ORDER BY id", params)
+    assert [row[0] for row in selected] == [41, 99, 100]
+
+
+def test_watermark_filter_and_next_cursor():
+    sql, params = watermark_filter('al.timestamp', 'al.id', ('2024-06-01 09:30:00', 42))
+    assert sql == "AND (al.timestamp >= %s AND (al.timestamp > %s OR (al.timestamp = %s AND (al.id > %s))))"
+    assert params == ['2024-06-01 09:30:00'] * 3 + [42]
+    assert watermark_filter('al.timestamp', 'al.id', None) == ("", [])
+
+    page = pd.DataFrame({'timestamp': ['2024-06-01 09:30:00'], 'log_source': ['app_log'], 'log_id': [42]})
+    assert next_log_cursor(page, page_size=1) == CURSOR
+    assert next_log_cursor(page, page_size=2) is None
+
+
+def test_portal_watermark_on_date_and_time_columns():
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE portal_logs (date TEXT, time TEXT, id INTEGER)')
+    connection.executemany('INSERT INTO portal_logs VALUES (?, ?, ?)', [
+        ('2024-06-01', '09:30:00', 41), ('2024-06-01', '09:30:00', 43), ('2024-06-01', '09:29:00', 50),
+        ('2024-06-02', '00:00:01', 44)
+    ])
+    sql, params = watermark_filter(('date', 'time'), 'id', ('2024-06-01 09:30:00', 42))
+    assert 'CONCAT' not in sql and sql.startswith('AND (date >= %s AND ')
+    selected = connection.execute(f"SELECT id FROM portal_logs WHERE 1=1 {sql.replace('%s', '?')} ORDER BY id", params)
+    assert [row[0] for row in selected] == [43, 44]
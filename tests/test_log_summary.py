@@ -0,0 +1,139 @@
+import threading
+import pandas as pd
+import pytest
+from log_summary import LogSummaryService, combine_source_aggregates, choose_time_bucket, hour_weekday_matrix
+
+
+class FakeAggregateDB:
+    """Serves fixed per-source aggregates and records the filters it was queried with"""
+
+    DAILY = {
+        'portal_logs': pd.DataFrame({'date': ['2024-06-01'], 'activity_count': [4]}),
+        'app_log': pd.DataFrame({'date': ['2024-06-01', '2024-06-02'], 'activity_count': [10, 5]}),
+        'waypoint_logs': pd.DataFrame()
+    }
+    USERS = {
+        'portal_logs': pd.DataFrame({'user_key': ['a@x']}),
+        'app_log': pd.DataFrame({'user_key': ['a@x', 'b@x', '#9']}),
+        'waypoint_logs': pd.DataFrame()
+    }
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_log_daily_counts(self, source, **filters):
+        with self._lock:
+            self.calls.append(('daily', source, filters['partner_id']))
+        return self.DAILY[source]
+
+    def get_log_user_keys(self, source, **filters):
+        with self._lock:
+            self.calls.append(('users', source, filters['partner_id']))
+        return self.USERS[source]
+
+    def get_log_activity_buckets(self, source, bucket, entity, **filters):
+        with self._lock:
+            self.calls.append(('buckets', source, bucket))
+        return self.DAILY[source].rename(columns={'date': 'bucket_start'})
+
+    def get_log_hour_weekday_counts(self, source, **filters):
+        with self._lock:
+            self.calls.append(('hours', source, filters['partner_id']))
+        if source == 'waypoint_logs':
+            return pd.DataFrame()
+        return pd.DataFrame({'weekday': [0, 6], 'hour': [9, 23], 'activity_count': [2, 1]})
+
+
+def test_combine_source_aggregates():
+    summary = combine_source_aggregates(FakeAggregateDB.DAILY, FakeAggregateDB.USERS)
+    assert summary['total_logs'] == 19
+    # a@x is active in both portal and app logs but counted once
+    assert summary['unique_users'] == 3
+    assert summary['source_counts'] == {'portal_logs': 4, 'app_log': 15}
+    assert summary['daily_counts']['activity_count'].tolist() == [14, 5]
+
+
+def test_combine_empty():
+    summary = combine_source_aggregates({}, {})
+    assert summary['total_logs'] == 0
+    assert summary['daily_counts'].empty
+
+
+def test_service_limits_sources_and_caches_by_signature():
+    db = FakeAggregateDB()
+    service = LogSummaryService(db)
+
+    summary = service.summary(partner_id=7, log_type='App')
+    assert summary['source_counts'] == {'app_log': 15}
+    assert sorted(db.calls) == [('daily', 'app_log', 7), ('users', 'app_log', 7)]
+
+    # Same filters are served from the cache, different filters are queried
+    service.summary(partner_id=7, log_type='App')
+    assert len(db.calls) == 2
+    service.summary(partner_id=8, log_type='App')
+    assert len(db.calls) == 4
+
+
+def test_service_cache_expires():
+    db = FakeAggregateDB()
+    service = LogSummaryService(db, ttl_seconds=0)
+    service.summary()
+    service.summary()
+    assert len(db.calls) == 12
+
+
+class FlakyAggregateDB(FakeAggregateDB):
+    """Fails every aggregate query until `failing` is cleared, like a dropped connection"""
+
+    failing = True
+
+    def get_log_daily_counts(self, source, **filters):
+        if self.failing:
+            raise ConnectionError("database unavailable")
+        return super().get_log_daily_counts(source, **filters)
+
+    def get_log_activity_buckets(self, source, bucket, entity, **filters):
+        if self.failing:
+            raise ConnectionError("database unavailable")
+        return super().get_log_activity_buckets(source, bucket, entity, **filters)
+
+
+def test_failed_aggregates_are_not_cached():
+    db = FlakyAggregateDB()
+    service = LogSummaryService(db)
+
+    with pytest.raises(ConnectionError):
+        service.summary(log_type='App')
+    with pytest.raises(ConnectionError):
+        service.activity_buckets('day', log_type='App')
+
+    # Once the database is back, the same filters are queried again instead of served as zeros
+    db.failing = False
+    assert service.summary(log_type='App')['total_logs'] == 15
+    assert service.activity_buckets('day', log_type='App')['activity_count'].sum() == 15
+
+
+def test_choose_time_bucket_adapts_to_range():
+    assert choose_time_bucket('2024-06-01', '2024-06-07') == 'hour'
+    assert choose_time_bucket('2024-01-01', '2024-06-30') == 'day'
+    assert choose_time_bucket('2020-01-01', '2024-06-30') == 'week'
+    assert choose_time_bucket('2000-01-01', '2024-06-30') == 'month'
+    assert choose_time_bucket(None, '2024-06-30') == 'month'
+
+
+def test_service_buckets_and_hour_weekday():
+    db = FakeAggregateDB()
+    service = LogSummaryService(db)
+
+    buckets = service.activity_buckets('day', start_date='2024-06-01', end_date='2024-06-02')
+    assert buckets['log_source'].tolist() == ['app_log', 'portal_logs', 'app_log']
+    assert buckets['activity_count'].sum() == 19
+    service.activity_buckets('day', start_date='2024-06-01', end_date='2024-06-02')
+    assert len(db.calls) == 3
+
+    matrix = service.hour_weekday(log_type='App')
+    assert matrix.shape == (7, 24)
+    assert (matrix.loc['Mon', 9], matrix.loc['Sun', 23], int(matrix.to_numpy().sum())) == (2, 1, 3)
+    assert int(hour_weekday_matrix(pd.DataFrame()).to_numpy().sum()) == 0
+
@@ -0,0 +1,52 @@
+import datetime
+import numpy as np
+import pandas as pd
+from query_cache import QueryCache, log_query_key
+
+
+def test_key_normalises_filter_types():
+    assert log_query_key('App', datetime.date(2024, 6, 1), None, np.int64(7), 10.0) == \
+        log_query_key('App', '2024-06-01', '', 7, 10)
+    cursor_a = (pd.Timestamp('2024-06-01 09:00'), 'app_log', np.int64(5))
+    cursor_b = ('2024-06-01 09:00:00', 'app_log', 5)
+    assert log_query_key('App', before=cursor_a) == log_query_key('App', before=cursor_b)
+    assert log_query_key('App', company_id=1) != log_query_key('App', partner_id=1)
+
+
+def test_get_or_load_counts_hits_and_misses():
+    cache = QueryCache()
+    loads = []
+    loader = lambda: loads.append(1) or 'rows'
+    assert cache.get_or_load('a', loader) == 'rows'
+    assert cache.get_or_load('a', loader) == 'rows'
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_lru_eviction_and_ttl():
+    cache = QueryCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    # 'b' was the least recently used entry
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evicted'] == 1
+
+    expired = QueryCache(ttl_seconds=0)
+    expired.put('a', 1)
+    assert expired.get('a') is None
+    assert expired.stats()['expired'] == 1
+
+
+def test_invalidate():
+    cache = QueryCache()
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.invalidate('a')
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
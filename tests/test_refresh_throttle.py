@@ -0,0 +1,23 @@
+from refresh_throttle import ThrottledRefresh
+
+
+class CountingIndex(ThrottledRefresh):
+    REFRESH_SECONDS = 3600
+
+    def __init__(self):
+        self.reloads = []
+        self._init_refresh()
+
+    def _reload(self, db, path=None):
+        self.reloads.append((db, path))
+
+
+def test_refresh_is_throttled_by_class_default():
+    index = CountingIndex()
+    index.refresh('db', path='index.npz')
+    index.refresh('db', path='index.npz')
+    assert index.reloads == [('db', 'index.npz')]
+
+    index.refresh('db', max_age_seconds=0)
+    assert index.reloads[-1] == ('db', None)
+    assert len(index.reloads) == 2
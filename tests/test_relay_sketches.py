@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from relay_sketches import HyperLogLog, RelaySketchStore, hll_error_bound
+
+
+def test_hll_estimate_within_error_bound():
+    sketch = HyperLogLog()
+    sketch.add(np.arange(20000))
+    # Four standard errors keeps the test deterministic-in-practice
+    assert abs(sketch.estimate() - 20000) / 20000 < 4 * hll_error_bound()
+
+
+def test_hll_small_counts_and_duplicates():
+    sketch = HyperLogLog()
+    sketch.add(['relay-1', 'relay-2', 'relay-1', 'relay-3'])
+    assert round(sketch.estimate()) == 3
+
+
+def test_hll_merge_is_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add(np.arange(0, 600))
+    right.add(np.arange(300, 900))
+    left.merge(right)
+    assert abs(left.estimate() - 900) / 900 < 4 * hll_error_bound()
+
+
+def make_activity():
+    return pd.DataFrame({
+        'day': pd.to_datetime(['2024-06-01', '2024-06-01', '2024-06-02', '2024-06-02']),
+        'user_id': [1, 2, 1, 2],
+        'company_id': [10, 10, 10, 10],
+        'partner_id': [None, None, None, 7],
+        'relay_id': [100, 101, 100, 102]
+    })
+
+
+def test_store_window_counts():
+    store = RelaySketchStore()
+    store.update_daily_activity(make_activity())
+
+    companies = store.window_counts('Company', '2024-06-01', '2024-06-02')
+    # Relay 100 is seen on both days but is only counted once across the window
+    assert companies.set_index('entity_id')['active_relay_devices'].to_dict() == {10: 3}
+
+    users = store.window_counts('User', '2024-06-02', '2024-06-02')
+    assert users.set_index('entity_id')['active_relay_devices'].to_dict() == {1: 1, 2: 1}
+
+    partners = store.window_counts('Partner', '2024-06-01', '2024-06-02', entity_ids={8})
+    assert partners.empty
+
+
+def test_store_reloading_a_day_replaces_it(tmp_path):
+    store = RelaySketchStore()
+    store.update_daily_activity(make_activity())
+    store.update_daily_activity(make_activity().iloc[2:3])
+    assert store.window_counts('Company', '2024-06-02', '2024-06-02')['active_relay_devices'].tolist() == [1]
+
+    path = tmp_path / 'sketches.npz'
+    store.save(path)
+    loaded = RelaySketchStore.load(path)
+    assert loaded.last_day == store.last_day
+    assert loaded.window_counts('Company', '2024-06-01', '2024-06-02')['active_relay_devices'].tolist() == [2]
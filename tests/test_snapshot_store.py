@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+import pyarrow.dataset as ds
+from snapshot_store import LogSnapshotStore
+
+
+class FakeExportDB:
+    """Streams id-ordered export chunks from an in-memory frame"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.chunk_sizes = []
+
+    def iter_log_export(self, source, after_id=0, chunksize=50000):
+        rows = self.rows[self.rows['id'] > after_id].sort_values('id')
+        for start in range(0, len(rows), chunksize):
+            chunk = rows.iloc[start:start + chunksize]
+            self.chunk_sizes.append(len(chunk))
+            yield chunk
+
+
+def make_app_rows():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4, 5],
+        'timestamp': pd.to_datetime(['2024-06-01 08:00', '2024-06-01 09:30', '2024-06-02 10:00',
+                                     '2024-06-03 11:00', '2024-06-03 12:00']),
+        'user_id': [7, 8, 7, None, 9],
+        'action': ['login', 'sync', 'login', 'logout', 'login'],
+        'status': ['ok', 'ok', 'failed', 'ok', 'ok'],
+        'notes': [None, 'n', None, None, None],
+        'session_id': ['s1', 's1', 's2', None, 's3'],
+        'waypoint_id': [None, 11, None, None, 12],
+        'dma_id': [None, None, None, None, None]
+    })
+
+
+def test_sync_is_incremental(tmp_path):
+    store = LogSnapshotStore(str(tmp_path))
+    rows = make_app_rows()
+    db = FakeExportDB(rows.iloc[:3])
+    assert store.sync(db, 'app_log', chunksize=2) == 3
+    assert db.chunk_sizes == [2, 1]
+    assert store.get_watermark('app_log') == 3
+
+    db.rows = rows
+    assert store.sync(db, 'app_log') == 2
+    assert store.partitions('app_log') == ['2024-06-01', '2024-06-02', '2024-06-03']
+    assert sorted(store.read('app_log')['id'].tolist()) == [1, 2, 3, 4, 5]
+
+
+def test_read_prunes_and_projects(tmp_path):
+    store = LogSnapshotStore(str(tmp_path))
+    store.append('app_log', make_app_rows())
+
+    df = store.read('app_log', start_date='2024-06-02', end_date='2024-06-03', columns=['id', 'action'])
+    assert list(df.columns) == ['id', 'action']
+    assert sorted(df['id'].tolist()) == [3, 4, 5]
+    # Strings come back dictionary encoded
+    assert isinstance(df['action'].dtype, pd.CategoricalDtype)
+
+    df = store.read('app_log', predicate=ds.field('user_id') == 7, columns=['id'])
+    assert sorted(df['id'].tolist()) == [1, 3]
+
+    assert store.read('app_log', start_date='2025-01-01').empty
+    assert store.read('portal_logs').empty
+
+
+class InterruptedExportDB(FakeExportDB):
+    """Drops the connection after the first chunk"""
+
+    def iter_log_export(self, source, after_id=0, chunksize=50000):
+        yield next(super().iter_log_export(source, after_id, chunksize))
+        raise ConnectionError("lost connection")
+
+
+def test_interrupted_sync_resumes_from_last_chunk(tmp_path):
+    store = LogSnapshotStore(str(tmp_path))
+    with pytest.raises(ConnectionError):
+        store.sync(InterruptedExportDB(make_app_rows()), 'app_log', chunksize=2)
+    assert store.get_watermark('app_log') == 2
+
+    assert store.sync(FakeExportDB(make_app_rows()), 'app_log') == 3
+    assert sorted(store.read('app_log')['id'].tolist()) == [1, 2, 3, 4, 5]
+
+
+def test_sync_compacts_days_and_keeps_undated_rows(tmp_path):
+    store = LogSnapshotStore(str(tmp_path))
+    rows = make_app_rows()
+    rows.loc[rows['id'] == 4, 'timestamp'] = pd.NaT
+    db = FakeExportDB(rows.iloc[:2])
+    store.sync(db, 'app_log', chunksize=1)
+    db.rows = rows
+    store.sync(db, 'app_log', chunksize=1)
+
+    # Every day is one file however many chunks and runs wrote to it
+    for day in store.partitions('app_log'):
+        assert len(list((tmp_path / 'app_log' / f'day={day}').glob('*.parquet'))) == 1
+    assert sorted(store.read('app_log')['id'].tolist()) == [1, 2, 3, 5]
+    # The undated row is stored apart instead of being skipped past by the watermark
+    assert store.get_watermark('app_log') == 5
+    assert store.undated_rows('app_log')['id'].tolist() == [4]
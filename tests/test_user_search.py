@@ -0,0 +1,44 @@
+import pandas as pd
+from user_search import UserPrefixIndex
+
+
+class FakeUsersDB:
+    def __init__(self):
+        self.loads = 0
+
+    def get_portal_users(self):
+        self.loads += 1
+        return pd.DataFrame({
+            'id': [1, 2, 3, 4],
+            'user_name': ['Jane Smith', 'adam Jones', 'Smithers Brown', 'Old Account'],
+            'email': ['jane@acme.com', 'adam@globex.com', 'sb@acme.com', 'jane.old@acme.com'],
+            'active': [1, 1, 1, 0]
+        })
+
+
+def test_prefix_search_matches_names_words_and_emails():
+    index = UserPrefixIndex()
+    db = FakeUsersDB()
+    index.refresh(db)
+    index.refresh(db)
+    assert db.loads == 1
+    assert len(index) == 3
+
+    # Name order, case-insensitive; 'smi' matches a later name word and a first name
+    assert index.search('SMI')['id'].tolist() == [1, 3]
+    assert index.search('jane')['id'].tolist() == [1]  # inactive jane.old@ is not indexed
+    assert index.search('adam@g')['id'].tolist() == [2]
+    assert index.search('zz').empty
+    assert index.search('', limit=2)['id'].tolist() == [2, 1]
+    assert index.search('s', limit=1)['id'].tolist() == [1]
+    assert index.label(3) == 'Smithers Brown (sb@acme.com)'
+    assert index.label(99) is None
+
+
+def test_prefix_search_limited_to_allowed_users():
+    index = UserPrefixIndex()
+    index.refresh(FakeUsersDB())
+
+    assert index.search('smi', allowed_ids={3})['id'].tolist() == [3]
+    assert index.search('', allowed_ids=frozenset({1, 3}), limit=1)['id'].tolist() == [1]
+    assert index.search('adam', allowed_ids=frozenset()).empty
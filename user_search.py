@@ -0,0 +1,83 @@
+"""
+Sorted prefix index over portal user names and emails for typeahead search
+"""
+
+import numpy as np
+import pandas as pd
+
+from refresh_throttle import ThrottledRefresh
+
+# Matches returned per keystroke
+USER_SEARCH_LIMIT = 20
+
+
+class UserPrefixIndex(ThrottledRefresh):
+    """Active portal users searchable by the start of their name, any word of it, or their email.
+
+    Every searchable key (full name, each later word of the name, email) is lower-cased
+    and stored in one sorted array next to the user's position, so a prefix lookup is
+    two binary searches and the matches are a contiguous slice of that array.
+    """
+
+    REFRESH_SECONDS = 600
+
+    def __init__(self):
+        self.users = pd.DataFrame(columns=['id', 'user_name', 'email'])
+        self.keys = np.array([], dtype=object)
+        self.positions = np.array([], dtype=np.int64)
+        self._init_refresh()
+
+    def __len__(self):
+        return len(self.users)
+
+    def update(self, users_df):
+        """Rebuild the index from an (id, user_name, email) frame"""
+        users = users_df[['id', 'user_name', 'email']].dropna(subset=['id'])
+        users = users.sort_values('user_name', key=lambda names: names.fillna('').str.lower(), kind='stable')
+        users = users.reset_index(drop=True)
+        names = users['user_name'].fillna('').astype(str).str.lower().str.strip()
+        emails = users['email'].fillna('').astype(str).str.lower().str.strip()
+        keys = [names, emails]
+        # Later words of the name, so "smi" finds "Jane Smith"
+        words = names.str.split().explode()
+        words = words[words.groupby(level=0).cumcount() > 0]
+        keys.append(words)
+        entries = pd.concat(keys)
+        entries = entries[entries != '']
+        order = np.argsort(entries.to_numpy(dtype=str), kind='stable')
+        self.keys = entries.to_numpy(dtype=str)[order]
+        self.positions = entries.index.to_numpy(dtype=np.int64)[order]
+        self.users = users
+
+    def search(self, prefix, limit=USER_SEARCH_LIMIT, allowed_ids=None):
+        """Users with a name, name word or email starting with `prefix`, in name order
+
+        Returns a frame of id, user_name and email with at most `limit` rows. When
+        `allowed_ids` is given, only those users are matched.
+        """
+        prefix = (prefix or '').lower().strip()
+        if prefix:
+            start = np.searchsorted(self.keys, prefix, side='left')
+            end = np.searchsorted(self.keys, prefix + '\uffff', side='right')
+            # Positions follow name order, so the lowest distinct positions are the first matches by name
+            positions = np.unique(self.positions[start:end])
+        else:
+            positions = np.arange(len(self.users))
+        if allowed_ids is not None:
+            allowed = self.users['id'].isin(list(allowed_ids)).to_numpy()
+            positions = positions[allowed[positions]]
+        return self.users.iloc[positions[:limit]].reset_index(drop=True)
+
+    def label(self, user_id):
+        """'Name (email)' for a user id, or None when the id is not indexed"""
+        match = self.users[self.users['id'] == user_id]
+        if match.empty:
+            return None
+        row = match.iloc[0]
+        return f"{row['user_name']} ({row['email']})"
+
+    def _reload(self, db):
+        """Reload the active users from the database"""
+        users_df = db.get_portal_users()
+        if not users_df.empty:
+            self.update(users_df[users_df['active'] == 1])